@@ -95,6 +95,26 @@ DATABASES = {
 }
 
 
+# Cache
+# 使用共享缓存，导入脚本等外部进程触发的失效才能被所有 Web 进程看到
+# 生产环境可换成 Redis：'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379/1'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'data' / 'cache',
+    },
+    # 首页等共享模板片段（{% cache %} 标签默认使用该别名），测试时可换成 LocMemCache
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'data' / 'cache' / 'fragments',
+    },
+}
+
+# 首页共享片段的兜底过期时间（秒），电影数据变动时会主动失效
+HOME_FRAGMENT_TIMEOUT = 600
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -145,3 +165,30 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # 获取API Key: https://dashscope.console.aliyun.com/
 QWEN_API_KEY = ''  # 通义千问API Key，原本有，此处为保存隐私，删除
 QWEN_API_URL = 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation'
+# AI推荐任务执行方式：'thread' 在 Web 进程内的线程池执行；
+# 'worker' 只入库，由 python manage.py run_ai_worker 执行（多进程部署时使用）
+AI_JOB_MODE = 'thread'
+AI_JOB_WORKERS = 4
+# 任务超过该秒数仍未完成视为失败
+AI_JOB_TIMEOUT = 120
+# AI推荐结果缓存时间（秒），收藏/评分变化时立即失效
+AI_RECOMMEND_CACHE_TIMEOUT = 24 * 3600
+
+# ==================== 列表分页配置 ====================
+# 'cursor'：游标分页，按排序列定位，深翻页不再 COUNT/OFFSET；'page'：传统页码分页
+MOVIE_LIST_PAGINATION = 'cursor'
+
+# ==================== 推荐索引配置 ====================
+# 离线构建的物品相似度索引（python manage.py build_similarity）
+RECOMMEND_INDEX_PATH = BASE_DIR / 'data' / 'similarity.idx'
+# 离线训练的矩阵分解因子（python manage.py train_factors），按版本保存在子目录中
+RECOMMEND_FACTORS_DIR = BASE_DIR / 'data' / 'factors'
+
+# ==================== 全文检索配置 ====================
+# 影片库关键词搜索的倒排索引（python manage.py rebuild_search_index）
+# 倒排表放在业务库中，列表查询与之连接；也可改用库外的 'myapp.search.SQLiteFTSBackend'
+# （需设置 'PATH'）或 'myapp.search.PythonIndexBackend'，但列表过滤要取回全部匹配 id，只适合小库
+MOVIE_SEARCH = {
+    'BACKEND': 'myapp.search.DatabaseIndexBackend',
+    'MAX_RESULTS': 1000,
+}
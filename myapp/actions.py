@@ -0,0 +1,191 @@
+"""
+用户行为（收藏/评分/评论）写入
+
+收藏、评分、评论接口共用 write_action，行本身只用一条语句写入，不加锁：
+
+- 行已存在：一条条件 UPDATE（WHERE 带上刚读到的 is_favorite/rating/comment），
+  切换收藏写 is_favorite = NOT is_favorite（~F()）；行在读与写之间被并发修改时
+  UPDATE 影响 0 行，重新读取后重试，并发的两次“切换收藏”不会互相覆盖
+- 行不存在：直接 INSERT，依赖 (user, movie) 唯一约束与 movie 外键，
+  不再预先查询 Movie；并发插入冲突时重试走更新分支，电影不存在时抛出 Movie.DoesNotExist
+
+这两种写法都不触发模型信号。写入之后在同一个事务中由确定的新旧取值计算差量，由 record_change
+显式更新用户统计、电影聚合值与AI推荐缓存，二者一起提交或一起回滚，统计不会与行为脱节；
+事务内没有先加锁再读的步骤，行锁只在这次写入到提交之间持有。
+其他经由 Model.save()/delete() 的写入（如后台管理）由信号调用同一个 record_change。
+
+批量导入使用 write_batch：锁住该用户已有的行为行、整批写入后，按每条的新旧取值差量
+一次性更新用户统计与电影聚合值（record_changes），不锁电影行、不做全量重算。
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import aggregates, ai, stats
+from .models import Movie, UserAction
+
+# 影响用户统计或电影聚合值的 UserAction 字段
+SOURCE_FIELDS = {"is_favorite", "rating", "comment"}
+VALUE_FIELDS = ("movie_id", "is_favorite", "rating", "comment", "created_at")
+
+ActionState = namedtuple("ActionState", ["is_favorite", "rating", "comment", "updated_at", "created"])
+
+UNCHANGED = object()
+
+BATCH_SIZE = 500
+# 条件 UPDATE 因并发修改落空时的重试次数上限
+WRITE_ATTEMPTS = 5
+
+
+def _user_snapshot(values):
+    movie_id, is_favorite, rating, _, created_at = values
+    return stats.snapshot(movie_id, is_favorite, rating, created_at)
+
+
+def _movie_contribution(values):
+    movie_id, is_favorite, rating, comment, _ = values
+    return movie_id, aggregates.contribution(is_favorite, rating, comment)
+
+
+def record_change(user_id, before, after):
+    """
+    before/after 为 VALUE_FIELDS 的取值或 None（新增/删除），
+    更新用户统计、电影聚合值，收藏或评分变化时丢弃AI推荐缓存。
+    """
+    record_changes(user_id, [(before, after)])
+
+
+def record_changes(user_id, changes):
+    """同 record_change，changes 为 [(before, after), ...]；用户统计整批一次更新"""
+    stats.apply_changes(user_id, [
+        (_user_snapshot(before) if before else None, _user_snapshot(after) if after else None)
+        for before, after in changes
+    ])
+    for before, after in changes:
+        aggregates.apply_change(
+            _movie_contribution(before) if before else None,
+            _movie_contribution(after) if after else None,
+        )
+    if any((before and before[1:3]) != (after and after[1:3]) for before, after in changes):
+        ai.invalidate_cache(user_id)
+
+
+def _write(user, movie_id, toggle_favorite, changes):
+    """
+    写入一次，返回 (before, after, ActionState)；行在读取之后被并发修改时返回 None。
+
+    电影不存在或并发插入了同一行时抛出 IntegrityError。
+    """
+    before = UserAction.objects.filter(user=user, movie_id=movie_id).values_list(*VALUE_FIELDS).first()
+    if before is None:
+        values = {"is_favorite": toggle_favorite, "rating": None, "comment": None, **changes}
+        action = UserAction(user=user, movie_id=movie_id, **values)
+        UserAction.objects.bulk_create([action])
+        after = tuple(getattr(action, f) for f in VALUE_FIELDS)
+        return None, after, ActionState(action.is_favorite, action.rating, action.comment, action.updated_at, True)
+
+    _, is_favorite, rating, comment, created_at = before
+    current = {"is_favorite": is_favorite, "rating": rating, "comment": comment, **changes}
+    if toggle_favorite:
+        changes["is_favorite"] = ~F("is_favorite")
+        current["is_favorite"] = not is_favorite
+    now = timezone.now()
+    updated = UserAction.objects.filter(
+        user=user, movie_id=movie_id, is_favorite=is_favorite, rating=rating, comment=comment
+    ).update(updated_at=now, **changes)
+    if not updated:
+        return None
+    after = (movie_id, current["is_favorite"], current["rating"], current["comment"], created_at)
+    return before, after, ActionState(current["is_favorite"], current["rating"], current["comment"], now, False)
+
+
+def write_action(user, movie_id, *, toggle_favorite=False, rating=UNCHANGED, comment=UNCHANGED):
+    """
+    写入用户对某部电影的行为，返回写入后的 ActionState。
+
+    电影不存在时抛出 Movie.DoesNotExist；并发修改重试用尽、锁等待超时或死锁时抛出 OperationalError，
+    此时行为与统计都未写入，调用方可稍后重试。
+    """
+    changes = {}
+    if rating is not UNCHANGED:
+        changes["rating"] = rating
+    if comment is not UNCHANGED:
+        changes["comment"] = comment
+    for _ in range(WRITE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                result = _write(user, movie_id, toggle_favorite, dict(changes))
+                if result is not None:
+                    before, after, state = result
+                    record_change(user.pk, before, after)
+                    return state
+        except IntegrityError:
+            # 并发请求已插入同一行（重试走更新分支），或电影不存在
+            if not Movie.objects.filter(pk=movie_id).exists():
+                raise Movie.DoesNotExist(f"电影 {movie_id} 不存在")
+    raise OperationalError(f"用户 {user.pk} 对电影 {movie_id} 的行为被并发修改，重试 {WRITE_ATTEMPTS} 次后仍未写入")
+
+
+def write_batch(user, items):
+    """
+    批量写入已校验的行为，items 为 [{"movie_id": .., 以及 rating/is_favorite/comment 中的若干项}]，
+    movie_id 不重复。返回不存在的电影 id 集合（这些条目不写入）。
+
+    锁住该用户在这些电影上已有的行为行并读出旧值；已有的行按提供的字段组合分组，每组一条
+    INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE，只覆盖该组提供的列；读取时还不存在的行用普通 INSERT，
+    若其间被并发请求插入，唯一约束报错，整批回滚后重新加锁读取再写，差量总是相对实际被替换的旧值。
+    再由新旧取值计算差量，用户统计一次更新、每部电影一条 F() UPDATE。
+    """
+    if not items:
+        return set()
+    for _ in range(WRITE_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return _write_batch(user, items)
+        except IntegrityError:
+            continue
+    raise OperationalError(f"用户 {user.pk} 的批量行为被并发修改，重试 {WRITE_ATTEMPTS} 次后仍未写入")
+
+
+def _write_batch(user, items):
+    movie_ids = [item["movie_id"] for item in items]
+    options = {}
+    if connection.features.supports_update_conflicts_with_target:
+        options["unique_fields"] = ["user", "movie"]
+    existing = set(Movie.objects.filter(id__in=movie_ids).values_list("id", flat=True))
+    before = {
+        values[0]: values
+        for values in UserAction.objects.select_for_update()
+        .filter(user=user, movie_id__in=existing)
+        .values_list(*VALUE_FIELDS)
+    }
+    groups, created = {}, []
+    for item in items:
+        if item["movie_id"] in existing:
+            fields = tuple(sorted(SOURCE_FIELDS & item.keys()))
+            action = UserAction(user=user, movie_id=item["movie_id"], **{f: item[f] for f in fields})
+            if action.movie_id in before:
+                groups.setdefault(fields, []).append(action)
+            else:
+                created.append(action)
+    changes = []
+    for fields, group in groups.items():
+        UserAction.objects.bulk_create(
+            group,
+            update_conflicts=True,
+            update_fields=[*fields, "updated_at"],
+            batch_size=BATCH_SIZE,
+            **options,
+        )
+        for action in group:
+            new = tuple(
+                getattr(action, f) if f in fields else value
+                for f, value in zip(VALUE_FIELDS, before[action.movie_id])
+            )
+            changes.append((before[action.movie_id], new))
+    UserAction.objects.bulk_create(created, batch_size=BATCH_SIZE)
+    changes.extend((None, tuple(getattr(action, f) for f in VALUE_FIELDS)) for action in created)
+    record_changes(user.pk, changes)
+    return set(movie_ids) - existing
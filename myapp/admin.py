@@ -2,14 +2,14 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.html import format_html
 
-from .models import Movie, UserInfo, UserAction
+from .models import Genre, Movie, Person, Region, UserInfo, UserAction
 
 
 @admin.register(Movie)
 class MovieAdmin(admin.ModelAdmin):
     """电影管理"""
     list_display = ['id', 'title', 'score', 'date', 'region', 'type', 'poster_preview']
-    list_filter = ['region', 'type', 'date']
+    list_filter = ['regions', 'genres', 'date']
     search_fields = ['title', 'actors', 'summary']
     list_editable = ['score']
     list_per_page = 20
@@ -20,7 +20,7 @@ class MovieAdmin(admin.ModelAdmin):
             'fields': ('title', 'score', 'date', 'poster')
         }),
         ('详细信息', {
-            'fields': ('actors', 'region', 'type', 'summary')
+            'fields': ('directors', 'actors', 'region', 'type', 'runtime', 'summary')
         }),
     )
     
@@ -97,3 +97,12 @@ class UserActionAdmin(admin.ModelAdmin):
             return format_html('<span title="{}">{}</span>', obj.comment, preview)
         return '-'
     comment_preview.short_description = '评论'
+
+
+@admin.register(Genre, Region, Person)
+class TagAdmin(admin.ModelAdmin):
+    """类型/地区/影人标签管理"""
+    list_display = ['id', 'name']
+    search_fields = ['name']
+    list_per_page = 50
+    ordering = ['name']
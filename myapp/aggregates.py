@@ -0,0 +1,77 @@
+"""
+电影的站内聚合值（评分人数/总和、收藏数、评论数）
+
+UserAction 保存或删除时由信号按新旧取值的差量，用一条带 F() 的 UPDATE 原子更新 Movie 上的聚合列，
+不需要读取或锁定电影行；站内平均分 site_rating 是数据库生成列。
+批量写入（不触发信号）后用 recompute 按电影重算。
+"""
+from django.db.models import Count, F, Q, Sum
+
+from .models import Movie, UserAction
+
+BATCH_SIZE = 1000
+
+
+def contribution(is_favorite, rating, comment):
+    """一条行为对 (评分人数, 评分总和, 收藏数, 评论数) 的贡献"""
+    return (
+        0 if rating is None else 1,
+        rating or 0,
+        1 if is_favorite else 0,
+        1 if comment else 0,
+    )
+
+
+def apply_change(before, after):
+    """
+    before/after 为 (movie_id, contribution) 或 None。
+
+    同一部电影合并为一条 UPDATE；差量为零时不写库。
+    """
+    deltas = {}
+    for item, sign in ((before, -1), (after, 1)):
+        if item is None:
+            continue
+        movie_id, values = item
+        current = deltas.setdefault(movie_id, [0, 0, 0, 0])
+        for i, value in enumerate(values):
+            current[i] += sign * value
+    for movie_id, (rating_count, rating_sum, favorite_count, comment_count) in deltas.items():
+        if not (rating_count or rating_sum or favorite_count or comment_count):
+            continue
+        Movie.objects.filter(pk=movie_id).update(
+            site_rating_count=F("site_rating_count") + rating_count,
+            site_rating_sum=F("site_rating_sum") + rating_sum,
+            favorite_count=F("favorite_count") + favorite_count,
+            comment_count=F("comment_count") + comment_count,
+        )
+
+
+def recompute(movie_ids):
+    """从 UserAction 重算指定电影的聚合列"""
+    movie_ids = list(movie_ids)
+    for start in range(0, len(movie_ids), BATCH_SIZE):
+        batch = movie_ids[start:start + BATCH_SIZE]
+        rows = {
+            row["movie_id"]: row
+            for row in UserAction.objects.filter(movie_id__in=batch)
+            .values("movie_id")
+            .annotate(
+                rating_count=Count("rating"),
+                rating_sum=Sum("rating"),
+                favorite_count=Count("id", filter=Q(is_favorite=True)),
+                comment_count=Count("id", filter=Q(comment__isnull=False, comment__gt="")),
+            )
+            .order_by()
+        }
+        movies = []
+        for movie_id in batch:
+            row = rows.get(movie_id, {})
+            movies.append(Movie(
+                pk=movie_id,
+                site_rating_count=row.get("rating_count", 0),
+                site_rating_sum=row.get("rating_sum") or 0,
+                favorite_count=row.get("favorite_count", 0),
+                comment_count=row.get("comment_count", 0),
+            ))
+        Movie.objects.bulk_update(movies, Movie.AGGREGATE_FIELDS)
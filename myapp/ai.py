@@ -0,0 +1,349 @@
+"""
+AI推荐（通义千问）
+
+根据用户收藏与评分构建 prompt，调用大模型并解析推荐结果。
+调用耗时较长，Web 请求只提交任务，实际执行见 myapp/jobs.py。
+"""
+import hashlib
+import json
+import re
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import UserAction
+from .titles import resolve_titles
+
+
+def format_movie_info(movie, user_rating=None):
+    """格式化电影信息用于AI分析"""
+    return {
+        "title": movie.title,
+        "type": movie.type or "未知",
+        "region": movie.region or "未知",
+        "actors": movie.actors or "未知",
+        "score": movie.score,
+        "rating": user_rating,  # 用户评分
+    }
+
+
+def get_user_preference_data(user, limit=10):
+    """获取用户偏好数据用于AI分析"""
+    # 收藏的10部电影
+    favorites = (
+        UserAction.objects.filter(user=user, is_favorite=True)
+        .select_related("movie")
+        .order_by("-updated_at")[:limit]
+    )
+    
+    # 评分最高的10部电影（按用户评分排序）
+    top_rated = (
+        UserAction.objects.filter(user=user, rating__isnull=False)
+        .select_related("movie")
+        .order_by("-rating", "-updated_at")[:limit]
+    )
+    
+    return {
+        "favorites": [format_movie_info(action.movie, action.rating) for action in favorites],
+        "top_rated": [format_movie_info(action.movie, action.rating) for action in top_rated],
+    }
+
+
+def preference_fingerprint(user):
+    """
+    用户偏好指纹：收藏/评分过的电影 id 及评分的摘要。
+
+    没有任何收藏和评分时返回 None。
+    """
+    rows = list(
+        UserAction.objects.filter(user=user)
+        .filter(Q(is_favorite=True) | Q(rating__isnull=False))
+        .order_by("movie_id")
+        .values_list("movie_id", "is_favorite", "rating")
+    )
+    if not rows:
+        return None
+    return hashlib.sha1(json.dumps(rows).encode()).hexdigest()
+
+
+def _cache_key(user_id):
+    return f"ai_recommend:v1:{user_id}"
+
+
+def get_cached_recommendations(user, fingerprint):
+    """偏好未变化时返回上次的推荐结果，否则返回 None"""
+    entry = cache.get(_cache_key(user.pk))
+    if entry and entry["fingerprint"] == fingerprint:
+        return entry["data"]
+    return None
+
+
+def cache_recommendations(user, fingerprint, data):
+    timeout = getattr(settings, "AI_RECOMMEND_CACHE_TIMEOUT", 24 * 3600)
+    cache.set(_cache_key(user.pk), {"fingerprint": fingerprint, "data": data}, timeout)
+
+
+def invalidate_cache(user_id):
+    """用户的收藏/评分变化时由信号调用"""
+    cache.delete(_cache_key(user_id))
+
+
+def build_recommendation_prompt(user_data):
+    """构建推荐请求的prompt"""
+    favorites_text = ""
+    if user_data['favorites']:
+        favorites_text = "用户收藏的电影：\n" + "\n".join([
+            f"- {m['title']}（类型：{m['type']}，地区：{m['region']}，豆瓣评分：{m['score']}）"
+            for m in user_data['favorites']
+        ])
+    
+    top_rated_text = ""
+    if user_data['top_rated']:
+        top_rated_text = "用户评分最高的电影：\n" + "\n".join([
+            f"- {m['title']}（类型：{m['type']}，地区：{m['region']}，用户评分：{m['rating']}分，豆瓣评分：{m['score']}）"
+            for m in user_data['top_rated']
+        ])
+    
+    prompt = f"""你是一位专业的电影推荐专家。基于用户的观影偏好，请推荐5-8部电影。
+
+{favorites_text}
+
+{top_rated_text}
+
+请分析用户的观影偏好（类型、地区、风格等），然后：
+1. 推荐5-8部符合用户口味的电影
+2. 为每部推荐电影提供简短的推荐理由（20-30字）
+3. 推荐理由要说明为什么这部电影适合这个用户
+
+请以JSON格式返回，格式如下：
+{{
+    "analysis": "对用户观影偏好的简短分析（50字以内）",
+    "recommendations": [
+        {{
+            "title": "电影标题（准确的电影名称）",
+            "type": "电影类型（如：剧情、喜剧、动作等）",
+            "region": "电影地区（如：美国、中国、日本等）",
+            "score": 8.5,
+            "reason": "推荐理由（20-30字）"
+        }}
+    ]
+}}
+
+注意：
+1. 只返回JSON，不要其他文字
+2. 电影标题要准确
+3. type和region字段尽量填写，如果不知道可以填"未知"
+4. score字段填写豆瓣评分（0-10之间的数字），如果不知道可以填null
+5. 推荐理由要具体说明为什么适合这个用户"""
+    
+    return prompt
+
+
+def call_qwen_api(prompt):
+    """调用通义千问API"""
+    api_key = getattr(settings, 'QWEN_API_KEY', '')
+    api_url = getattr(settings, 'QWEN_API_URL', 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation')
+    
+    if not api_key:
+        return None, None, "API Key未配置"
+    
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    
+    data = {
+        "model": "qwen-turbo",  # 或 "qwen-plus", "qwen-max"
+        "input": {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "你是一位专业的电影推荐专家，擅长分析用户观影偏好并推荐合适的电影。"
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        },
+        "parameters": {
+            "temperature": 0.7,
+            "max_tokens": 2000
+        }
+    }
+    
+    try:
+        response = requests.post(api_url, headers=headers, json=data, timeout=30)
+        response.raise_for_status()
+        result = response.json()
+        
+        # 解析通义千问的响应格式（支持多种格式）
+        content = None
+        raw_response = str(result)  # 保存原始响应用于调试
+        
+        # 格式1: output.text (新版本API)
+        if 'output' in result and 'text' in result['output']:
+            content = result['output']['text']
+        # 格式2: output.choices[0].message.content (旧版本API)
+        elif 'output' in result and 'choices' in result['output']:
+            if len(result['output']['choices']) > 0:
+                if 'message' in result['output']['choices'][0]:
+                    content = result['output']['choices'][0]['message']['content']
+                elif 'text' in result['output']['choices'][0]:
+                    content = result['output']['choices'][0]['text']
+        
+        if content:
+            return content, raw_response, None
+        else:
+            return None, raw_response, f"API响应格式错误，无法提取内容。响应: {result}"
+    except requests.exceptions.RequestException as e:
+        return None, None, f"API请求失败: {str(e)}"
+    except Exception as e:
+        return None, None, f"API调用异常: {str(e)}"
+
+
+def extract_json_from_response(text):
+    """从AI响应中提取JSON"""
+    # 尝试直接解析
+    try:
+        return json.loads(text)
+    except:
+        pass
+    
+    # 尝试提取JSON块
+    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
+    if json_match:
+        try:
+            return json.loads(json_match.group())
+        except:
+            pass
+    
+    # 尝试提取```json代码块
+    json_block_match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
+    if json_block_match:
+        try:
+            return json.loads(json_block_match.group(1))
+        except:
+            pass
+    
+    # 尝试提取```代码块
+    code_block_match = re.search(r'```\s*(\{.*?\})\s*```', text, re.DOTALL)
+    if code_block_match:
+        try:
+            return json.loads(code_block_match.group(1))
+        except:
+            pass
+    
+    return None
+
+
+def generate_recommendations(user):
+    """
+    生成AI推荐（耗时数秒到数十秒，由后台任务调用，见 myapp/jobs.py）。
+
+    返回 (响应数据, HTTP状态码)。成功的结果按偏好指纹缓存。
+    """
+    # 先取指纹：生成期间偏好若有变化，缓存的结果不会被误用
+    fingerprint = preference_fingerprint(user)
+
+    # 获取用户偏好数据
+    user_data = get_user_preference_data(user)
+    
+    # 检查是否有足够的数据
+    if not user_data['favorites'] and not user_data['top_rated']:
+        return {
+            "success": False,
+            "error": "数据不足",
+            "message": "请先收藏或评分一些电影，以便AI分析你的观影偏好"
+        }, 400
+    
+    # 构建prompt
+    prompt = build_recommendation_prompt(user_data)
+    
+    # 调用AI API
+    ai_response, raw_response, error_msg = call_qwen_api(prompt)
+    
+    if not ai_response:
+        return {
+            "success": False,
+            "error": "API调用失败",
+            "message": error_msg or "请稍后重试",
+            "raw_response": raw_response if raw_response else None  # 返回原始响应用于调试
+        }, 500
+    
+    # 解析AI返回的JSON
+    try:
+        ai_data = extract_json_from_response(ai_response)
+        
+        if not ai_data:
+            # 如果JSON解析失败，返回原始回答和错误信息
+            return {
+                "success": False,
+                "error": "JSON解析失败",
+                "message": "AI返回格式不正确，但已显示原始回答",
+                "raw_ai_response": ai_response,  # 返回原始AI回答
+                "raw_api_response": raw_response  # 返回完整API响应
+            }, 500
+        
+        # 直接使用AI返回的电影信息，数据库中能匹配到的补充海报等信息
+        ai_recs = []
+        for rec in ai_data.get('recommendations', []):
+            title = rec.get('title', '').strip()
+            if title:
+                ai_recs.append((title, rec))
+        # 整批片名一次解析（规范化匹配 + 模糊匹配）
+        matched = resolve_titles([title for title, _ in ai_recs])
+        recommendations = []
+        for title, rec in ai_recs:
+            movie = matched.get(title)
+            
+            # 使用AI返回的数据，如果数据库中有则补充海报等信息
+            recommendation = {
+                "id": movie.id if movie else None,
+                "title": title,
+                "poster": movie.poster if movie and movie.poster else "",
+                "score": rec.get('score') or (movie.score if movie else None),
+                "type": rec.get('type') or (movie.type if movie else "") or "未知",
+                "region": rec.get('region') or (movie.region if movie else "") or "未知",
+                "reason": rec.get('reason', '推荐给你')
+            }
+            recommendations.append(recommendation)
+        
+        # 构建返回数据，包含原始回答
+        response_data = {
+            "success": True,
+            "analysis": ai_data.get('analysis', '基于你的观影偏好，为你推荐以下电影'),
+            "recommendations": recommendations,
+            "raw_ai_response": ai_response,  # 添加原始AI回答
+        }
+        
+        if not recommendations:
+            # 即使没有推荐，也返回原始回答
+            response_data.update({
+                "success": False,
+                "error": "无推荐数据",
+                "message": "AI未返回推荐电影，但已显示AI的原始回答",
+            })
+            return response_data, 404
+        
+        cache_recommendations(user, fingerprint, response_data)
+        return response_data, 200
+    except json.JSONDecodeError as e:
+        # JSON解析失败时，返回原始回答
+        return {
+            "success": False,
+            "error": "JSON解析失败",
+            "message": f"解析错误: {str(e)}，但已显示原始回答",
+            "raw_ai_response": ai_response,  # 返回原始AI回答
+            "raw_api_response": raw_response  # 返回完整API响应
+        }, 500
+    except Exception as e:
+        return {
+            "success": False,
+            "error": "处理失败",
+            "message": str(e),
+            "raw_ai_response": ai_response if 'ai_response' in locals() else None,
+            "raw_api_response": raw_response if 'raw_response' in locals() else None
+        }, 500
\ No newline at end of file
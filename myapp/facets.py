@@ -0,0 +1,59 @@
+"""
+筛选项（facet）统计
+
+影片库和排行榜的地区/类型/年代下拉框共用一份按标签计数的结果，
+计算一次后放入缓存；电影增删改及批量导入时通过信号失效。
+"""
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+
+CACHE_KEY = "movie_facets:v1"
+# 兜底过期时间，正常情况下由信号主动失效
+CACHE_TIMEOUT = 6 * 3600
+# 每个维度最多展示的选项数
+FACET_LIMIT = 50
+
+
+def _tag_counts(link_model, name_field):
+    rows = (
+        link_model.objects.values(name_field)
+        .annotate(n=Count("movie_id"))
+        .order_by("-n", name_field)[:FACET_LIMIT]
+    )
+    return [(row[name_field], row["n"]) for row in rows]
+
+
+def compute_facets():
+    from .models import Movie, MovieGenre, MovieRegion
+
+    decades = Counter()
+    years = (
+        Movie.objects.filter(date__isnull=False)
+        .annotate(year=ExtractYear("date"))
+        .values("year")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for row in years:
+        decades[row["year"] // 10 * 10] += row["n"]
+    return {
+        "genres": _tag_counts(MovieGenre, "genre__name"),
+        "regions": _tag_counts(MovieRegion, "region__name"),
+        "decades": sorted(decades.items(), reverse=True),
+    }
+
+
+def get_facets():
+    """返回 {"genres": [(名称, 数量)], "regions": [...], "decades": [(1990, 数量)]}"""
+    facets = cache.get(CACHE_KEY)
+    if facets is None:
+        facets = compute_facets()
+        cache.set(CACHE_KEY, facets, CACHE_TIMEOUT)
+    return facets
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
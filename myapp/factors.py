@@ -0,0 +1,284 @@
+"""
+矩阵分解协同过滤（隐式反馈 ALS）
+
+离线把 UserAction 看作隐式反馈矩阵：用户对收藏、评分或评论过的电影偏好为 1，评分低于 5 的偏好为 0，
+既未收藏、评分也没有评论的行（如取消收藏后留下的）不参与训练；
+置信度 = 1 + alpha * 权重（收藏、高分各加 1）。交替固定一侧、用共轭梯度求解另一侧的因子，
+全部运算是按 CSR 分块的向量化 NumPy，分块在线程池中并行（NumPy 运算期间释放 GIL）。
+
+训练结果按版本保存为 .npy 文件：
+
+    data/factors/20240101120000/{user_ids,item_ids,user_factors,item_factors}.npy, meta.json
+    data/factors/CURRENT          当前版本号（原子替换，线上按修改时间热加载）
+
+线上推荐 = 电影因子矩阵 × 用户因子向量，去掉用户已有行为的电影后取 top-N。
+"""
+import json
+import os
+import shutil
+import threading
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+FORMAT_VERSION = 1
+ARTIFACTS = ("user_ids", "item_ids", "user_factors", "item_factors")
+# 保留的历史版本数（不含当前版本），便于回滚
+KEEP_VERSIONS = 3
+
+# 低于该评分视为不喜欢（偏好为 0）
+DISLIKE_RATING = 5
+# 不低于该评分额外加权
+HIGH_RATING = 8
+# 每个计算块包含的行为数，控制临时矩阵的内存占用
+CHUNK_NNZ = 1 << 16
+
+
+class FactorModel:
+    """用户/电影因子矩阵；ids 升序，用二分查找定位行"""
+
+    def __init__(self, user_ids, item_ids, user_factors, item_factors, meta=None):
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user_factors = user_factors
+        self.item_factors = item_factors
+        self.meta = meta or {}
+
+    @property
+    def version(self):
+        return self.meta.get("version")
+
+    def _position(self, user_id):
+        pos = np.searchsorted(self.user_ids, user_id)
+        if pos < len(self.user_ids) and self.user_ids[pos] == user_id:
+            return pos
+        return None
+
+    def recommend(self, user_id, exclude=(), limit=24):
+        """返回 top-N 电影 id；用户不在模型中（训练后才有行为的新用户）时返回 None"""
+        pos = self._position(user_id)
+        if pos is None:
+            return None
+        scores = self.item_factors @ self.user_factors[pos]
+        exclude = np.fromiter(exclude, dtype=self.item_ids.dtype)
+        if len(exclude):
+            idx = np.searchsorted(self.item_ids, exclude)
+            idx = idx[idx < len(self.item_ids)]
+            scores[idx[np.isin(self.item_ids[idx], exclude)]] = -np.inf
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return self.item_ids[top[np.isfinite(scores[top])]].tolist()
+
+    def save(self, root):
+        """写入新版本目录并切换 CURRENT，返回版本号"""
+        root = Path(root)
+        root.mkdir(parents=True, exist_ok=True)
+        version = time.strftime("%Y%m%d%H%M%S")
+        while (root / version).exists():
+            time.sleep(1)
+            version = time.strftime("%Y%m%d%H%M%S")
+        self.meta.update(version=version, format=FORMAT_VERSION)
+        tmp_dir = root / f".{version}.tmp"
+        tmp_dir.mkdir()
+        for name in ARTIFACTS:
+            np.save(tmp_dir / f"{name}.npy", getattr(self, name))
+        (tmp_dir / "meta.json").write_text(json.dumps(self.meta, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp_dir, root / version)
+        # 原子替换，线上进程不会读到指向不完整版本的 CURRENT
+        tmp_current = root / "CURRENT.tmp"
+        tmp_current.write_text(version, encoding="utf-8")
+        os.replace(tmp_current, root / "CURRENT")
+        _prune_versions(root, version)
+        return version
+
+    @classmethod
+    def load(cls, root, version=None):
+        root = Path(root)
+        version = version or (root / "CURRENT").read_text(encoding="utf-8").strip()
+        path = root / version
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format") != FORMAT_VERSION:
+            raise ValueError(f"因子模型格式版本不匹配: {meta.get('format')}")
+        arrays = {name: np.load(path / f"{name}.npy", allow_pickle=False) for name in ARTIFACTS}
+        return cls(meta=meta, **arrays)
+
+
+def _prune_versions(root, current):
+    versions = sorted(p.name for p in root.iterdir() if p.is_dir() and p.name.isdigit() and p.name != current)
+    for name in versions[:-KEEP_VERSIONS]:
+        shutil.rmtree(root / name, ignore_errors=True)
+
+
+def _csr(rows, cols, n_rows, *values):
+    """按行排序，返回 (indptr, cols, *values)"""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return (indptr, cols[order], *(v[order] for v in values))
+
+
+def _row_chunks(indptr, chunk_nnz=CHUNK_NNZ):
+    """把行切成每块约 chunk_nnz 个非零元的区间 [(start, end), ...]"""
+    starts = np.searchsorted(indptr, np.arange(0, indptr[-1], chunk_nnz), side="right") - 1
+    bounds = np.unique(np.append(starts, len(indptr) - 1))
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def _solve(X, Y, csr, regularization, cg_steps, pool):
+    """
+    固定 Y 更新 X 的每一行（就地），对每行用 cg_steps 步共轭梯度近似求解
+        (YᵀY + λI + Yᵀ(Cu - I)Y) x_u = Yᵀ Cu p_u
+    以上一轮的 X 为初值，几步即可收敛。
+    """
+    indptr, cols, conf, pref = csr
+    gram = Y.T @ Y + regularization * np.eye(Y.shape[1], dtype=Y.dtype)
+
+    def run(start, end):
+        lo, hi = indptr[start], indptr[end]
+        segments = indptr[start:end] - lo
+        rows = np.repeat(np.arange(end - start), np.diff(indptr[start:end + 1]))
+        Yi = Y[cols[lo:hi]]
+        extra = conf[lo:hi] - 1
+
+        def matvec(V):
+            dots = np.einsum("ij,ij->i", Yi, V[rows])
+            return V @ gram + np.add.reduceat((extra * dots)[:, None] * Yi, segments)
+
+        x = X[start:end]
+        residual = np.add.reduceat((conf[lo:hi] * pref[lo:hi])[:, None] * Yi, segments) - matvec(x)
+        direction = residual.copy()
+        rs = np.einsum("ij,ij->i", residual, residual)
+        for _ in range(cg_steps):
+            ad = matvec(direction)
+            step = rs / np.maximum(np.einsum("ij,ij->i", direction, ad), 1e-12)
+            x += step[:, None] * direction
+            residual -= step[:, None] * ad
+            rs_new = np.einsum("ij,ij->i", residual, residual)
+            direction = residual + (rs_new / np.maximum(rs, 1e-12))[:, None] * direction
+            rs = rs_new
+
+    # 各块写 X 中互不重叠的行
+    list(pool.map(lambda bounds: run(*bounds), _row_chunks(indptr)))
+
+
+def train(users, items, confidence, preference, n_users, n_items, factors=64, regularization=0.1,
+          iterations=15, cg_steps=3, workers=None, seed=0, progress=None):
+    """
+    隐式反馈 ALS。users/items 为 0 起的行列号，每个 (用户, 电影) 至多出现一次，
+    且每个用户、每部电影至少有一条行为（空行会让 reduceat 出错）。
+
+    返回 (用户因子, 电影因子)，float32。
+    """
+    rng = np.random.default_rng(seed)
+    user_factors = (rng.standard_normal((n_users, factors)) * 0.01).astype(np.float32)
+    item_factors = (rng.standard_normal((n_items, factors)) * 0.01).astype(np.float32)
+    confidence = confidence.astype(np.float32)
+    preference = preference.astype(np.float32)
+    by_user = _csr(users, items, n_users, confidence, preference)
+    by_item = _csr(items, users, n_items, confidence, preference)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        for iteration in range(iterations):
+            _solve(user_factors, item_factors, by_user, regularization, cg_steps, pool)
+            _solve(item_factors, user_factors, by_item, regularization, cg_steps, pool)
+            if progress:
+                progress(iteration + 1)
+    return user_factors, item_factors
+
+
+def load_interactions():
+    """
+    读取收藏、评分或评论过的 UserAction，返回 (用户 id, 电影 id, 是否收藏, 评分) 四个数组，未评分为 nan。
+
+    取消收藏后留下的空行不算正反馈，否则“取消收藏”反而会把模型推向这部电影。
+    """
+    from django.db.models import Q
+
+    from .models import UserAction
+
+    user_ids, movie_ids, favorites, ratings = array("q"), array("q"), array("b"), array("f")
+    rows = (
+        UserAction.objects.filter(Q(is_favorite=True) | Q(rating__isnull=False) | Q(comment__gt=""))
+        .values_list("user_id", "movie_id", "is_favorite", "rating")
+        .iterator(chunk_size=10000)
+    )
+    for user_id, movie_id, is_favorite, rating in rows:
+        user_ids.append(user_id)
+        movie_ids.append(movie_id)
+        favorites.append(is_favorite)
+        ratings.append(np.nan if rating is None else rating)
+    return (
+        np.frombuffer(user_ids, dtype=np.int64), np.frombuffer(movie_ids, dtype=np.int64),
+        np.frombuffer(favorites, dtype=np.int8).astype(bool), np.frombuffer(ratings, dtype=np.float32),
+    )
+
+
+def build_model(user_ids, movie_ids, favorites, ratings, alpha=10.0, **params):
+    """由行为数组训练 FactorModel；params 透传给 train"""
+    # nan 与任何值比较都为 False：未评分既不算不喜欢，也不算高分
+    preference = (~(ratings < DISLIKE_RATING)).astype(np.float32)
+    weight = 1.0 + favorites + (ratings >= HIGH_RATING)
+    confidence = 1.0 + alpha * weight
+    user_index, users = np.unique(user_ids, return_inverse=True)
+    item_index, items = np.unique(movie_ids, return_inverse=True)
+    started = time.time()
+    user_factors, item_factors = train(
+        users, items, confidence, preference, len(user_index), len(item_index), **params
+    )
+    meta = {
+        "trained_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "seconds": round(time.time() - started, 1),
+        "users": len(user_index),
+        "items": len(item_index),
+        "interactions": len(user_ids),
+        "alpha": alpha,
+        **{k: v for k, v in params.items() if k not in ("workers", "progress")},
+    }
+    return FactorModel(user_index, item_index, user_factors, item_factors, meta)
+
+
+def build_from_db(**params):
+    return build_model(*load_interactions(), **params)
+
+
+def factors_dir():
+    return Path(getattr(settings, "RECOMMEND_FACTORS_DIR", settings.BASE_DIR / "data" / "factors"))
+
+
+_cache_lock = threading.Lock()
+_cached = {"path": None, "mtime": None, "model": None}
+
+
+def get_model():
+    """加载（并在 CURRENT 切换版本时热更新）因子模型，尚未训练时返回 None"""
+    root = factors_dir()
+    current = root / "CURRENT"
+    try:
+        mtime = os.stat(current).st_mtime
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached["path"] != root or _cached["mtime"] != mtime:
+            _cached.update(path=root, mtime=mtime, model=FactorModel.load(root))
+        return _cached["model"]
+
+
+def recommend_for_user(user, limit=24):
+    """
+    协同过滤推荐，排除用户所有已有行为的电影。
+
+    返回推荐电影 id 列表；模型未训练或用户不在模型中时返回 None，由调用方回退到相似度索引。
+    """
+    model = get_model()
+    if model is None:
+        return None
+    from .models import UserAction
+
+    seen = UserAction.objects.filter(user=user).values_list("movie_id", flat=True)
+    return model.recommend(user.pk, exclude=list(seen), limit=limit)
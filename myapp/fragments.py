@@ -0,0 +1,40 @@
+"""
+首页共享片段缓存
+
+轮播图、高分榜、最新上映以及匿名用户的热门推荐对所有访客相同，
+用模板 {% cache %} 缓存渲染结果（缓存别名 template_fragments）；
+视图中的查询集是惰性的，命中缓存时不会访问数据库。
+电影增删改及批量导入时通过信号整体失效。
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+from django.core.cache.utils import make_template_fragment_key
+
+# 片段名 -> 模板中 {% cache %} 的 vary_on 取值组合
+HOME_FRAGMENTS = {
+    "home_carousel": [[True], [False]],  # 按是否登录区分（登录后显示评论按钮）
+    "home_top_rated": [[]],
+    "home_latest": [[]],
+    "home_hot": [[]],
+}
+
+
+def fragment_timeout():
+    return getattr(settings, "HOME_FRAGMENT_TIMEOUT", 600)
+
+
+def _fragment_cache():
+    try:
+        return caches["template_fragments"]
+    except InvalidCacheBackendError:
+        return caches["default"]
+
+
+def invalidate_home():
+    keys = [
+        make_template_fragment_key(name, vary_on)
+        for name, variants in HOME_FRAGMENTS.items()
+        for vary_on in variants
+    ]
+    _fragment_cache().delete_many(keys)
@@ -0,0 +1,182 @@
+"""
+爬虫结果批量导入
+
+按豆瓣条目 id（Movie.douban_id）upsert：每批一条 INSERT ... ON CONFLICT/ON DUPLICATE KEY UPDATE，
+每批单独提交，重复导入同一份文件不会产生重复电影。导入后由 movies_imported 信号
+补做标签、检索索引与缓存失效（标题匹配键在写入时已经算好）。
+
+早期由 spiders/sql.py 导入、没有 douban_id 的电影，按（标题匹配键, 上映日期）认领后再更新，不会重复插入。
+
+每晚的刷新使用增量模式：先按豆瓣 id 取回已有电影的评分与评价人数，只写入新电影和这两项有变化的电影，
+只有数值变化的电影不再重建标签与检索索引。
+
+详情页抓取结果（简介、片长、导演、完整演员表）由 import_details 按豆瓣 id 分批写回已有电影；
+已补充过详情的电影，之后导入榜单数据时不再用榜单里不完整的演员表覆盖。
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+
+from . import fragments
+from .models import Movie
+from .signals import movies_imported
+from .titles import normalize_title
+
+BATCH_SIZE = 1000
+# 每次导入都会覆盖的列；记录中出现时才覆盖的列（如简介）按记录分组写入
+BASE_FIELDS = ("title", "title_key", "score", "vote_count", "rank", "date", "poster", "actors", "region", "type")
+OPTIONAL_FIELDS = ("summary",)
+# 增量同步时已有电影只更新这些列
+SYNC_FIELDS = ("score", "vote_count", "rank")
+
+
+def _adopt_legacy(rows, known):
+    """
+    为库中没有 douban_id、标题与日期相同的电影补上 douban_id，返回被认领的豆瓣 id 集合。
+
+    known 为库中已存在的豆瓣 id。
+    """
+    wanted = {}
+    for douban_id, fields in rows.items():
+        if douban_id not in known:
+            wanted.setdefault((fields["title_key"], fields["date"]), douban_id)
+    if not wanted:
+        return set()
+    adopted = []
+    legacy = Movie.objects.filter(
+        douban_id__isnull=True, title_key__in={key for key, _ in wanted}
+    ).values_list("id", "title_key", "date")
+    for pk, title_key, release_date in legacy:
+        douban_id = wanted.pop((title_key, release_date), None)
+        if douban_id is not None:
+            adopted.append(Movie(pk=pk, douban_id=douban_id))
+    Movie.objects.bulk_update(adopted, ["douban_id"])
+    return {movie.douban_id for movie in adopted}
+
+
+def _upsert(rows, update_fields=None, exclude=()):
+    """
+    写入 rows（{豆瓣 id: 字段}）：新条目整行插入，已有条目只覆盖 update_fields，
+    默认为 BASE_FIELDS 加上记录中出现的可选字段，再去掉 exclude。
+    """
+    options = {}
+    if connection.features.supports_update_conflicts_with_target:
+        options["unique_fields"] = ["douban_id"]
+    groups = {}
+    for fields in rows.values():
+        extra = tuple(f for f in OPTIONAL_FIELDS if f in fields)
+        groups.setdefault(extra, []).append(fields)
+    for extra, group in groups.items():
+        Movie.objects.bulk_create(
+            [Movie(**fields) for fields in group],
+            update_conflicts=True,
+            update_fields=[f for f in update_fields or (*BASE_FIELDS, *extra) if f not in exclude],
+            **options,
+        )
+
+
+def import_batch(records, incremental=False):
+    """
+    在一个事务内写入一批记录（spiders.records.movie_fields 的结果），
+    返回 Counter(read, written, updated, unchanged, adopted, skipped, batches)。
+
+    全量模式覆盖每条记录的全部字段；增量模式下已有电影只在评分或评价人数变化时
+    更新 SYNC_FIELDS，其余跳过，新电影与认领的旧记录仍整行写入。
+    """
+    rows = {}
+    for fields in records:
+        if fields.get("douban_id") and fields.get("title"):
+            # 同一批内重复出现的条目以最后一次为准
+            rows[fields["douban_id"]] = dict(fields, title_key=normalize_title(fields["title"]))
+    result = Counter(read=len(records), skipped=len(records) - len(rows), batches=1)
+    if not rows:
+        return result
+    with transaction.atomic():
+        existing, enriched = {}, set()
+        current = Movie.objects.filter(douban_id__in=rows.keys()).values_list(
+            "douban_id", "score", "vote_count", "directors"
+        )
+        for douban_id, score, vote_count, directors in current:
+            existing[douban_id] = (score, vote_count)
+            if directors is not None:
+                enriched.add(douban_id)
+        adopted = _adopt_legacy(rows, existing.keys())
+        result["adopted"] = len(adopted)
+        if incremental:
+            full = {k: v for k, v in rows.items() if k not in existing}
+            changed = {
+                k: v for k, v in rows.items()
+                if k in existing and existing[k] != (v["score"], v["vote_count"])
+            }
+            result["unchanged"] = len(rows) - len(full) - len(changed)
+        else:
+            full, changed = rows, {}
+        if full:
+            _upsert({k: v for k, v in full.items() if k not in enriched})
+            _upsert({k: v for k, v in full.items() if k in enriched}, exclude=("actors",))
+        if changed:
+            _upsert(changed, SYNC_FIELDS)
+        movie_ids = []
+        if full:
+            movie_ids = list(Movie.objects.filter(douban_id__in=full.keys()).values_list("id", flat=True))
+    result["written"], result["updated"] = len(full), len(changed)
+    if movie_ids:
+        movies_imported.send(sender=Movie, movie_ids=movie_ids)
+    elif changed:
+        # 只改了评分等数值，标签与检索索引不变，首页片段仍需失效
+        fragments.invalidate_home()
+    return result
+
+
+def update_details(records):
+    """
+    按豆瓣 id 把一批详情页抓取结果（spiders.records.detail_fields 的结果）写回已有电影，
+    返回 Counter(read, updated, missing, batches)。库中没有的电影不新建。
+    """
+    rows = {fields["douban_id"]: fields for fields in records}
+    result = Counter(read=len(records), batches=1)
+    with transaction.atomic():
+        ids = dict(Movie.objects.filter(douban_id__in=rows.keys()).values_list("douban_id", "id"))
+        groups = {}
+        for douban_id, fields in rows.items():
+            if douban_id in ids:
+                columns = tuple(sorted(f for f in fields if f != "douban_id"))
+                groups.setdefault(columns, []).append(Movie(pk=ids[douban_id], **fields))
+        for columns, movies in groups.items():
+            Movie.objects.bulk_update(movies, columns)
+    result["updated"], result["missing"] = len(ids), len(rows) - len(ids)
+    if ids:
+        # 演员表与简介变了：重建演员关联与检索索引
+        movies_imported.send(sender=Movie, movie_ids=list(ids.values()))
+    return result
+
+
+def _in_batches(records, batch_size, handle, progress=None):
+    total = Counter()
+    batch = []
+    for fields in records:
+        batch.append(fields)
+        if len(batch) >= batch_size:
+            total.update(handle(batch))
+            batch = []
+            if progress:
+                progress(total)
+    if batch:
+        total.update(handle(batch))
+        if progress:
+            progress(total)
+    return total
+
+
+def import_records(records, batch_size=BATCH_SIZE, incremental=False, progress=None):
+    """
+    分批导入可迭代的记录，内存占用只与 batch_size 有关。
+
+    progress(Counter) 在每批提交后以累计结果回调。
+    """
+    return _in_batches(records, batch_size, lambda batch: import_batch(batch, incremental), progress)
+
+
+def import_details(records, batch_size=BATCH_SIZE, progress=None):
+    """分批写回详情页抓取结果，参数同 import_records"""
+    return _in_batches(records, batch_size, update_details, progress)
@@ -0,0 +1,129 @@
+"""
+AI推荐后台任务
+
+调用大模型一次要 5~30 秒，不能占着 Web worker 等待。提交接口只写入一条 AIRecommendJob
+并立即返回任务 id，前端轮询任务状态取结果。任务的执行方式由 settings.AI_JOB_MODE 决定：
+
+- 'thread'：在 Web 进程内的小线程池中执行（单机部署，默认）
+- 'worker'：只入库，由独立进程 python manage.py run_ai_worker 领取执行
+
+领取任务用一条 UPDATE ... WHERE status='pending' 完成，线程池和多个工作进程同时运行也不会重复执行。
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import ai
+from .models import AIRecommendJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+UNFINISHED = (AIRecommendJob.STATUS_PENDING, AIRecommendJob.STATUS_RUNNING)
+
+
+def _mode():
+    return getattr(settings, "AI_JOB_MODE", "thread")
+
+
+def _timeout():
+    """任务超过该秒数仍未完成视为失败（进程重启等导致任务丢失）"""
+    return getattr(settings, "AI_JOB_TIMEOUT", 120)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "AI_JOB_WORKERS", 4),
+                thread_name_prefix="ai-job",
+            )
+        return _executor
+
+
+def submit(user):
+    """
+    提交AI推荐任务并返回该任务。
+
+    同一用户已有未完成的任务时直接返回它，重复点击不会重复调用大模型。
+    """
+    deadline = timezone.now() - timedelta(seconds=_timeout())
+    job = (
+        AIRecommendJob.objects.filter(user=user, status__in=UNFINISHED, created_at__gte=deadline)
+        .order_by("-created_at")
+        .first()
+    )
+    if job is not None:
+        return job
+    job = AIRecommendJob.objects.create(user=user)
+    if _mode() == "thread":
+        job_id = job.pk
+        # 事务提交后再交给线程池，避免工作线程读不到这条任务
+        transaction.on_commit(lambda: _get_executor().submit(run_job, job_id))
+    return job
+
+
+def _claim(job_id):
+    """pending -> running，返回是否由当前调用者领取成功"""
+    return AIRecommendJob.objects.filter(pk=job_id, status=AIRecommendJob.STATUS_PENDING).update(
+        status=AIRecommendJob.STATUS_RUNNING, started_at=timezone.now()
+    ) == 1
+
+
+def run_job(job_id):
+    """领取并执行一个任务，返回是否执行了该任务"""
+    try:
+        if not _claim(job_id):
+            return False
+        job = AIRecommendJob.objects.select_related("user").get(pk=job_id)
+        try:
+            result, status_code = ai.generate_recommendations(job.user)
+        except Exception as exc:
+            logger.exception("AI推荐任务 %s 执行失败", job_id)
+            result, status_code = {"success": False, "error": "处理失败", "message": str(exc)}, 500
+        # 只更新仍在运行中的任务：已被 expire_stale 判为超时的任务不再改回完成，也不覆盖 finished_at
+        updated = AIRecommendJob.objects.filter(pk=job_id, status=AIRecommendJob.STATUS_RUNNING).update(
+            status=AIRecommendJob.STATUS_DONE if result.get("success") else AIRecommendJob.STATUS_FAILED,
+            result=result,
+            status_code=status_code,
+            finished_at=timezone.now(),
+        )
+        if not updated:
+            logger.warning("AI推荐任务 %s 已不在运行状态（可能已超时），丢弃本次结果", job_id)
+        return True
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            # 线程池中的线程不经过请求周期，需要自行释放数据库连接
+            connection.close()
+
+
+def pending_job_ids(limit=10):
+    """按提交顺序返回待执行的任务 id（工作进程用）"""
+    return list(
+        AIRecommendJob.objects.filter(status=AIRecommendJob.STATUS_PENDING)
+        .order_by("created_at")
+        .values_list("id", flat=True)[:limit]
+    )
+
+
+def expire_stale(job):
+    """任务超时仍未完成时标记为失败，返回更新后的任务"""
+    if job.is_finished or job.created_at >= timezone.now() - timedelta(seconds=_timeout()):
+        return job
+    result = {"success": False, "error": "生成超时", "message": "AI推荐生成超时，请稍后重试"}
+    updated = AIRecommendJob.objects.filter(pk=job.pk, status__in=UNFINISHED).update(
+        status=AIRecommendJob.STATUS_FAILED, result=result, status_code=504, finished_at=timezone.now()
+    )
+    if updated:
+        job.status, job.result, job.status_code = AIRecommendJob.STATUS_FAILED, result, 504
+    else:
+        job.refresh_from_db()
+    return job
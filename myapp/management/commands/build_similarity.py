@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import similarity
+
+
+class Command(BaseCommand):
+    help = "离线构建电影 item-item 相似度索引"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=50, help="每部电影保留的近邻数")
+        parser.add_argument("--posting-limit", type=int, default=200, help="每个特征参与候选生成的电影数上限")
+        parser.add_argument("--output", default=None, help="索引输出路径，默认使用 RECOMMEND_INDEX_PATH")
+
+    def handle(self, *args, **options):
+        started = time.time()
+        index = similarity.build_from_db(top_k=options["top_k"], posting_limit=options["posting_limit"])
+        path = options["output"] or similarity.index_path()
+        index.save(path)
+        self.stdout.write(self.style.SUCCESS(
+            f"已构建 {len(index)} 部电影、{len(index.neighbors)} 条近邻，耗时 {time.time() - started:.1f}s -> {path}"
+        ))
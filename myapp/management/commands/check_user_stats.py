@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import stats
+from myapp.models import UserStats
+
+
+class Command(BaseCommand):
+    help = "校验物化的用户统计与用户行为是否一致"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fix", action="store_true", help="重建不一致的统计")
+        parser.add_argument("--user", type=int, action="append", help="只校验指定用户 id，可重复")
+
+    def handle(self, *args, **options):
+        rows = UserStats.objects.select_related("user").order_by("user_id")
+        if options["user"]:
+            rows = rows.filter(user_id__in=options["user"])
+        checked, mismatched = 0, []
+        for row in rows.iterator():
+            checked += 1
+            fields = stats.diff_state(stats.state_of(row), stats.aggregate_state(row.user))
+            if not fields:
+                continue
+            mismatched.append(row.user_id)
+            self.stdout.write(self.style.WARNING(f"用户 {row.user_id} 不一致: {', '.join(fields)}"))
+            if options["fix"]:
+                stats.rebuild(row.user)
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS(f"已校验 {checked} 个用户，全部一致"))
+        elif options["fix"]:
+            self.stdout.write(self.style.SUCCESS(f"已修复 {len(mismatched)} / {checked} 个用户的统计"))
+        else:
+            raise CommandError(f"{len(mismatched)} / {checked} 个用户的统计不一致，可加 --fix 重建")
@@ -0,0 +1,32 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import importer
+from spiders.records import DETAILS_PATH, detail_fields, iter_records
+
+
+class Command(BaseCommand):
+    help = "把详情页抓取结果（spiders/details.py 的输出）按豆瓣 id 分批写回电影"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=str(DETAILS_PATH), help="详情页抓取结果文件")
+        parser.add_argument("--batch-size", type=int, default=importer.BATCH_SIZE, help="每批写入并提交的条数")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"文件不存在: {path}")
+        started = time.time()
+        errors = []
+        records = (
+            fields for fields in map(detail_fields, iter_records(path, errors=errors)) if fields is not None
+        )
+        total = importer.import_details(records, batch_size=options["batch_size"])
+        for lineno, exc in errors:
+            self.stdout.write(self.style.WARNING(f"第 {lineno} 行解析失败: {exc}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"已更新 {total['updated']} 部电影（库中没有 {total['missing']}），共 {total['read']} 条 / "
+            f"{total['batches']} 批，耗时 {time.time() - started:.1f}s"
+        ))
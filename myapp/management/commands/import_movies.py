@@ -0,0 +1,50 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp import importer
+from spiders.records import default_path, iter_records, movie_fields
+
+
+class Command(BaseCommand):
+    help = "流式导入爬虫结果（JSONL/JSONL.gz 或旧的 ur.txt），按豆瓣 id 去重更新"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", default=None,
+                            help="爬虫输出文件，默认 spiders/ur.jsonl，不存在时用 spiders/ur.txt")
+        parser.add_argument("--batch-size", type=int, default=importer.BATCH_SIZE, help="每批写入并提交的条数")
+        parser.add_argument("--incremental", action="store_true",
+                            help="增量同步：已有电影只在评分或评价人数变化时更新")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"] or default_path())
+        if not path.exists():
+            raise CommandError(f"文件不存在: {path}")
+        started = time.time()
+        errors = []
+        records = (movie_fields(item) for item in iter_records(path, errors=errors))
+
+        def progress(total):
+            if options["verbosity"] >= 2:
+                elapsed = time.time() - started
+                self.stdout.write(f"已处理 {total['read']} 条，{total['read'] / max(elapsed, 1e-6):.0f} 条/s")
+
+        total = importer.import_records(
+            records, batch_size=options["batch_size"], incremental=options["incremental"], progress=progress
+        )
+        for lineno, exc in errors:
+            self.stdout.write(self.style.WARNING(f"第 {lineno} 行解析失败: {exc}"))
+        elapsed = time.time() - started
+        if options["incremental"]:
+            summary = (
+                f"新增 {total['written']} 部、更新 {total['updated']} 部、未变化 {total['unchanged']} 部电影"
+                f"（认领旧记录 {total['adopted']}，跳过 {total['skipped']}），"
+            )
+        else:
+            summary = f"已导入 {total['written']} 部电影（认领旧记录 {total['adopted']}，跳过 {total['skipped']}），"
+        self.stdout.write(self.style.SUCCESS(
+            summary
+            + f"共 {total['read']} 条 / {total['batches']} 批，{total['read'] / max(elapsed, 1e-6):.0f} 条/s，"
+            f"耗时 {elapsed:.1f}s"
+        ))
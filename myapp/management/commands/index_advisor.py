@@ -0,0 +1,193 @@
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+
+from myapp import stats
+from myapp.models import Movie, MovieGenre, UserAction, UserInfo
+from myapp.pagination import KeysetPaginator
+from myapp.search import DatabaseIndexBackend
+from myapp.tags import sync_movie_tags
+from myapp.titles import normalize_title
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _keyset_page(ordering, after=False):
+    paginator = KeysetPaginator(Movie.objects.all(), ordering, 12)
+    qs = Movie.objects.all()
+    if after:
+        sample = qs.order_by(*paginator._order_by()).first()
+        if sample is not None:
+            qs = qs.filter(paginator._keyset_filter(paginator._values_of(sample), forward=True))
+    return qs.order_by(*paginator._order_by())[:13]
+
+
+def query_shapes(user_id, movie_id, genre_name, title):
+    """视图实际发出的查询形态（名称, QuerySet），视图改动时同步维护"""
+    return [
+        ("home.carousel", Movie.objects.filter(score__isnull=False).order_by("-score")[:5]),
+        ("home.top_rated", Movie.objects.order_by("-score")[:8]),
+        ("home.latest", Movie.objects.order_by("-date")[:8]),
+        ("home.hot", Movie.objects.order_by("-score", "-date")[:6]),
+        ("list.score_desc.first", _keyset_page(["-score", "id"])),
+        ("list.score_desc.next", _keyset_page(["-score", "id"], after=True)),
+        ("list.date_desc.next", _keyset_page(["-date", "id"], after=True)),
+        ("list.date_asc.next", _keyset_page(["date", "-id"], after=True)),
+        ("list.genre_filter", Movie.objects.filter(
+            id__in=MovieGenre.objects.filter(genre__name=genre_name).values("movie_id")
+        ).order_by("-score", "id")[:13]),
+        ("list.keyword", DatabaseIndexBackend().filter_queryset(Movie.objects.all(), title[:2])
+            .order_by("-date", "id")[:13]),
+        ("list.decade_filter", Movie.objects.filter(
+            date__gte=date(2000, 1, 1), date__lt=date(2010, 1, 1)
+        ).order_by("-date", "id")[:13]),
+        ("detail.user_action", UserAction.objects.filter(user_id=user_id, movie_id=movie_id)[:1]),
+        ("detail.comments", UserAction.objects.filter(movie_id=movie_id).filter(
+            Q(rating__isnull=False) | Q(comment__isnull=False, comment__gt="")
+        ).order_by("-updated_at", "-id")[:21]),
+        ("detail.related_fallback", Movie.objects.filter(
+            genres__in=MovieGenre.objects.filter(movie_id=movie_id).values("genre_id")
+        ).exclude(pk=movie_id).annotate(shared=Count("genres")).order_by("-shared", "-score")[:6]),
+        ("profile.favorites", UserAction.objects.filter(user_id=user_id, is_favorite=True).order_by("-updated_at")),
+        ("profile.rated", UserAction.objects.filter(user_id=user_id, rating__isnull=False).order_by("-updated_at")),
+        ("stats.monthly", stats._monthly_rows(user_id)),
+        ("stats.tags", stats._tag_counts("movie__genres__name", "genre", user_id)),
+        ("recommend.seeds", UserAction.objects.filter(user_id=user_id).order_by("-updated_at")
+            .values_list("movie_id", "is_favorite", "rating")[:200]),
+        ("ai.title_exact", Movie.objects.filter(title_key__in=[normalize_title(title)])),
+        ("ai.title_candidates", Movie.objects.filter(
+            title_key__startswith=normalize_title(title)[:2]
+        ).order_by("-score", "id")[:500]),
+    ]
+
+
+class Command(BaseCommand):
+    help = "对视图的热点查询逐条执行 EXPLAIN，报告仍在全表扫描或额外排序的查询"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0,
+                            help="先写入 N 部模拟电影及相应用户行为再分析，结束后回滚")
+        parser.add_argument("--fail-on-scan", action="store_true", help="存在全表扫描时以非零状态退出（用于 CI）")
+        parser.add_argument("--verbose-plan", action="store_true", help="输出完整执行计划")
+
+    def handle(self, *args, **options):
+        flagged = []
+        try:
+            with transaction.atomic():
+                if options["seed"]:
+                    self._seed(options["seed"])
+                flagged = self._report(options["verbose_plan"])
+                raise _Rollback
+        except _Rollback:
+            pass
+        if flagged:
+            self.stdout.write(self.style.WARNING(f"{len(flagged)} 个查询未完全走索引: {', '.join(flagged)}"))
+            if options["fail_on_scan"]:
+                raise CommandError("存在未走索引的热点查询")
+        else:
+            self.stdout.write(self.style.SUCCESS("所有热点查询均走索引"))
+
+    def _seed(self, count):
+        rng = random.Random(42)
+        genres = ["剧情", "爱情", "喜剧", "动作", "科幻", "犯罪", "悬疑", "动画"]
+        regions = ["中国大陆", "美国", "日本", "韩国", "法国", "英国"]
+        movies = Movie.objects.bulk_create(
+            [
+                Movie(
+                    title=f"模拟电影{i}",
+                    title_key=normalize_title(f"模拟电影{i}"),
+                    score=round(rng.uniform(2, 9.8), 1) if rng.random() > 0.05 else None,
+                    date=date(1950, 1, 1) + timedelta(days=rng.randint(0, 27000)),
+                    type=" ".join(rng.sample(genres, 2)),
+                    region=rng.choice(regions),
+                    actors=" ".join(f"演员{rng.randint(0, count)}" for _ in range(5)),
+                )
+                for i in range(count)
+            ],
+            batch_size=1000,
+        )
+        if not movies or movies[0].pk is None:
+            movies = list(Movie.objects.filter(title__startswith="模拟电影"))
+        for start in range(0, len(movies), 1000):
+            sync_movie_tags(movies[start:start + 1000])
+            DatabaseIndexBackend().index_movies(movies[start:start + 1000])
+        users = [
+            UserInfo.objects.create_user(f"advisor_{i}", f"advisor_{i}@example.com", "advisor")
+            for i in range(max(1, count // 1000))
+        ]
+        actions = []
+        for user in users:
+            for movie in rng.sample(movies, min(len(movies), 200)):
+                actions.append(UserAction(
+                    user=user,
+                    movie=movie,
+                    rating=round(rng.uniform(1, 10), 1) if rng.random() > 0.3 else None,
+                    is_favorite=rng.random() > 0.7,
+                ))
+        UserAction.objects.bulk_create(actions, batch_size=1000)
+        self.stdout.write(f"已写入模拟数据：{len(movies)} 部电影，{len(users)} 个用户，{len(actions)} 条行为")
+
+    def _report(self, verbose_plan):
+        action = UserAction.objects.order_by("id").first()
+        movie = Movie.objects.order_by("id").first()
+        genre = MovieGenre.objects.select_related("genre").first()
+        shapes = query_shapes(
+            action.user_id if action else 0,
+            movie.pk if movie else 0,
+            genre.genre.name if genre else "",
+            movie.title if movie else "",
+        )
+        flagged = []
+        for name, qs in shapes:
+            sql, params = qs.query.sql_with_params()
+            problems, plan = explain(sql, params)
+            if problems:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"[SCAN] {name}: {'; '.join(problems)}"))
+            else:
+                self.stdout.write(f"[ OK ] {name}")
+            if verbose_plan or problems:
+                for line in plan:
+                    self.stdout.write(f"         {line}")
+        return flagged
+
+
+def explain(sql, params):
+    """返回 (问题列表, 执行计划文本行)"""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            details = [row[-1] for row in cursor.fetchall()]
+            problems = []
+            for detail in details:
+                if detail.startswith("SCAN") and "INDEX" not in detail:
+                    problems.append(detail)
+                elif "TEMP B-TREE" in detail and "GROUP BY" not in detail:
+                    # 按表达式（月份、标签名）分组无法靠索引消除，且只涉及单个用户的行
+                    problems.append(detail)
+            return problems, details
+        if connection.vendor == "mysql":
+            cursor.execute(f"EXPLAIN {sql}", params)
+            columns = [c[0].lower() for c in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            problems, lines = [], []
+            for row in rows:
+                extra = row.get("extra") or ""
+                lines.append(
+                    f"table={row.get('table')} type={row.get('type')} key={row.get('key')} "
+                    f"rows={row.get('rows')} extra={extra}"
+                )
+                if row.get("type") == "ALL":
+                    problems.append(f"{row.get('table')} 全表扫描")
+                if "filesort" in extra:
+                    problems.append(f"{row.get('table')} 额外排序")
+            return problems, lines
+        cursor.execute(f"EXPLAIN {sql}", params)
+        lines = [str(row[0]) for row in cursor.fetchall()]
+        problems = [line.strip() for line in lines if "Seq Scan" in line or line.strip().startswith("Sort")]
+        return problems, lines
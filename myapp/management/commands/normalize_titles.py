@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import titles
+from myapp.models import Movie
+
+
+class Command(BaseCommand):
+    help = "按当前规范化规则重算电影标题匹配键（title_key）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批读取的电影数")
+
+    def handle(self, *args, **options):
+        started = time.time()
+        updated = titles.backfill(Movie, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"已更新 {updated} 部电影的匹配键，耗时 {time.time() - started:.1f}s"))
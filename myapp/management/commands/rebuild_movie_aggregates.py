@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import aggregates
+from myapp.models import Movie
+
+
+class Command(BaseCommand):
+    help = "从用户行为重算电影的站内评分/收藏/评论聚合列"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="每批处理的电影数")
+
+    def handle(self, *args, **options):
+        started = time.time()
+        batch_size = options["batch_size"]
+        total, last_id = 0, 0
+        while True:
+            ids = list(Movie.objects.filter(id__gt=last_id).order_by("id").values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            aggregates.recompute(ids)
+            total += len(ids)
+            last_id = ids[-1]
+        self.stdout.write(self.style.SUCCESS(f"已重算 {total} 部电影，耗时 {time.time() - started:.1f}s"))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import stats
+from myapp.models import UserInfo
+
+
+class Command(BaseCommand):
+    help = "从用户行为全量重建物化的用户统计（UserStats）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="只重建指定用户 id，可重复")
+
+    def handle(self, *args, **options):
+        started = time.time()
+        users = UserInfo.objects.order_by("id")
+        if options["user"]:
+            users = users.filter(id__in=options["user"])
+        total = 0
+        for user in users.iterator():
+            stats.rebuild(user)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"已重建 {total} 个用户的统计，耗时 {time.time() - started:.1f}s"))
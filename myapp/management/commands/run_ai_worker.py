@@ -0,0 +1,31 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+
+from myapp import jobs
+
+
+class Command(BaseCommand):
+    help = "执行排队中的AI推荐任务（settings.AI_JOB_MODE = 'worker' 时使用）"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=4, help="同时调用大模型的任务数")
+        parser.add_argument("--interval", type=float, default=1.0, help="无任务时的轮询间隔（秒）")
+        parser.add_argument("--once", action="store_true", help="处理完当前排队的任务后退出")
+
+    def handle(self, *args, **options):
+        concurrency = max(1, options["concurrency"])
+        done = 0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="ai-worker") as pool:
+            while True:
+                job_ids = jobs.pending_job_ids(limit=concurrency)
+                if not job_ids:
+                    if options["once"]:
+                        break
+                    time.sleep(options["interval"])
+                    continue
+                futures = [pool.submit(jobs.run_job, job_id) for job_id in job_ids]
+                wait(futures)
+                done += sum(1 for f in futures if f.result())
+        self.stdout.write(self.style.SUCCESS(f"已执行 {done} 个AI推荐任务"))
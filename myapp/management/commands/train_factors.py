@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp import factors
+
+
+class Command(BaseCommand):
+    help = "离线训练矩阵分解（隐式反馈 ALS）协同过滤模型"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--factors", type=int, default=64, help="隐因子维数")
+        parser.add_argument("--iterations", type=int, default=15, help="交替迭代轮数")
+        parser.add_argument("--regularization", type=float, default=0.1, help="L2 正则系数")
+        parser.add_argument("--alpha", type=float, default=10.0, help="置信度系数：置信度 = 1 + alpha * 权重")
+        parser.add_argument("--cg-steps", type=int, default=3, help="每轮共轭梯度步数")
+        parser.add_argument("--workers", type=int, default=None, help="并行线程数，默认 CPU 核数")
+        parser.add_argument("--output", default=None, help="模型目录，默认使用 RECOMMEND_FACTORS_DIR")
+
+    def handle(self, *args, **options):
+        started = time.time()
+        interactions = factors.load_interactions()
+        if not len(interactions[0]):
+            self.stdout.write(self.style.WARNING("没有用户行为，未训练"))
+            return
+        self.stdout.write(f"已读取 {len(interactions[0])} 条行为，耗时 {time.time() - started:.1f}s")
+
+        def progress(iteration):
+            self.stdout.write(f"第 {iteration}/{options['iterations']} 轮，已用 {time.time() - started:.1f}s")
+
+        model = factors.build_model(
+            *interactions, alpha=options["alpha"], factors=options["factors"],
+            iterations=options["iterations"], regularization=options["regularization"],
+            cg_steps=options["cg_steps"], workers=options["workers"], progress=progress,
+        )
+        path = options["output"] or factors.factors_dir()
+        version = model.save(path)
+        meta = model.meta
+        self.stdout.write(self.style.SUCCESS(
+            f"已训练 {meta['users']} 个用户、{meta['items']} 部电影、{meta['interactions']} 条行为，"
+            f"版本 {version}，耗时 {time.time() - started:.1f}s -> {path}"
+        ))
@@ -0,0 +1,111 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0007_merge_20251217_2059'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='类型')),
+            ],
+            options={
+                'verbose_name': '类型',
+                'verbose_name_plural': '类型',
+            },
+        ),
+        migrations.CreateModel(
+            name='Person',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128, unique=True, verbose_name='姓名')),
+            ],
+            options={
+                'verbose_name': '影人',
+                'verbose_name_plural': '影人',
+            },
+        ),
+        migrations.CreateModel(
+            name='Region',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True, verbose_name='地区')),
+            ],
+            options={
+                'verbose_name': '地区',
+                'verbose_name_plural': '地区',
+            },
+        ),
+        migrations.CreateModel(
+            name='MovieGenre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.genre')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.movie')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='genres',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='myapp.MovieGenre', to='myapp.genre', verbose_name='类型标签'),
+        ),
+        migrations.CreateModel(
+            name='MovieActor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order', models.PositiveSmallIntegerField(default=0, verbose_name='排序')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.movie')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.person')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='cast',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='myapp.MovieActor', to='myapp.person', verbose_name='演员标签'),
+        ),
+        migrations.CreateModel(
+            name='MovieRegion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.movie')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='myapp.region')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='regions',
+            field=models.ManyToManyField(blank=True, related_name='movies', through='myapp.MovieRegion', to='myapp.region', verbose_name='地区标签'),
+        ),
+        migrations.AddIndex(
+            model_name='moviegenre',
+            index=models.Index(fields=['genre', 'movie'], name='moviegenre_genre_movie_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='moviegenre',
+            unique_together={('movie', 'genre')},
+        ),
+        migrations.AddIndex(
+            model_name='movieactor',
+            index=models.Index(fields=['person', 'movie'], name='movieactor_person_movie_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='movieactor',
+            unique_together={('movie', 'person')},
+        ),
+        migrations.AddIndex(
+            model_name='movieregion',
+            index=models.Index(fields=['region', 'movie'], name='movieregion_region_movie_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='movieregion',
+            unique_together={('movie', 'region')},
+        ),
+    ]
@@ -0,0 +1,88 @@
+# 将 Movie.type/region/actors 中的分隔字符串拆分写入规范化标签表
+
+import re
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+# 与 myapp.utils.split_tokens 保持一致（迁移中不引用应用代码，避免日后改动影响历史迁移）
+_TOKEN_SEPARATORS = re.compile(r"[，,、|/\s]+")
+
+
+def _split_tokens(value):
+    if not value:
+        return []
+    return [t.strip() for t in _TOKEN_SEPARATORS.split(value) if t.strip()]
+
+
+def _tag_ids(model, names, cache):
+    max_length = model._meta.get_field("name").max_length
+    missing = {n[:max_length] for n in names} - cache.keys()
+    if missing:
+        model.objects.bulk_create([model(name=n) for n in missing], ignore_conflicts=True)
+        # 不区分大小写/重音的排序规则下查到的可能是已有行的另一种写法，按 casefold 对应回来，
+        # 仍对应不上的逐个按名称查询
+        rows = list(model.objects.filter(name__in=missing).values_list("name", "id"))
+        exact = dict(rows)
+        folded = {name.casefold(): tag_id for name, tag_id in rows}
+        for name in missing:
+            tag_id = exact.get(name) or folded.get(name.casefold())
+            if tag_id is None:
+                tag_id = model.objects.filter(name=name).values_list("id", flat=True).get()
+            cache[name] = tag_id
+    return max_length
+
+
+def populate_tags(apps, schema_editor):
+    Movie = apps.get_model("myapp", "Movie")
+    specs = (
+        ("type", apps.get_model("myapp", "Genre"), apps.get_model("myapp", "MovieGenre"), "genre_id"),
+        ("region", apps.get_model("myapp", "Region"), apps.get_model("myapp", "MovieRegion"), "region_id"),
+        ("actors", apps.get_model("myapp", "Person"), apps.get_model("myapp", "MovieActor"), "person_id"),
+    )
+    caches = {tag_model: {} for _, tag_model, _, _ in specs}
+
+    last_id = 0
+    while True:
+        rows = list(
+            Movie.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "type", "region", "actors")[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        for column, (field, tag_model, link_model, fk_name) in enumerate(specs, start=1):
+            tokens = [(row[0], _split_tokens(row[column])) for row in rows]
+            cache = caches[tag_model]
+            max_length = _tag_ids(tag_model, {t for _, values in tokens for t in values}, cache)
+            links = []
+            for movie_id, values in tokens:
+                seen = set()
+                for order, token in enumerate(values):
+                    tag_id = cache[token[:max_length]]
+                    if tag_id in seen:
+                        continue
+                    seen.add(tag_id)
+                    link = link_model(movie_id=movie_id, **{fk_name: tag_id})
+                    if fk_name == "person_id":
+                        link.order = order
+                    links.append(link)
+            link_model.objects.bulk_create(links, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def clear_tags(apps, schema_editor):
+    for name in ("MovieGenre", "MovieRegion", "MovieActor", "Genre", "Region", "Person"):
+        apps.get_model("myapp", name).objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0008_movie_tags'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_tags, clear_tags),
+    ]
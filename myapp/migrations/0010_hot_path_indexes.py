@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0009_populate_movie_tags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-score', 'id'], name='movie_score_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-date', 'id'], name='movie_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-score', '-date'], name='movie_score_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title'], name='movie_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['user', 'is_favorite', '-updated_at'], name='useraction_user_fav_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['user', '-updated_at'], name='useraction_user_upd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['movie', '-updated_at'], name='useraction_movie_upd_idx'),
+        ),
+    ]
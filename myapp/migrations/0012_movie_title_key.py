@@ -0,0 +1,101 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:26
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+BATCH_SIZE = 1000
+
+# 以下是 myapp.titles 规范化规则在本迁移时的副本（迁移中不引用应用代码，避免日后改动影响历史迁移）；
+# 规则日后修改时用 manage.py normalize_titles 重算已有数据
+_T2S_PAIRS = """
+萬万 與与 專专 業业 東东 絲丝 兩两 嚴严 個个 豐丰 臨临 為为 麗丽 舉举 麼么 義义 烏乌 樂乐 喬乔 習习
+鄉乡 書书 買买 亂乱 爭争 於于 虧亏 雲云 亞亚 產产 親亲 億亿 僅仅 從从 倉仓 儀仪 們们 價价 眾众 優优
+會会 傘伞 偉伟 傳传 傷伤 倫伦 偽伪 體体 餘余 俠侠 侶侣 偵侦 側侧 僑侨 係系 債债 傾倾 償偿 儲储 兒儿
+黨党 蘭兰 關关 興兴 養养 獸兽 內内 岡冈 冊册 寫写 軍军 農农 馮冯 沖冲 決决 況况 凍冻 淨净 準准 涼凉
+減减 幾几 鳳凤 憑凭 凱凯 擊击 劃划 劉刘 則则 剛刚 創创 刪删 別别 劍剑 劇剧 勸劝 辦办 務务 動动 勵励
+勁劲 勞劳 勢势 勝胜 區区 醫医 華华 協协 單单 賣卖 盧卢 衛卫 卻却 廠厂 廳厅 歷历 曆历 厲厉 壓压 厭厌
+縣县 參参 雙双 發发 髮发 變变 敘叙 疊叠 葉叶 號号 嘆叹 後后 嚇吓 呂吕 嗎吗 聽听 啟启 吳吴 員员 嗚呜
+響响 啞哑 喚唤 喪丧 嘗尝 嘩哗 嘯啸 噴喷 囑嘱 團团 園园 圍围 國国 圖图 圓圆 聖圣 場场 壞坏 塊块 堅坚
+壇坛 墳坟 墜坠 墊垫 壺壶 處处 備备 複复 夠够 頭头 誇夸 奪夺 奮奋 獎奖 婦妇 媽妈 嬌娇 孫孙 學学 寧宁
+寶宝 實实 寵宠 審审 憲宪 寬宽 賓宾 對对 尋寻 導导 將将 爾尔 塵尘 堯尧 尷尴 屍尸 盡尽 層层 屆届 屬属
+歲岁 豈岂 島岛 嶺岭 嶽岳 峽峡 崗岗 幣币 師师 帳帐 帶带 幫帮 幹干 並并 廣广 慶庆 廬庐 庫库 應应 廟庙
+廢废 開开 異异 棄弃 張张 彌弥 彎弯 彈弹 強强 歸归 當当 錄录 徹彻 徑径 憶忆 憂忧 懷怀 態态 憐怜 總总
+戀恋 懇恳 惡恶 惱恼 悅悦 驚惊 慘惨 慣惯 憤愤 願愿 懼惧 戰战 戲戏 戶户 撲扑 執执 擴扩 掃扫 揚扬 擾扰
+撫抚 搶抢 護护 報报 擔担 擬拟 擁拥 攔拦 撥拨 擇择 掛挂 捲卷 擋挡 擠挤 揮挥 損损 換换 據据 擲掷 攜携
+搖摇 攝摄 擺摆 敵敌 數数 齋斋 斷断 無无 舊旧 時时 晝昼 顯显 曉晓 暫暂 條条 來来 楊杨 極极 構构 槍枪
+楓枫 櫃柜 檢检 樓楼 樣样 標标 機机 權权 橫横 殺杀 氣气 漢汉 湯汤 溝沟 沒没 滬沪 淚泪 澤泽 潔洁 灑洒
+測测 濟济 渾浑 濃浓 濤涛 淪沦 漁渔 滅灭 漲涨 湧涌 滿满 潛潜 濕湿 溫温 灣湾 灘滩 滾滚 災灾 燈灯 靈灵
+爐炉 點点 煉炼 爛烂 煩烦 燒烧 熱热 營营 愛爱 爺爷 牆墙 犧牺 狀状 猶犹 獨独 狹狭 獅狮 獄狱 獵猎 豬猪
+貓猫 獻献 現现 環环 瑪玛 瓊琼 畫画 暢畅 療疗 瘋疯 癡痴 盤盘 監监 蓋盖 睜睁 瞞瞒 礦矿 碼码 確确 礙碍
+禮礼 禍祸 禪禅 離离 種种 積积 稱称 穩稳 窮穷 竊窃 競竞 筆笔 築筑 簡简 節节 範范 類类 糧粮 緊紧 紅红
+約约 級级 紀纪 純纯 紙纸 紛纷 細细 終终 組组 結结 絕绝 給给 統统 經经 綠绿 維维 網网 綱纲 緣缘 編编
+練练 縱纵 績绩 織织 繩绳 繼继 續续 纏缠 緒绪 綁绑 紐纽 緋绯 罰罚 羅罗 聯联 聲声 職职 聰聪 腦脑 膽胆
+臉脸 臟脏 艦舰 艱艰 藝艺 蘇苏 蘋苹 莊庄 藥药 萊莱 蓮莲 獲获 蘿萝 螢萤 蕭萧 蕩荡 蟲虫 蝦虾 蠶蚕 補补
+襲袭 見见 規规 視视 覺觉 覽览 觀观 計计 認认 討讨 讓让 訓训 議议 記记 講讲 許许 論论 設设 訪访 證证
+評评 識识 詞词 試试 話话 詩诗 誠诚 說说 語语 誤误 調调 請请 諸诸 讀读 課课 誰谁 談谈 謎谜 謝谢 謊谎
+諜谍 謀谋 諾诺 貝贝 負负 貢贡 財财 責责 賢贤 敗败 貨货 質质 販贩 貪贪 貧贫 購购 貴贵 費费 貿贸 資资
+賊贼 賭赌 賽赛 贏赢 貞贞 賴赖 趕赶 趙赵 躍跃 踐践 蹤踪 車车 軌轨 轉转 輪轮 軟软 輕轻 載载 較较 輔辅
+輝辉 輸输 轟轰 辭辞 邊边 遼辽 達达 遷迁 過过 運运 還还 這这 進进 遠远 違违 連连 遲迟 適适 選选 遺遗
+鄧邓 鄭郑 醜丑 釋释 裡里 鐘钟 針针 釣钓 鋼钢 錢钱 鐵铁 銀银 錯错 鍋锅 鏡镜 鎮镇 鏈链 鏢镖 長长 門门
+閃闪 閉闭 問问 閒闲 間间 鬧闹 聞闻 閣阁 闊阔 闖闯 陽阳 陰阴 陣阵 際际 陸陆 陳陈 險险 隱隐 隨随 難难
+雞鸡 雖虽 雜杂 霧雾 靜静 韓韩 頁页 頂顶 項项 順顺 須须 預预 領领 頻频 題题 顏颜 顧顾 頓顿 風风 飛飞
+飄飘 飯饭 飲饮 餓饿 館馆 饑饥 馬马 駕驾 騎骑 驗验 騙骗 驅驱 驢驴 驕骄 駭骇 鬥斗 魚鱼 鮮鲜 鯨鲸 魯鲁
+鳥鸟 鳴鸣 鴨鸭 鴻鸿 鷹鹰 鹽盐 麥麦 黃黄 齊齐 齒齿 龍龙 龜龟 鬱郁 碩硕 瑣琐 傑杰 夢梦 槳桨 檔档 殭僵
+艷艳 豔艳 檯台 臺台 颱台 纔才 衝冲 麵面 鍾钟 贖赎 鍵键 隊队 龐庞 蟻蚁 蠻蛮 壯壮 嬰婴 綜综 詭诡
+譯译 嶼屿 奧奥 閻阎 隻只 纖纤 鑽钻 鑰钥 驛驿 騰腾 驟骤 歡欢 鏽锈 瀟潇 諧谐 謠谣 鑒鉴 鑑鉴 蹟迹
+"""
+
+_T2S = {ord(pair[0]): pair[1] for pair in _T2S_PAIRS.split()}
+_BRACKETED = re.compile(r"[(（\[【][^)）\]】]*[)）\]】]")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def _normalize_title(title):
+    if not title:
+        return ""
+    text = unicodedata.normalize("NFKC", title).lower().translate(_T2S)
+    stripped = _NON_WORD.sub("", _BRACKETED.sub("", text))
+    return stripped or _NON_WORD.sub("", text)
+
+
+def populate_title_key(apps, schema_editor):
+    Movie = apps.get_model("myapp", "Movie")
+    last_id = 0
+    while True:
+        rows = list(
+            Movie.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", "title")[:BATCH_SIZE]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        Movie.objects.bulk_update(
+            [Movie(id=pk, title_key=_normalize_title(title)) for pk, title in rows], ["title_key"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0011_ai_recommend_job'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='movie',
+            name='movie_title_idx',
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='title_key',
+            field=models.CharField(db_default='', editable=False, max_length=255, verbose_name='标题匹配键'),
+        ),
+        migrations.RunPython(populate_title_key, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['title_key'], name='movie_title_key_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0012_movie_title_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('favorite_count', models.PositiveIntegerField(default=0, verbose_name='收藏数')),
+                ('rated_count', models.PositiveIntegerField(default=0, verbose_name='评分数')),
+                ('rating_sum', models.FloatField(default=0, verbose_name='评分总和')),
+                ('rating_dist', models.JSONField(default=dict)),
+                ('monthly', models.JSONField(default=dict)),
+                ('genre_counts', models.JSONField(default=dict)),
+                ('region_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '用户统计',
+                'verbose_name_plural': '用户统计',
+            },
+        ),
+    ]
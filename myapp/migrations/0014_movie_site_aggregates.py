@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:30
+
+import django.db.models.expressions
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+BATCH_SIZE = 1000
+
+
+def populate_aggregates(apps, schema_editor):
+    Movie = apps.get_model("myapp", "Movie")
+    UserAction = apps.get_model("myapp", "UserAction")
+    rows = (
+        UserAction.objects.values("movie_id")
+        .annotate(
+            rating_count=Count("rating"),
+            rating_sum=Sum("rating"),
+            favorite_count=Count("id", filter=Q(is_favorite=True)),
+            comment_count=Count("id", filter=Q(comment__isnull=False, comment__gt="")),
+        )
+        .order_by()
+    )
+    fields = ["site_rating_count", "site_rating_sum", "favorite_count", "comment_count"]
+    batch = []
+    for row in rows.iterator():
+        batch.append(Movie(
+            pk=row["movie_id"],
+            site_rating_count=row["rating_count"],
+            site_rating_sum=row["rating_sum"] or 0,
+            favorite_count=row["favorite_count"],
+            comment_count=row["comment_count"],
+        ))
+        if len(batch) >= BATCH_SIZE:
+            Movie.objects.bulk_update(batch, fields)
+            batch = []
+    if batch:
+        Movie.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0013_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='comment_count',
+            field=models.PositiveIntegerField(db_default=0, default=0, editable=False, verbose_name='评论数'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='favorite_count',
+            field=models.PositiveIntegerField(db_default=0, default=0, editable=False, verbose_name='收藏人数'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='site_rating_count',
+            field=models.PositiveIntegerField(db_default=0, default=0, editable=False, verbose_name='站内评分人数'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='site_rating_sum',
+            field=models.FloatField(db_default=0, default=0, editable=False, verbose_name='站内评分总和'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['-favorite_count', 'id'], name='movie_fav_count_id_idx'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='site_rating',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(site_rating_count__gt=0, then=django.db.models.expressions.CombinedExpression(models.F('site_rating_sum'), '/', models.F('site_rating_count'))), default=None), output_field=models.FloatField(null=True), verbose_name='站内评分'),
+        ),
+        migrations.RunPython(populate_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0014_movie_site_aggregates'),
+    ]
+
+    operations = [
+        # 先建新索引再删旧索引：MySQL 的 movie 外键需要始终有以 movie_id 开头的索引
+        migrations.AddIndex(
+            model_name='useraction',
+            index=models.Index(fields=['movie', '-updated_at', '-id'], name='useraction_movie_upd_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='useraction',
+            name='useraction_movie_upd_idx',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0015_comment_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='douban_id',
+            field=models.CharField(blank=True, max_length=32, null=True, unique=True, verbose_name='豆瓣ID'),
+        ),
+    ]
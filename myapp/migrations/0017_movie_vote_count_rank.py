@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0016_movie_douban_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='rank',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='榜单排名'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='vote_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='评价人数'),
+        ),
+    ]
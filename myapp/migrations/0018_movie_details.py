@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0017_movie_vote_count_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='directors',
+            field=models.CharField(blank=True, max_length=255, null=True, verbose_name='导演'),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='runtime',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='片长（分钟）'),
+        ),
+    ]
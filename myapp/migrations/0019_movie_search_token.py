@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myapp', '0018_movie_details'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('weight', models.FloatField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='myapp.movie')),
+            ],
+            options={
+                'unique_together': {('token', 'movie')},
+            },
+        ),
+    ]
@@ -1,27 +1,157 @@
+import uuid
+
 from django.contrib.auth.base_user import BaseUserManager
 from django.db import models
+from django.db.models import Case, F, When
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.models import PermissionsMixin
 
+from .titles import normalize_title
+
 # Create your models here.
 class Movie(models.Model):
+    # 豆瓣条目 id，导入时据此去重与更新（见 manage.py import_movies）；手工录入的电影为空
+    douban_id = models.CharField(max_length=32, unique=True, null=True, blank=True, verbose_name='豆瓣ID')
     title = models.CharField(max_length=255,verbose_name='电影标题')
     score = models.FloatField(null = True, blank = True, verbose_name='评分')
+    # 豆瓣评价人数与榜单排名，随导入更新（增量同步据评分和评价人数判断是否变化）
+    vote_count = models.PositiveIntegerField(null=True, blank=True, verbose_name='评价人数')
+    rank = models.PositiveIntegerField(null=True, blank=True, verbose_name='榜单排名')
     date = models.DateField(null = True, blank = True,verbose_name='发布日期')
     poster = models.URLField(max_length=255, null = True, blank = True,verbose_name='海报链接')
     actors = models.CharField(max_length=255, null = True, blank = True,verbose_name='演员表')
+    # 以下两项来自详情页抓取（spiders/details.py，manage.py import_details）
+    directors = models.CharField(max_length=255, null=True, blank=True, verbose_name='导演')
+    runtime = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='片长（分钟）')
     region = models.CharField(max_length=255, null = True, blank = True,verbose_name='地区')
     type = models.CharField(max_length=255, null = True, blank = True,verbose_name='类型')
     summary = models.TextField(null = True, blank = True,verbose_name='简介')
+    # 标题匹配键（见 myapp/titles.py），保存时自动生成；爬虫直接写库时由 movies_imported 信号补齐
+    title_key = models.CharField(max_length=255, db_default='', editable=False, verbose_name='标题匹配键')
+    # 站内评分/收藏/评论的聚合值，由 UserAction 的信号以 F() 增量维护（见 myapp/aggregates.py）
+    site_rating_count = models.PositiveIntegerField(default=0, db_default=0, editable=False, verbose_name='站内评分人数')
+    site_rating_sum = models.FloatField(default=0, db_default=0, editable=False, verbose_name='站内评分总和')
+    site_rating = models.GeneratedField(
+        expression=Case(
+            When(site_rating_count__gt=0, then=F('site_rating_sum') / F('site_rating_count')),
+            default=None,
+        ),
+        output_field=models.FloatField(null=True),
+        db_persist=True,
+        verbose_name='站内评分',
+    )
+    favorite_count = models.PositiveIntegerField(default=0, db_default=0, editable=False, verbose_name='收藏人数')
+    comment_count = models.PositiveIntegerField(default=0, db_default=0, editable=False, verbose_name='评论数')
+    # 由 actors/region/type 拆分得到的规范化关联，筛选走索引而非 icontains
+    genres = models.ManyToManyField("Genre", through="MovieGenre", related_name="movies", blank=True, verbose_name='类型标签')
+    regions = models.ManyToManyField("Region", through="MovieRegion", related_name="movies", blank=True, verbose_name='地区标签')
+    cast = models.ManyToManyField("Person", through="MovieActor", related_name="movies", blank=True, verbose_name='演员标签')
 
     class Meta:
         verbose_name = '电影'
         verbose_name_plural = '电影集'
+        # 与视图的排序方式一一对应（升序列表按反向扫描同一索引），见 manage.py index_advisor
+        indexes = [
+            models.Index(fields=['-score', 'id'], name='movie_score_id_idx'),
+            models.Index(fields=['-date', 'id'], name='movie_date_id_idx'),
+            models.Index(fields=['-score', '-date'], name='movie_score_date_idx'),
+            models.Index(fields=['title_key'], name='movie_title_key_idx'),
+            models.Index(fields=['-favorite_count', 'id'], name='movie_fav_count_id_idx'),
+        ]
+
+    # 只由 F() 更新的聚合列，整行保存时不写回内存中的旧值
+    AGGREGATE_FIELDS = ('site_rating_count', 'site_rating_sum', 'favorite_count', 'comment_count')
+
+    def save(self, *args, **kwargs):
+        self.title_key = normalize_title(self.title)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "title" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "title_key"}
+        elif update_fields is None and not self._state.adding and not kwargs.get("force_insert"):
+            kwargs["update_fields"] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and not f.generated and f.name not in self.AGGREGATE_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
 
 
+class Genre(models.Model):
+    name = models.CharField(max_length=64, unique=True, verbose_name='类型')
+
+    class Meta:
+        verbose_name = '类型'
+        verbose_name_plural = '类型'
+
+    def __str__(self):
+        return self.name
+
+
+class Region(models.Model):
+    name = models.CharField(max_length=64, unique=True, verbose_name='地区')
+
+    class Meta:
+        verbose_name = '地区'
+        verbose_name_plural = '地区'
+
+    def __str__(self):
+        return self.name
+
+
+class Person(models.Model):
+    name = models.CharField(max_length=128, unique=True, verbose_name='姓名')
+
+    class Meta:
+        verbose_name = '影人'
+        verbose_name_plural = '影人'
+
+    def __str__(self):
+        return self.name
+
+
+class MovieGenre(models.Model):
+    movie = models.ForeignKey("Movie", on_delete=models.CASCADE)
+    genre = models.ForeignKey("Genre", on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("movie", "genre")
+        # 按类型找电影：genre 打头的复合索引
+        indexes = [models.Index(fields=["genre", "movie"], name="moviegenre_genre_movie_idx")]
+
+
+class MovieRegion(models.Model):
+    movie = models.ForeignKey("Movie", on_delete=models.CASCADE)
+    region = models.ForeignKey("Region", on_delete=models.CASCADE)
+
+    class Meta:
+        unique_together = ("movie", "region")
+        indexes = [models.Index(fields=["region", "movie"], name="movieregion_region_movie_idx")]
+
+
+class MovieActor(models.Model):
+    movie = models.ForeignKey("Movie", on_delete=models.CASCADE)
+    person = models.ForeignKey("Person", on_delete=models.CASCADE)
+    order = models.PositiveSmallIntegerField(default=0, verbose_name="排序")
+
+    class Meta:
+        unique_together = ("movie", "person")
+        indexes = [models.Index(fields=["person", "movie"], name="movieactor_person_movie_idx")]
+
+
+class MovieSearchToken(models.Model):
+    """全文检索倒排表（myapp.search.DatabaseIndexBackend）：每部电影的每个词一行"""
+    token = models.CharField(max_length=64)
+    movie = models.ForeignKey("Movie", on_delete=models.CASCADE, related_name="+")
+    # 该词在各检索字段中每出现一次累加一次字段权重
+    weight = models.FloatField()
+
+    class Meta:
+        # 按词（及词前缀）找电影：token 打头的唯一索引
+        unique_together = ("token", "movie")
+
+
 class UserAction(models.Model):
     """用户行为：评分、收藏与评论"""
     user = models.ForeignKey("UserInfo", on_delete=models.CASCADE, related_name="actions")
@@ -34,10 +164,83 @@ class UserAction(models.Model):
 
     class Meta:
         unique_together = ("user", "movie")
+        indexes = [
+            # 个人中心收藏列表、统计
+            models.Index(fields=["user", "is_favorite", "-updated_at"], name="useraction_user_fav_upd_idx"),
+            # 最近行为（推荐种子）、评分列表
+            models.Index(fields=["user", "-updated_at"], name="useraction_user_upd_idx"),
+            # 电影详情页评论（游标分页按 updated_at, id 倒序）
+            models.Index(fields=["movie", "-updated_at", "-id"], name="useraction_movie_upd_id_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.username}-{self.movie.title}"
 
+
+class AIRecommendJob(models.Model):
+    """AI推荐任务：Web 请求只负责提交，由后台线程或 run_ai_worker 执行"""
+    STATUS_PENDING = "pending"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "排队中"),
+        (STATUS_RUNNING, "生成中"),
+        (STATUS_DONE, "已完成"),
+        (STATUS_FAILED, "失败"),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey("UserInfo", on_delete=models.CASCADE, related_name="ai_jobs")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=STATUS_PENDING, verbose_name="状态")
+    # 与原同步接口相同的响应数据及状态码
+    result = models.JSONField(null=True, blank=True)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # 工作进程按提交顺序领取任务
+            models.Index(fields=["status", "created_at"], name="aijob_status_created_idx"),
+            # 查找用户进行中的任务
+            models.Index(fields=["user", "-created_at"], name="aijob_user_created_idx"),
+        ]
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    def __str__(self):
+        return f"{self.user_id}-{self.status}"
+
+
+class UserStats(models.Model):
+    """
+    用户观影统计的物化结果，由 UserAction 的信号增量维护（见 myapp/stats.py），
+    个人统计页只读这一行。可用 rebuild_user_stats / check_user_stats 重建与校验。
+    """
+    user = models.OneToOneField("UserInfo", on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    favorite_count = models.PositiveIntegerField(default=0, verbose_name="收藏数")
+    rated_count = models.PositiveIntegerField(default=0, verbose_name="评分数")
+    rating_sum = models.FloatField(default=0, verbose_name="评分总和")
+    # {"range_0_2": 数量, ...}
+    rating_dist = models.JSONField(default=dict)
+    # {"2024-05": [收藏数, 评分数, 评分总和]}
+    monthly = models.JSONField(default=dict)
+    # {标签名: [收藏数, 评分数]}
+    genre_counts = models.JSONField(default=dict)
+    region_counts = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "用户统计"
+        verbose_name_plural = "用户统计"
+
+    def __str__(self):
+        return f"{self.user_id}-stats"
+
 class UserManager(BaseUserManager):
     def _create_user(self, username, email, password, **kwargs):
         if not username:
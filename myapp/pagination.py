@@ -0,0 +1,200 @@
+"""
+游标（keyset）分页
+
+Paginator 每页都要 COUNT(*) 再 OFFSET n，越往后翻越慢。这里按排序列的值定位：
+游标里记录当前页首/尾一行的排序列取值，下一页只需
+
+    WHERE (score, id) 在游标之后 ORDER BY score DESC, id LIMIT n+1
+
+配合 (score, id) 这类复合索引，第 5000 页与第 1 页的代价相同。
+
+空值按“最小值”处理（降序排最后、升序排最前），与 MySQL 默认行为一致，排序不需要额外的 IS NULL 表达式。
+排序字段的最后一个必须唯一（通常是 id）。
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from django.db import connection
+from django.db.models import F, Q
+
+# 近似计数时精确统计的上限，超过后只返回“上限+”
+APPROX_COUNT_CAP = 10000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values, direction):
+    payload = json.dumps({"v": [_encode_value(v) for v in values], "d": direction}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload["v"], payload["d"]
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor("无效的分页游标")
+    if direction not in ("next", "prev") or not isinstance(values, list):
+        raise InvalidCursor("无效的分页游标")
+    return values, direction
+
+
+class KeysetPage:
+    """与 Paginator 的 Page 用法相近：可迭代，带前后页游标"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, ordering, per_page):
+        """ordering 如 ["-score", "id"]，最后一列须唯一"""
+        self.queryset = queryset
+        self.per_page = per_page
+        self.fields = []
+        for name in ordering:
+            descending = name.startswith("-")
+            name = name.lstrip("-")
+            field = queryset.model._meta.pk if name in ("pk", "id") else queryset.model._meta.get_field(name)
+            self.fields.append((field.attname, descending, field))
+
+    def _order_by(self, reverse=False):
+        exprs = []
+        for name, descending, field in self.fields:
+            descending = descending != reverse
+            if not field.null:
+                exprs.append(F(name).desc() if descending else F(name).asc())
+            elif descending:
+                exprs.append(F(name).desc(nulls_last=True))
+            else:
+                exprs.append(F(name).asc(nulls_first=True))
+        return exprs
+
+    @staticmethod
+    def _equal(name, value):
+        return Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+
+    @staticmethod
+    def _beyond(name, descending, value, forward, nullable):
+        """
+        在 name 这一列上“严格位于 value 之后（forward）/之前”的条件。
+        空值视为最小值。
+        """
+        toward_smaller = descending == forward
+        if value is None:
+            # 空值已是最小：往更小方向没有值，往更大方向是全部非空值
+            return Q(pk__in=[]) if toward_smaller else Q(**{f"{name}__isnull": False})
+        if toward_smaller:
+            condition = Q(**{f"{name}__lt": value})
+            return condition | Q(**{f"{name}__isnull": True}) if nullable else condition
+        return Q(**{f"{name}__gt": value})
+
+    def _keyset_filter(self, values, forward):
+        condition = Q(pk__in=[])
+        prefix = Q()
+        for (name, descending, field), value in zip(self.fields, values):
+            condition |= prefix & self._beyond(name, descending, value, forward, field.null)
+            prefix &= self._equal(name, value)
+        return condition
+
+    def _values_of(self, obj):
+        return [getattr(obj, name) for name, _, _ in self.fields]
+
+    def _parse_values(self, raw_values):
+        if len(raw_values) != len(self.fields):
+            raise InvalidCursor("无效的分页游标")
+        try:
+            return [
+                None if raw is None else field.to_python(raw)
+                for (_, _, field), raw in zip(self.fields, raw_values)
+            ]
+        except Exception:
+            raise InvalidCursor("无效的分页游标")
+
+    def get_page(self, cursor=None):
+        """cursor 为空时取第一页；游标无效时抛出 InvalidCursor"""
+        if not cursor:
+            rows = list(self.queryset.order_by(*self._order_by())[: self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            rows = rows[: self.per_page]
+            return KeysetPage(rows, next_cursor=self._cursor(rows[-1], "next") if has_more else None)
+
+        raw_values, direction = decode_cursor(cursor)
+        values = self._parse_values(raw_values)
+        forward = direction == "next"
+        qs = self.queryset.filter(self._keyset_filter(values, forward))
+        rows = list(qs.order_by(*self._order_by(reverse=not forward))[: self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[: self.per_page]
+        if not forward:
+            rows.reverse()
+        if not rows:
+            return KeysetPage(rows)
+        if forward:
+            return KeysetPage(
+                rows,
+                next_cursor=self._cursor(rows[-1], "next") if has_more else None,
+                previous_cursor=self._cursor(rows[0], "prev"),
+            )
+        return KeysetPage(
+            rows,
+            next_cursor=self._cursor(rows[-1], "next"),
+            previous_cursor=self._cursor(rows[0], "prev") if has_more else None,
+        )
+
+    def _cursor(self, obj, direction):
+        return encode_cursor(self._values_of(obj), direction)
+
+
+def approximate_count(queryset):
+    """
+    近似总数，返回 (数量, 是否为估计值)。
+
+    无筛选条件的 MySQL 表直接读 information_schema 的行数估计；
+    其余情况最多精确数到 APPROX_COUNT_CAP 条。
+    """
+    if connection.vendor == "mysql" and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] is not None:
+            return row[0], True
+    count = queryset.order_by()[: APPROX_COUNT_CAP + 1].count()
+    if count > APPROX_COUNT_CAP:
+        return APPROX_COUNT_CAP, True
+    return count, False
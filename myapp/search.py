@@ -0,0 +1,413 @@
+"""
+电影全文检索
+
+影片库的关键词搜索不再对 title/actors/summary 做 icontains 扫描，而是查询倒排索引：
+
+- 中日韩文字（汉字、假名、谚文）按连续字符切分为二元组（bigram），单字词保留为一元组；
+  其他文字的字母数字按单词切分，统一小写并去掉拉丁字母的变音符号（Amélie 与 amelie 互相匹配）
+- 索引由 Movie 的 post_save/post_delete 信号增量维护，
+  全量重建使用 python manage.py rebuild_search_index
+- 影片库列表用 filter_movies 过滤（不截断匹配数，排序由列表决定）；索引为空（新部署、loaddata 后
+  尚未重建）时回退到 icontains，避免搜索结果为空
+- 后端可插拔（settings.MOVIE_SEARCH['BACKEND']）：
+  DatabaseIndexBackend 把倒排表（MovieSearchToken）放在业务库中，列表查询以子查询与之半连接，
+  排序与 LIMIT 由列表查询的索引完成，耗时与匹配数无关；
+  SQLiteFTSBackend 使用本地 SQLite FTS5 文件，PythonIndexBackend 为纯 Python 内存索引（测试用），
+  这两者在库外，列表过滤只能取回全部匹配 id，只适合小库
+"""
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import unicodedata
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import Count, Q, Sum
+from django.utils.module_loading import import_string
+
+# 参与检索的字段及其权重（标题命中比简介命中更相关）
+FIELD_WEIGHTS = {"title": 10.0, "actors": 5.0, "summary": 1.0}
+
+# 不以空格分词、按二元组切分的文字：汉字（含扩展区与兼容汉字）、平假名、片假名、谚文
+_CJK = (
+    r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\U00020000-\U0003134f"
+    r"\u3040-\u309f\u30a0-\u30ff\u31f0-\u31ff"
+    r"\u1100-\u11ff\u3130-\u318f\uac00-\ud7af"
+)
+# 其余文字按单词切分：除中日韩文字以外的字母与数字
+_TOKEN_RE = re.compile(rf"[{_CJK}]+|[^\W_{_CJK}]+")
+_CJK_RE = re.compile(rf"[{_CJK}]")
+# 拉丁/希腊/西里尔字母的组合变音符号；假名的浊音符号（U+3099、U+309A）不在其中，不会被去掉
+_DIACRITICS_RE = re.compile(r"[\u0300-\u036f]")
+
+
+def _fold(text):
+    """小写、全角转半角，去掉变音符号（é -> e），再合成为 NFKC 形式"""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return unicodedata.normalize("NFKC", _DIACRITICS_RE.sub("", decomposed))
+
+
+def tokenize(text):
+    """切分文本：中日韩文字串输出二元组，其他文字输出规范化后的单词"""
+    if not text:
+        return []
+    tokens = []
+    for run in _TOKEN_RE.findall(_fold(text)):
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def parse_query(query):
+    """
+    将查询切分为 [(token, is_prefix), ...]。
+
+    单个中日韩字符以及最后一个单词按前缀匹配，便于边输入边搜索。
+    """
+    runs = _TOKEN_RE.findall(_fold(query or ""))
+    terms = []
+    for i, run in enumerate(runs):
+        is_last = i == len(runs) - 1
+        if _CJK_RE.match(run):
+            if len(run) == 1:
+                terms.append((run, True))
+            else:
+                terms.extend((run[j:j + 2], False) for j in range(len(run) - 1))
+        else:
+            terms.append((run, is_last))
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def _movie_fields(movie):
+    return {field: getattr(movie, field) or "" for field in FIELD_WEIGHTS}
+
+
+class BaseSearchBackend:
+    def __init__(self, **options):
+        self.options = options
+
+    def index_movies(self, movies):
+        """新增或更新一批电影"""
+        raise NotImplementedError
+
+    def remove_movies(self, movie_ids):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def is_empty(self):
+        """索引中没有任何电影"""
+        raise NotImplementedError
+
+    def search(self, query, limit=1000):
+        """返回按相关度降序的电影 id 列表；limit 为 None 时不限条数"""
+        raise NotImplementedError
+
+    def filter_queryset(self, queryset, query):
+        """
+        把电影查询集限定为匹配 query 的电影，不排序、不截断。
+
+        默认取回全部匹配 id 作为 IN 条件：索引不在业务库中时无法连接，匹配多时 IN 列表很长，只适合小库。
+        """
+        return queryset.filter(id__in=self.search(query, limit=None))
+
+
+class DatabaseIndexBackend(BaseSearchBackend):
+    """倒排表存放在业务库（MovieSearchToken），随电影写入在同一事务中维护"""
+
+    BATCH_SIZE = 1000
+
+    def _model(self):
+        from .models import MovieSearchToken
+
+        return MovieSearchToken
+
+    def _conditions(self, query):
+        """每个查询词一个条件；词已小写，前缀用不区分大小写的 LIKE，MySQL 上才能走 token 索引的范围扫描"""
+        max_length = self._model()._meta.get_field("token").max_length
+        return [
+            Q(token__istartswith=token[:max_length]) if prefix else Q(token=token[:max_length])
+            for token, prefix in parse_query(query)
+        ]
+
+    def index_movies(self, movies):
+        model = self._model()
+        max_length = model._meta.get_field("token").max_length
+        movies = list(movies)
+        rows = []
+        for movie in movies:
+            weights = defaultdict(float)
+            for field, text in _movie_fields(movie).items():
+                for token in tokenize(text):
+                    weights[token[:max_length]] += FIELD_WEIGHTS[field]
+            rows.extend(model(token=token, movie_id=movie.pk, weight=weight) for token, weight in weights.items())
+        model.objects.filter(movie_id__in=[movie.pk for movie in movies]).delete()
+        model.objects.bulk_create(rows, batch_size=self.BATCH_SIZE)
+
+    def remove_movies(self, movie_ids):
+        self._model().objects.filter(movie_id__in=list(movie_ids)).delete()
+
+    def clear(self):
+        self._model().objects.all().delete()
+
+    def is_empty(self):
+        return not self._model().objects.exists()
+
+    def search(self, query, limit=1000):
+        conditions = self._conditions(query)
+        if not conditions:
+            return []
+        # 每个查询词都要命中（各自计数大于 0），相关度为命中词的权重之和
+        hits = {f"hits_{i}": Count("id", filter=condition) for i, condition in enumerate(conditions)}
+        ranked = (
+            self._model().objects.filter(reduce(or_, conditions))
+            .values("movie_id")
+            .annotate(score=Sum("weight"), **hits)
+            .filter(**{f"{name}__gt": 0 for name in hits})
+            .order_by("-score", "movie_id")
+            .values_list("movie_id", flat=True)
+        )
+        return list(ranked if limit is None else ranked[:limit])
+
+    def filter_queryset(self, queryset, query):
+        conditions = self._conditions(query)
+        if not conditions:
+            return queryset.none()
+        for condition in conditions:
+            queryset = queryset.filter(id__in=self._model().objects.filter(condition).values("movie_id"))
+        return queryset
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """基于 SQLite FTS5 的本地索引文件"""
+
+    def __init__(self, PATH=None, **options):
+        super().__init__(**options)
+        self.path = os.fspath(PATH or settings.BASE_DIR / "data" / "search.sqlite3")
+        self._local = threading.local()
+        self._ensure_schema()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _ensure_schema(self):
+        columns = ", ".join(FIELD_WEIGHTS)
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    f"CREATE VIRTUAL TABLE IF NOT EXISTS movie_fts USING fts5({columns}, tokenize='unicode61')"
+                )
+        except sqlite3.OperationalError as exc:
+            raise ImproperlyConfigured(f"当前 SQLite 不支持 FTS5: {exc}")
+
+    def index_movies(self, movies):
+        rows = []
+        for movie in movies:
+            fields = _movie_fields(movie)
+            rows.append((movie.pk, *(" ".join(tokenize(fields[f])) for f in FIELD_WEIGHTS)))
+        if not rows:
+            return
+        placeholders = ", ".join("?" * (len(FIELD_WEIGHTS) + 1))
+        with self._connection() as conn:
+            conn.executemany("DELETE FROM movie_fts WHERE rowid = ?", [(r[0],) for r in rows])
+            conn.executemany(
+                f"INSERT INTO movie_fts (rowid, {', '.join(FIELD_WEIGHTS)}) VALUES ({placeholders})", rows
+            )
+
+    def remove_movies(self, movie_ids):
+        with self._connection() as conn:
+            conn.executemany("DELETE FROM movie_fts WHERE rowid = ?", [(i,) for i in movie_ids])
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM movie_fts")
+
+    def is_empty(self):
+        return self._connection().execute("SELECT 1 FROM movie_fts LIMIT 1").fetchone() is None
+
+    def search(self, query, limit=1000):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        # SQLite 中 LIMIT -1 表示不限条数
+        limit = -1 if limit is None else limit
+        match = " AND ".join(f'"{token}"*' if prefix else f'"{token}"' for token, prefix in terms)
+        weights = ", ".join(str(w) for w in FIELD_WEIGHTS.values())
+        rows = self._connection().execute(
+            f"SELECT rowid FROM movie_fts WHERE movie_fts MATCH ? ORDER BY bm25(movie_fts, {weights}) LIMIT ?",
+            (match, limit),
+        )
+        return [row[0] for row in rows]
+
+
+class PythonIndexBackend(BaseSearchBackend):
+    """纯 Python 内存倒排索引，可选持久化到 PATH（pickle）"""
+
+    def __init__(self, PATH=None, **options):
+        super().__init__(**options)
+        self.path = os.fspath(PATH) if PATH else None
+        self._lock = threading.RLock()
+        self.postings = defaultdict(dict)  # token -> {movie_id: 权重}
+        self.documents = {}  # movie_id -> 该电影的 token 集合，用于删除
+        if self.path and os.path.exists(self.path):
+            with open(self.path, "rb") as fh:
+                self.postings, self.documents = pickle.load(fh)
+
+    def _persist(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            pickle.dump((self.postings, self.documents), fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+    def _remove(self, movie_id):
+        for token in self.documents.pop(movie_id, ()):
+            posting = self.postings.get(token)
+            if posting is not None:
+                posting.pop(movie_id, None)
+                if not posting:
+                    del self.postings[token]
+
+    def index_movies(self, movies):
+        with self._lock:
+            for movie in movies:
+                self._remove(movie.pk)
+                weights = defaultdict(float)
+                for field, text in _movie_fields(movie).items():
+                    for token in tokenize(text):
+                        weights[token] += FIELD_WEIGHTS[field]
+                for token, weight in weights.items():
+                    self.postings[token][movie.pk] = weight
+                self.documents[movie.pk] = set(weights)
+            self._persist()
+
+    def remove_movies(self, movie_ids):
+        with self._lock:
+            for movie_id in movie_ids:
+                self._remove(movie_id)
+            self._persist()
+
+    def clear(self):
+        with self._lock:
+            self.postings = defaultdict(dict)
+            self.documents = {}
+            self._persist()
+
+    def is_empty(self):
+        return not self.documents
+
+    def _matches(self, token, prefix):
+        if not prefix:
+            return self.postings.get(token, {})
+        merged = defaultdict(float)
+        for candidate, posting in self.postings.items():
+            if candidate.startswith(token):
+                for movie_id, weight in posting.items():
+                    merged[movie_id] += weight
+        return merged
+
+    def search(self, query, limit=1000):
+        terms = parse_query(query)
+        if not terms:
+            return []
+        with self._lock:
+            scores = None
+            # 先处理最短的倒排表，交集尽快缩小
+            for posting in sorted((self._matches(t, p) for t, p in terms), key=len):
+                if scores is None:
+                    scores = dict(posting)
+                else:
+                    scores = {i: s + posting[i] for i, s in scores.items() if i in posting}
+                if not scores:
+                    return []
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+        return [movie_id for movie_id, _ in ranked[:limit]]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _config():
+    return getattr(settings, "MOVIE_SEARCH", {})
+
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            config = dict(_config())
+            backend_cls = import_string(config.pop("BACKEND", "myapp.search.DatabaseIndexBackend"))
+            config.pop("MAX_RESULTS", None)
+            _backend = backend_cls(**config)
+        return _backend
+
+
+def reset_backend():
+    """丢弃当前后端实例（修改 settings.MOVIE_SEARCH 后调用）"""
+    global _backend
+    with _backend_lock:
+        _backend = None
+
+
+def search_movie_ids(query, limit=None):
+    """按相关度降序的电影 id，最多 limit 条（默认 MAX_RESULTS）"""
+    if limit is None:
+        limit = _config().get("MAX_RESULTS", 1000)
+    return get_backend().search(query, limit=limit)
+
+
+def filter_movies(queryset, query):
+    """
+    按关键词过滤电影查询集，返回全部匹配（不受 MAX_RESULTS 截断），排序由调用方决定。
+
+    索引为空时回退到对检索字段的 icontains 过滤。
+    """
+    backend = get_backend()
+    if backend.is_empty():
+        condition = Q()
+        for field in FIELD_WEIGHTS:
+            condition |= Q(**{f"{field}__icontains": query})
+        return queryset.filter(condition)
+    return backend.filter_queryset(queryset, query)
+
+
+def rebuild(batch_size=1000):
+    """按 id 分批从数据库重建索引，返回索引的电影数"""
+    from .models import Movie
+
+    backend = get_backend()
+    backend.clear()
+    total, last_id = 0, 0
+    while True:
+        batch = list(
+            Movie.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .only("id", *FIELD_WEIGHTS)[:batch_size]
+        )
+        if not batch:
+            return total
+        backend.index_movies(batch)
+        total += len(batch)
+        last_id = batch[-1].pk
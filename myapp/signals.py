@@ -0,0 +1,82 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import actions, facets, fragments, search
+from .models import Movie, UserAction
+from .tags import sync_movie_tags
+from .titles import normalize_title
+
+TAG_SOURCE_FIELDS = {"type", "region", "actors"}
+
+# 批量导入（bulk_create 等不触发模型信号的写入）完成后发送，参数 movie_ids 为新增/更新的电影 id
+movies_imported = Signal()
+
+IMPORT_SYNC_BATCH = 1000
+
+
+@receiver(post_save, sender=Movie)
+def movie_saved(sender, instance, update_fields=None, raw=False, **kwargs):
+    """电影保存后同步类型/地区/演员关联与检索索引"""
+    if raw:
+        return
+    if update_fields is None or TAG_SOURCE_FIELDS & set(update_fields):
+        sync_movie_tags([instance])
+    if update_fields is None or set(search.FIELD_WEIGHTS) & set(update_fields):
+        search.get_backend().index_movies([instance])
+    facets.invalidate()
+    fragments.invalidate_home()
+
+
+@receiver(post_delete, sender=Movie)
+def movie_deleted(sender, instance, **kwargs):
+    search.get_backend().remove_movies([instance.pk])
+    facets.invalidate()
+    fragments.invalidate_home()
+
+
+@receiver(movies_imported)
+def movies_bulk_imported(sender, movie_ids=(), **kwargs):
+    """批量导入后补做标题匹配键、标签同步与检索索引，并失效筛选项与首页片段缓存"""
+    movie_ids = list(movie_ids)
+    for start in range(0, len(movie_ids), IMPORT_SYNC_BATCH):
+        batch = list(Movie.objects.filter(id__in=movie_ids[start:start + IMPORT_SYNC_BATCH]))
+        stale = [m for m in batch if m.title_key != normalize_title(m.title)]
+        for movie in stale:
+            movie.title_key = normalize_title(movie.title)
+        Movie.objects.bulk_update(stale, ["title_key"])
+        sync_movie_tags(batch)
+        search.get_backend().index_movies(batch)
+    facets.invalidate()
+    fragments.invalidate_home()
+
+
+def _action_values(instance):
+    return tuple(getattr(instance, f) for f in actions.VALUE_FIELDS)
+
+
+def _tracked(update_fields):
+    return update_fields is None or bool(actions.SOURCE_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=UserAction)
+def user_action_before_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """记下修改前的收藏/评分/评论，供保存后计算差量"""
+    instance._values_before = None
+    if raw or instance._state.adding or not _tracked(update_fields):
+        return
+    instance._values_before = (
+        UserAction.objects.filter(pk=instance.pk).values_list(*actions.VALUE_FIELDS).first()
+    )
+
+
+@receiver(post_save, sender=UserAction)
+def user_action_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    """经由 Model.save() 的写入：增量更新用户统计、电影聚合值与AI推荐缓存"""
+    if raw or not _tracked(update_fields):
+        return
+    actions.record_change(instance.user_id, getattr(instance, "_values_before", None), _action_values(instance))
+
+
+@receiver(post_delete, sender=UserAction)
+def user_action_deleted(sender, instance, **kwargs):
+    actions.record_change(instance.user_id, _action_values(instance), None)
@@ -0,0 +1,327 @@
+"""
+物品相似度索引
+
+离线根据电影的类型/地区/演员特征以及用户共同评分（收藏）信号计算 item-item 相似度，
+每部电影只保留 top-k 个近邻，以 CSR 形式存放在紧凑的 array 中：
+
+    movie_ids[i]                       第 i 部电影的 id（升序，用于二分查找）
+    neighbors[offsets[i]:offsets[i+1]] 第 i 部电影的近邻 id（按相似度降序）
+    scores[offsets[i]:offsets[i+1]]    对应的相似度
+
+线上推荐只做内存查找与累加，不再对 Movie 表做 icontains 扫描。
+"""
+import heapq
+import math
+import os
+import pickle
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+
+from django.conf import settings
+
+from .utils import split_tokens
+
+INDEX_VERSION = 1
+
+# 各特征字段的权重，演员重合比类型重合更能说明两部电影相似
+FIELD_WEIGHTS = {"type": 1.0, "region": 0.5, "actors": 1.5}
+# 共同评分信号的权重
+CO_RATING_WEIGHT = 2.0
+# 评分不低于该值（或已收藏）视为正反馈
+POSITIVE_RATING = 7
+# 每个用户参与共现统计的最近正反馈条数上限，避免重度用户产生 O(n^2) 的组合
+CO_RATING_USER_LIMIT = 50
+# 共现按电影 id 分块统计，每块只统计较小 id 落在块内的电影对，限制临时字典的大小
+CO_RATING_BLOCK_SIZE = 2000
+# 每部电影保留的共现电影对上限（按次数取前若干个），结果大小不超过 电影数 × 该值
+CO_RATING_PAIR_LIMIT = 200
+
+
+class SimilarityIndex:
+    """紧凑的 top-k 近邻索引"""
+
+    def __init__(self, movie_ids, offsets, neighbors, scores):
+        self.movie_ids = movie_ids
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.movie_ids)
+
+    def _position(self, movie_id):
+        pos = bisect_left(self.movie_ids, movie_id)
+        if pos < len(self.movie_ids) and self.movie_ids[pos] == movie_id:
+            return pos
+        return None
+
+    def neighbors_of(self, movie_id, k=None):
+        """返回 [(近邻id, 相似度), ...]，按相似度降序"""
+        pos = self._position(movie_id)
+        if pos is None:
+            return []
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        if k is not None:
+            end = min(end, start + k)
+        return list(zip(self.neighbors[start:end], self.scores[start:end]))
+
+    def recommend(self, seeds, exclude=(), limit=24):
+        """根据种子电影 {movie_id: 权重} 累加近邻相似度，返回 top-N 电影 id"""
+        exclude = set(exclude)
+        acc = defaultdict(float)
+        for movie_id, weight in seeds.items():
+            for neighbor_id, score in self.neighbors_of(movie_id):
+                if neighbor_id not in exclude:
+                    acc[neighbor_id] += weight * score
+        best = heapq.nlargest(limit, acc.items(), key=lambda kv: kv[1])
+        return [movie_id for movie_id, _ in best]
+
+    def save(self, path):
+        path = os.fspath(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        payload = {
+            "version": INDEX_VERSION,
+            "movie_ids": self.movie_ids,
+            "offsets": self.offsets,
+            "neighbors": self.neighbors,
+            "scores": self.scores,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            pickle.dump(payload, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        # 原子替换，线上进程不会读到写了一半的文件
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as fh:
+            payload = pickle.load(fh)
+        if payload.get("version") != INDEX_VERSION:
+            raise ValueError(f"相似度索引版本不匹配: {payload.get('version')}")
+        return cls(payload["movie_ids"], payload["offsets"], payload["neighbors"], payload["scores"])
+
+
+def build_index(movies, co_counts=None, top_k=50, posting_limit=200):
+    """
+    构建相似度索引。
+
+    movies: 可迭代的 (id, score, type, region, actors)
+    co_counts: {(movie_a, movie_b): 共同正反馈用户数}，a < b
+    posting_limit: 候选生成时每个特征的倒排表只取评分最高的前 N 部，
+                   防止“剧情”这类大类目让构建退化为 O(n^2)；打分时仍使用完整特征
+    """
+    movie_ids, movie_scores, features = [], [], []
+    feature_ids, document_freq = {}, []
+    for movie_id, score, mtype, region, actors in sorted(movies, key=lambda m: m[0]):
+        feats = set()
+        for field, value in (("type", mtype), ("region", region), ("actors", actors)):
+            for token in split_tokens(value):
+                key = (field, token)
+                fid = feature_ids.get(key)
+                if fid is None:
+                    fid = feature_ids[key] = len(document_freq)
+                    document_freq.append(0)
+                feats.add(fid)
+        for fid in feats:
+            document_freq[fid] += 1
+        movie_ids.append(movie_id)
+        movie_scores.append(score or 0)
+        features.append(feats)
+
+    total = len(movie_ids)
+    field_of = [None] * len(document_freq)
+    for (field, _), fid in feature_ids.items():
+        field_of[fid] = field
+    # 特征权重 = 字段权重 * idf，取平方后即为两部电影共享该特征时的点积贡献
+    weight_sq = [
+        (FIELD_WEIGHTS[field_of[fid]] * (1 + math.log(total / df))) ** 2
+        for fid, df in enumerate(document_freq)
+    ]
+    norms = [math.sqrt(sum(weight_sq[f] for f in feats)) or 1.0 for feats in features]
+
+    postings = defaultdict(list)
+    for idx, feats in enumerate(features):
+        for fid in feats:
+            postings[fid].append(idx)
+    for fid, members in postings.items():
+        if len(members) > posting_limit:
+            members.sort(key=lambda i: movie_scores[i], reverse=True)
+            del members[posting_limit:]
+
+    position = {movie_id: idx for idx, movie_id in enumerate(movie_ids)}
+    co_neighbors = defaultdict(dict)
+    popularity = defaultdict(int)
+    for (a, b), count in (co_counts or {}).items():
+        ia, ib = position.get(a), position.get(b)
+        if ia is None or ib is None:
+            continue
+        co_neighbors[ia][ib] = count
+        co_neighbors[ib][ia] = count
+        popularity[ia] += count
+        popularity[ib] += count
+
+    offsets, neighbors, scores = array("q", [0]), array("q"), array("f")
+    for idx, feats in enumerate(features):
+        co = co_neighbors.get(idx, {})
+        candidates = set(co)
+        for fid in feats:
+            candidates.update(postings[fid])
+        candidates.discard(idx)
+        sims = {}
+        for other in candidates:
+            dot = sum(weight_sq[f] for f in feats & features[other])
+            sim = dot / (norms[idx] * norms[other])
+            count = co.get(other)
+            if count:
+                sim += CO_RATING_WEIGHT * count / math.sqrt(popularity[idx] * popularity[other])
+            if sim > 0:
+                sims[other] = sim
+        for other, sim in heapq.nlargest(top_k, sims.items(), key=lambda kv: kv[1]):
+            neighbors.append(movie_ids[other])
+            scores.append(sim)
+        offsets.append(len(neighbors))
+
+    return SimilarityIndex(array("q", movie_ids), offsets, neighbors, scores)
+
+
+def _positive_actions():
+    from django.db.models import Q
+
+    from .models import UserAction
+
+    return UserAction.objects.filter(Q(is_favorite=True) | Q(rating__gte=POSITIVE_RATING))
+
+
+def _liked_movies():
+    """
+    每个用户最近 CO_RATING_USER_LIMIT 条正反馈的电影 id，存成紧凑的 CSR 数组 (offsets, movie_ids)，
+    每个用户的区间内按 id 升序。
+    """
+    offsets, liked = array("q", [0]), array("q")
+    rows = (
+        _positive_actions()
+        .order_by("user_id", "-updated_at")
+        .values_list("user_id", "movie_id")
+        .iterator(chunk_size=5000)
+    )
+    current_user, recent = None, []
+
+    def flush():
+        if recent:
+            liked.extend(sorted(recent))
+            offsets.append(len(liked))
+
+    for user_id, movie_id in rows:
+        if user_id != current_user:
+            flush()
+            current_user, recent = user_id, []
+        if len(recent) < CO_RATING_USER_LIMIT:
+            recent.append(movie_id)
+    flush()
+    return offsets, liked
+
+
+def collect_co_counts(block_size=CO_RATING_BLOCK_SIZE, pair_limit=CO_RATING_PAIR_LIMIT):
+    """
+    统计每对电影被同一用户正反馈的次数，返回 {(较小 id, 较大 id): 次数}。
+
+    按较小 id 分块累加，每块结束时每部电影只保留次数最多的 pair_limit 个组合，
+    临时字典与结果都有上界，不随用户数增长。
+    """
+    offsets, liked = _liked_movies()
+    movie_ids = sorted(set(liked))
+    co_counts = {}
+    for start in range(0, len(movie_ids), block_size):
+        lo, hi = movie_ids[start], movie_ids[min(start + block_size, len(movie_ids)) - 1]
+        block = defaultdict(int)
+        for u in range(len(offsets) - 1):
+            items = liked[offsets[u]:offsets[u + 1]]
+            for i in range(bisect_left(items, lo), len(items)):
+                a = items[i]
+                if a > hi:
+                    break
+                for b in items[i + 1:]:
+                    block[(a, b)] += 1
+        partners = defaultdict(list)
+        for (a, b), count in block.items():
+            partners[a].append((count, b))
+        del block
+        for a, pairs in partners.items():
+            for count, b in heapq.nlargest(pair_limit, pairs):
+                co_counts[(a, b)] = count
+    return co_counts
+
+
+def build_from_db(top_k=50, posting_limit=200):
+    from .models import Movie
+
+    movies = Movie.objects.values_list("id", "score", "type", "region", "actors").iterator(chunk_size=5000)
+    return build_index(movies, collect_co_counts(), top_k=top_k, posting_limit=posting_limit)
+
+
+def index_path():
+    return os.fspath(getattr(settings, "RECOMMEND_INDEX_PATH", settings.BASE_DIR / "data" / "similarity.idx"))
+
+
+_cache_lock = threading.Lock()
+_cached = {"path": None, "mtime": None, "index": None}
+
+
+def get_index():
+    """加载（并按文件修改时间热更新）相似度索引，索引文件不存在时返回 None"""
+    path = index_path()
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _cache_lock:
+        if _cached["path"] != path or _cached["mtime"] != mtime:
+            _cached.update(path=path, mtime=mtime, index=SimilarityIndex.load(path))
+        return _cached["index"]
+
+
+def _seed_weight(is_favorite, rating):
+    if rating is not None and rating < 5:
+        return 0
+    weight = 1.0
+    if is_favorite:
+        weight += 1.0
+    if rating is not None and rating >= 8:
+        weight += 1.0
+    return weight
+
+
+def recommend_for_user(user, limit=24):
+    """
+    基于用户最近 200 条行为做近邻累加推荐。
+
+    返回推荐电影 id 列表；索引未构建时返回 None，由调用方回退到旧逻辑。
+    """
+    index = get_index()
+    if index is None:
+        return None
+    from .models import UserAction
+
+    actions = (
+        UserAction.objects.filter(user=user)
+        .order_by("-updated_at")
+        .values_list("movie_id", "is_favorite", "rating")[:200]
+    )
+    seeds, seen = {}, set()
+    for movie_id, is_favorite, rating in actions:
+        seen.add(movie_id)
+        weight = _seed_weight(is_favorite, rating)
+        if weight:
+            seeds[movie_id] = weight
+    if not seen:
+        return []
+    return index.recommend(seeds, exclude=seen, limit=limit)
+
+
+def similar_movie_ids(movie_id, limit=6):
+    index = get_index()
+    if index is None:
+        return None
+    return [neighbor_id for neighbor_id, _ in index.neighbors_of(movie_id, k=limit)]
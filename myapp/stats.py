@@ -0,0 +1,275 @@
+"""
+用户观影统计
+
+统计结果物化在 UserStats 中，个人统计页只读一行：
+
+- 全量计算（首次读取、rebuild_user_stats、check_user_stats）只需两次数据库往返：
+  按月分组的一条聚合查询（每月收藏数、评分数、评分和及各评分区间计数，总数由各月相加），
+  以及用户行为经电影关联到类型/地区分组计数、UNION 成的一条语句
+- UserAction 保存/删除时由信号调用 apply_change，按新旧取值的差量更新该行
+
+电影的类型/地区被修改后，已有统计中的标签计数不会随之改变，需重建或由校验命令修复。
+"""
+from django.db import transaction
+from django.db.models import CharField, Count, F, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import MovieGenre, MovieRegion, UserAction, UserStats
+
+# (键名, 下限, 上限)，区间左闭右开，最后一档包含 10 分
+RATING_BUCKETS = (
+    ("range_0_2", None, 2),
+    ("range_2_4", 2, 4),
+    ("range_4_6", 4, 6),
+    ("range_6_8", 6, 8),
+    ("range_8_10", 8, None),
+)
+TOP_N = 10
+STATE_FIELDS = (
+    "favorite_count", "rated_count", "rating_sum", "rating_dist", "monthly", "genre_counts", "region_counts",
+)
+# 浮点累加误差容忍度（校验时使用）
+TOLERANCE = 1e-6
+
+
+def _bucket_condition(low, high):
+    condition = Q(rating__isnull=False)
+    if low is not None:
+        condition &= Q(rating__gte=low)
+    if high is not None:
+        condition &= Q(rating__lt=high)
+    return condition
+
+
+def _bucket_of(rating):
+    for name, low, high in RATING_BUCKETS:
+        if (low is None or rating >= low) and (high is None or rating < high):
+            return name
+    return RATING_BUCKETS[-1][0]
+
+
+def _monthly_rows(user):
+    """[{month, favorites, rated, rating_sum, range_0_2, ...}]，按月升序"""
+    buckets = {name: Count("id", filter=_bucket_condition(low, high)) for name, low, high in RATING_BUCKETS}
+    return (
+        UserAction.objects.filter(user=user)
+        .annotate(month=TruncMonth("created_at"))
+        .values("month")
+        .annotate(
+            favorites=Count("id", filter=Q(is_favorite=True)),
+            rated=Count("rating"),
+            rating_sum=Sum("rating"),
+            **buckets,
+        )
+        .order_by("month")
+    )
+
+
+def _tag_counts(name_field, kind, user):
+    """
+    某一维度每个标签在收藏/评分电影中出现的次数。
+
+    从该用户的 UserAction 出发、经电影关联到标签：用户与收藏/评分条件作用在同一行行为上。
+    若从标签表出发、分两次 filter() 多值关系 movie__actions，Django 会各连接一次 useraction，
+    计数读到的是未限定用户的那次连接，会把其他用户的收藏/评分算进来。
+    """
+    return (
+        UserAction.objects.filter(Q(is_favorite=True) | Q(rating__isnull=False), user=user)
+        .values(name=F(name_field))
+        .annotate(
+            kind=Value(kind, output_field=CharField()),
+            favorites=Count("id", filter=Q(is_favorite=True)),
+            rated=Count("id", filter=Q(rating__isnull=False)),
+        )
+        .values_list("kind", "name", "favorites", "rated")
+        .order_by()
+    )
+
+
+def _month_key(value):
+    # 与 TruncMonth 一致，按当前时区取月份
+    if timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value.strftime("%Y-%m")
+
+
+def empty_state():
+    return {
+        "favorite_count": 0,
+        "rated_count": 0,
+        "rating_sum": 0.0,
+        "rating_dist": {name: 0 for name, _, _ in RATING_BUCKETS},
+        "monthly": {},
+        "genre_counts": {},
+        "region_counts": {},
+    }
+
+
+def aggregate_state(user):
+    """从 UserAction 全量计算统计（两次数据库往返）"""
+    state = empty_state()
+    for row in _monthly_rows(user):
+        state["favorite_count"] += row["favorites"]
+        state["rated_count"] += row["rated"]
+        state["rating_sum"] += row["rating_sum"] or 0
+        for name in state["rating_dist"]:
+            state["rating_dist"][name] += row[name]
+        if row["favorites"] or row["rated"]:
+            state["monthly"][_month_key(row["month"])] = [row["favorites"], row["rated"], row["rating_sum"] or 0]
+
+    rows = _tag_counts("movie__genres__name", "genre", user).union(
+        _tag_counts("movie__regions__name", "region", user), all=True
+    )
+    for kind, name, favorites, rated in rows.iterator():
+        # 没有该维度标签的电影经左连接得到 name 为空的一组
+        if name is not None:
+            state[f"{kind}_counts"][name] = [favorites, rated]
+    return state
+
+
+def _top(counts, column):
+    ranked = sorted(
+        ((name, values[column]) for name, values in counts.items() if values[column]),
+        key=lambda kv: (-kv[1], kv[0]),
+    )
+    return dict(ranked[:TOP_N])
+
+
+def present(state):
+    """统计状态 -> 统计页使用的数据"""
+    monthly = sorted(state["monthly"].items())
+    rated_count = state["rated_count"]
+    return {
+        "favorite_count": state["favorite_count"],
+        "rated_count": rated_count,
+        "avg_rating": round(state["rating_sum"] / rated_count, 2) if rated_count else 0,
+        "rating_dist": dict(state["rating_dist"]),
+        "top_types": _top(state["genre_counts"], 0),
+        "top_regions": _top(state["region_counts"], 0),
+        "top_rated_types": _top(state["genre_counts"], 1),
+        "top_rated_regions": _top(state["region_counts"], 1),
+        "monthly_favorites": {month: fav for month, (fav, _, _) in monthly if fav},
+        "monthly_avg_ratings": {month: round(total / rated, 2) for month, (_, rated, total) in monthly if rated},
+    }
+
+
+def state_of(row):
+    return {field: getattr(row, field) for field in STATE_FIELDS}
+
+
+def compute_user_stats(user):
+    """不读物化结果，直接从 UserAction 计算"""
+    return present(aggregate_state(user))
+
+
+def get_user_stats(user):
+    """读取物化统计；尚未物化时全量计算一次并保存"""
+    row = UserStats.objects.filter(user=user).first()
+    if row is None:
+        row, _ = UserStats.objects.get_or_create(user=user, defaults=aggregate_state(user))
+    return present(state_of(row))
+
+
+def rebuild(user):
+    """全量重算并覆盖该用户的物化统计"""
+    state = aggregate_state(user)
+    UserStats.objects.update_or_create(user=user, defaults=state)
+    return state
+
+
+def _close(a, b):
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_close(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_close(x, y) for x, y in zip(a, b))
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) <= TOLERANCE
+    return a == b
+
+
+def diff_state(stored, fresh):
+    """返回两份统计中取值不一致的字段名"""
+    return [field for field in STATE_FIELDS if not _close(stored[field], fresh[field])]
+
+
+# ==================== 增量维护 ====================
+
+def snapshot(movie_id, is_favorite, rating, created_at):
+    """一条行为对统计的贡献；既未收藏也未评分时为 None"""
+    if not is_favorite and rating is None:
+        return None
+    return (movie_id, bool(is_favorite), rating, _month_key(created_at))
+
+
+def _movie_tags(movie_ids):
+    """{电影 id: {"genre": [...], "region": [...]}}，一条语句取回"""
+    movie_ids = list(movie_ids)
+    rows = (
+        MovieGenre.objects.filter(movie_id__in=movie_ids)
+        .values_list("movie_id", Value("genre", output_field=CharField()), "genre__name")
+        .union(
+            MovieRegion.objects.filter(movie_id__in=movie_ids)
+            .values_list("movie_id", Value("region", output_field=CharField()), "region__name"),
+            all=True,
+        )
+    )
+    tags = {movie_id: {"genre": [], "region": []} for movie_id in movie_ids}
+    for movie_id, kind, name in rows:
+        tags[movie_id][kind].append(name)
+    return tags
+
+
+def _bump(counter, key, index, delta, size):
+    values = counter.get(key) or [0] * size
+    values[index] += delta
+    if any(abs(v) > TOLERANCE for v in values):
+        counter[key] = values
+    else:
+        counter.pop(key, None)
+
+
+def _apply(row, snap, tags, sign):
+    _, is_favorite, rating, month = snap
+    if is_favorite:
+        row.favorite_count += sign
+        _bump(row.monthly, month, 0, sign, 3)
+    if rating is not None:
+        row.rated_count += sign
+        row.rating_sum = round(row.rating_sum + sign * rating, 6)
+        row.rating_dist[_bucket_of(rating)] = row.rating_dist.get(_bucket_of(rating), 0) + sign
+        _bump(row.monthly, month, 1, sign, 3)
+        _bump(row.monthly, month, 2, sign * rating, 3)
+    for kind in ("genre", "region"):
+        counter = getattr(row, f"{kind}_counts")
+        for name in tags[kind]:
+            if is_favorite:
+                _bump(counter, name, 0, sign, 2)
+            if rating is not None:
+                _bump(counter, name, 1, sign, 2)
+
+
+def apply_change(user_id, before, after):
+    """
+    按一条行为变更前后的贡献（snapshot）更新物化统计。
+
+    行锁保证并发写入不丢更新；该用户尚未物化时跳过，首次读取时会全量计算。
+    """
+    apply_changes(user_id, [(before, after)])
+
+
+def apply_changes(user_id, changes):
+    """同 apply_change，changes 为 [(before, after), ...]；整批只锁一次、取一次标签"""
+    changes = [(before, after) for before, after in changes if before != after]
+    if not changes:
+        return
+    with transaction.atomic():
+        row = UserStats.objects.select_for_update().filter(user_id=user_id).first()
+        if row is None:
+            return
+        tags = _movie_tags({snap[0] for pair in changes for snap in pair if snap is not None})
+        for before, after in changes:
+            for snap, sign in ((before, -1), (after, 1)):
+                if snap is not None:
+                    _apply(row, snap, tags[snap[0]], sign)
+        row.save()
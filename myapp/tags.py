@@ -0,0 +1,77 @@
+"""
+电影标签（类型/地区/演员）同步
+
+Movie 上的 type/region/actors 仍保留原始分隔字符串用于展示，
+这里把它们拆分后写入 Genre/Region/Person 及其关联表，供筛选、推荐按索引关联查询。
+"""
+from .models import Genre, MovieActor, MovieGenre, MovieRegion, Person, Region
+from .utils import split_tokens
+
+# (Movie 上的字符串字段, 标签模型, 关联表, 关联表上指向标签的外键名)
+TAG_FIELDS = (
+    ("type", Genre, MovieGenre, "genre"),
+    ("region", Region, MovieRegion, "region"),
+    ("actors", Person, MovieActor, "person"),
+)
+
+
+def _lookup(model, names):
+    """
+    {传入的名称: id}。
+
+    MySQL 默认的排序规则不区分大小写/重音，“Sci-Fi” 会查到已有的 “sci-fi”，返回的是已有行的写法，
+    因此先按原样、再按 casefold 后的名称对应回传入的名称。
+    """
+    rows = list(model.objects.filter(name__in=names).values_list("name", "id"))
+    exact = dict(rows)
+    folded = {name.casefold(): tag_id for name, tag_id in rows}
+    ids = {}
+    for name in names:
+        tag_id = exact.get(name) or folded.get(name.casefold())
+        if tag_id is not None:
+            ids[name] = tag_id
+    return ids
+
+
+def _tag_ids(model, names):
+    """批量取得标签 id（键为传入的名称），不存在的先 bulk_create（忽略并发插入或排序规则视为相同的冲突）"""
+    names = set(names)
+    if not names:
+        return {}
+    max_length = model._meta.get_field("name").max_length
+    names = {n[:max_length] for n in names}
+    ids = _lookup(model, names)
+    missing = names - ids.keys()
+    if missing:
+        model.objects.bulk_create([model(name=n) for n in missing], ignore_conflicts=True)
+        ids.update(_lookup(model, missing))
+        # 排序规则与 casefold 判断不一致（如重音）时逐个按名称查询，由数据库判断相等
+        for name in missing - ids.keys():
+            ids[name] = model.objects.filter(name=name).values_list("id", flat=True).get()
+    return ids
+
+
+def sync_movie_tags(movies):
+    """按 movies 的字符串字段重建它们的标签关联（整批几条语句完成）"""
+    movies = list(movies)
+    if not movies:
+        return
+    movie_ids = [m.pk for m in movies]
+    for field, tag_model, link_model, fk_name in TAG_FIELDS:
+        tokens = {m.pk: split_tokens(getattr(m, field)) for m in movies}
+        max_length = tag_model._meta.get_field("name").max_length
+        ids = _tag_ids(tag_model, (t for values in tokens.values() for t in values))
+        link_model.objects.filter(movie_id__in=movie_ids).delete()
+        links = []
+        for movie_id, values in tokens.items():
+            seen = set()
+            for order, token in enumerate(values):
+                tag_id = ids[token[:max_length]]
+                if tag_id in seen:
+                    continue
+                seen.add(tag_id)
+                link = link_model(movie_id=movie_id, **{f"{fk_name}_id": tag_id})
+                if link_model is MovieActor:
+                    link.order = order
+                links.append(link)
+        link_model.objects.bulk_create(links, batch_size=1000)
@@ -0,0 +1,526 @@
+import importlib
+import json
+import sys
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Q
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from spiders.records import movie_fields
+
+from . import aggregates, ai, factors, jobs, search, similarity, stats, tags, titles
+from .actions import write_action
+from .models import AIRecommendJob, Genre, Movie, MovieActor, MovieGenre, UserAction, UserInfo, UserStats
+from .pagination import KeysetPaginator
+
+# 测试不依赖文件缓存与 FTS5：缓存用内存，检索用纯 Python 索引
+TEST_SETTINGS = {
+    "CACHES": {
+        "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+        "template_fragments": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "fragments"},
+    },
+    "MOVIE_SEARCH": {"BACKEND": "myapp.search.PythonIndexBackend", "MAX_RESULTS": 1000},
+    "RECOMMEND_INDEX_PATH": f"{tempfile.gettempdir()}/myapp-test-similarity.idx",
+}
+
+
+@override_settings(**TEST_SETTINGS)
+class BaseTestCase(TestCase):
+    def setUp(self):
+        search.reset_backend()
+        self.addCleanup(search.reset_backend)
+
+    def make_user(self, username):
+        return UserInfo.objects.create(username=username, user_ID=username)
+
+    def make_movie(self, title, **fields):
+        fields.setdefault("score", 8.0)
+        return Movie.objects.create(title=title, **fields)
+
+
+class UserStatsTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.drama = self.make_movie("甲", type="剧情", region="中国大陆")
+        self.romance = self.make_movie("乙", type="爱情/剧情", region="美国")
+        self.alice = self.make_user("alice")
+        self.bob = self.make_user("bob")
+        # 先物化，之后的写入走 apply_change 增量维护
+        for user in (self.alice, self.bob):
+            stats.get_user_stats(user)
+
+    def assertNoDrift(self, user):
+        stored = stats.state_of(UserStats.objects.get(user=user))
+        self.assertEqual(stats.diff_state(stored, stats.aggregate_state(user)), [])
+
+    def test_tag_counts_ignore_other_users_actions(self):
+        UserAction.objects.create(user=self.alice, movie=self.drama, rating=8)
+        UserAction.objects.create(user=self.bob, movie=self.drama, is_favorite=True)
+        UserAction.objects.create(user=self.bob, movie=self.romance, is_favorite=True, rating=6)
+
+        alice = stats.compute_user_stats(self.alice)
+        self.assertEqual(alice["favorite_count"], 0)
+        self.assertEqual(alice["top_types"], {})
+        self.assertEqual(alice["top_rated_types"], {"剧情": 1})
+        bob = stats.compute_user_stats(self.bob)
+        self.assertEqual(bob["top_types"], {"剧情": 2, "爱情": 1})
+        self.assertEqual(bob["top_rated_regions"], {"美国": 1})
+        self.assertNoDrift(self.alice)
+        self.assertNoDrift(self.bob)
+
+    def test_incremental_matches_aggregate_after_updates_and_deletes(self):
+        action = UserAction.objects.create(user=self.alice, movie=self.romance, is_favorite=True)
+        UserAction.objects.create(user=self.bob, movie=self.romance, rating=9)
+        action.is_favorite = False
+        action.rating = 3
+        action.save()
+        UserAction.objects.create(user=self.alice, movie=self.drama, is_favorite=True)
+        UserAction.objects.get(user=self.bob, movie=self.romance).delete()
+        self.assertNoDrift(self.alice)
+        self.assertNoDrift(self.bob)
+        self.assertEqual(stats.get_user_stats(self.bob)["rated_count"], 0)
+
+    def test_check_user_stats_reports_no_drift_after_mixed_writes(self):
+        write_action(self.alice, self.drama.pk, toggle_favorite=True)
+        write_action(self.bob, self.drama.pk, rating=7)
+        write_action(self.bob, self.romance.pk, toggle_favorite=True)
+        write_action(self.alice, self.romance.pk, rating=10, comment="好看")
+        write_action(self.alice, self.drama.pk, toggle_favorite=True)
+        UserAction.objects.filter(user=self.bob, movie=self.drama).get().delete()
+        before = {row.user_id: stats.state_of(row) for row in UserStats.objects.all()}
+
+        out = StringIO()
+        call_command("check_user_stats", stdout=out)
+        self.assertIn("全部一致", out.getvalue())
+        call_command("check_user_stats", "--fix", stdout=StringIO())
+        after = {row.user_id: stats.state_of(row) for row in UserStats.objects.all()}
+        self.assertEqual(before, after)
+
+
+class WriteActionTests(BaseTestCase):
+    def test_concurrent_toggle_between_read_and_update_is_retried(self):
+        user, movie = self.make_user("alice"), self.make_movie("甲", type="剧情", region="美国")
+        stats.get_user_stats(user)
+        write_action(user, movie.pk, toggle_favorite=True)
+        now, interleaved = timezone.now, {}
+
+        def now_after_concurrent_toggle():
+            # 另一个请求在本次读取之后、UPDATE 之前切换了收藏
+            if not interleaved:
+                interleaved["state"] = None
+                interleaved["state"] = write_action(user, movie.pk, toggle_favorite=True)
+            return now()
+
+        with mock.patch("myapp.actions.timezone.now", now_after_concurrent_toggle):
+            state = write_action(user, movie.pk, toggle_favorite=True)
+        self.assertFalse(interleaved["state"].is_favorite)
+        self.assertTrue(state.is_favorite)
+        self.assertTrue(UserAction.objects.get(user=user, movie=movie).is_favorite)
+        row = UserStats.objects.get(user=user)
+        self.assertEqual(stats.diff_state(stats.state_of(row), stats.aggregate_state(user)), [])
+        self.assertEqual(Movie.objects.get(pk=movie.pk).favorite_count, 1)
+
+
+    def test_bookkeeping_failure_rolls_back_the_write(self):
+        user, movie = self.make_user("alice"), self.make_movie("甲", type="剧情")
+        stats.get_user_stats(user)
+        with mock.patch.object(stats, "apply_changes", side_effect=OperationalError("Lock wait timeout exceeded")):
+            with self.assertRaises(OperationalError):
+                write_action(user, movie.pk, toggle_favorite=True)
+        self.assertFalse(UserAction.objects.filter(user=user).exists())
+        self.assertEqual(Movie.objects.get(pk=movie.pk).favorite_count, 0)
+
+    def test_write_conflict_is_a_retryable_503(self):
+        user, movie = self.make_user("alice"), self.make_movie("甲")
+        self.client.force_login(user)
+        with mock.patch("myapp.views.write_action", side_effect=OperationalError("deadlock")):
+            api = self.client.post(reverse("toggle_favorite_api", args=[movie.pk]))
+            page = self.client.post(reverse("toggle_favorite", args=[movie.pk]))
+        self.assertEqual((api.status_code, api["Retry-After"]), (503, "1"))
+        self.assertTrue(api.json()["retryable"])
+        self.assertEqual(page.status_code, 503)
+
+class BatchActionsApiTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = self.make_user("alice")
+        self.other = self.make_user("bob")
+        self.movies = [self.make_movie(f"片{i}", type="剧情", region="美国") for i in range(3)]
+        stats.get_user_stats(self.user)
+        self.client.force_login(self.user)
+
+    def post(self, items):
+        return self.client.post(
+            reverse("batch_actions_api"), data=json.dumps({"items": items}), content_type="application/json"
+        )
+
+    def test_per_item_results(self):
+        a, b, c = (m.pk for m in self.movies)
+        response = self.post([
+            {"movie_id": a, "rating": 12},
+            {"movie_id": b, "is_favorite": True, "comment": "  "},
+            {"movie_id": a, "rating": 5},
+            {"movie_id": 999999, "rating": 5},
+            {"movie_id": "x"},
+            {"movie_id": c},
+        ])
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data["written"], data["failed"]), (2, 4))
+        self.assertEqual([r["ok"] for r in data["results"]], [True, True, False, False, False, False])
+        self.assertEqual(data["results"][2]["error"], "movie_id 重复")
+        self.assertEqual(data["results"][3]["error"], "电影不存在")
+        self.assertEqual(UserAction.objects.get(user=self.user, movie_id=a).rating, 10)
+        self.assertIsNone(UserAction.objects.get(user=self.user, movie_id=b).comment)
+
+    def test_row_inserted_concurrently_is_not_counted_twice(self):
+        a, b, _ = self.movies
+        real_bulk_create, interleaved = UserAction.objects.bulk_create, {}
+
+        def bulk_create(objs, **kwargs):
+            # 另一个请求在本次读取旧值之后、写入之前插入了同一 (user, movie) 行
+            if not interleaved:
+                interleaved["state"] = None
+                interleaved["state"] = write_action(self.user, a.pk, rating=9)
+            return real_bulk_create(objs, **kwargs)
+
+        with mock.patch.object(UserAction.objects, "bulk_create", bulk_create):
+            self.post([{"movie_id": a.pk, "rating": 6}, {"movie_id": b.pk, "is_favorite": True}])
+        row = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.diff_state(stats.state_of(row), stats.aggregate_state(self.user)), [])
+        ids = [m.pk for m in self.movies]
+        incremental = list(Movie.objects.filter(pk__in=ids).order_by("pk").values_list(*Movie.AGGREGATE_FIELDS))
+        aggregates.recompute(ids)
+        recomputed = list(Movie.objects.filter(pk__in=ids).order_by("pk").values_list(*Movie.AGGREGATE_FIELDS))
+        self.assertEqual(incremental, recomputed)
+        self.assertEqual(UserAction.objects.get(user=self.user, movie=a).rating, 6)
+
+    def test_bookkeeping_matches_full_recompute(self):
+        a, b, c = self.movies
+        UserAction.objects.create(user=self.user, movie=a, is_favorite=True, rating=9, comment="旧")
+        UserAction.objects.create(user=self.other, movie=a, rating=4)
+        self.post([
+            {"movie_id": a.pk, "rating": None},
+            {"movie_id": b.pk, "rating": 7, "comment": "新"},
+            {"movie_id": c.pk, "is_favorite": True},
+        ])
+        row = UserStats.objects.get(user=self.user)
+        self.assertEqual(stats.diff_state(stats.state_of(row), stats.aggregate_state(self.user)), [])
+        ids = [m.pk for m in self.movies]
+        incremental = list(Movie.objects.filter(pk__in=ids).order_by("pk").values_list(*Movie.AGGREGATE_FIELDS))
+        aggregates.recompute(ids)
+        recomputed = list(Movie.objects.filter(pk__in=ids).order_by("pk").values_list(*Movie.AGGREGATE_FIELDS))
+        self.assertEqual(incremental, recomputed)
+        self.assertEqual(UserAction.objects.get(user=self.user, movie=a).comment, "旧")
+
+
+class MovieSearchTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for year in range(2001, 2006):
+            self.make_movie(f"星际旅行{year}", date=f"{year}-01-01")
+        self.make_movie("海上钢琴师", date="1998-10-28")
+        for title in ("千と千尋の神隠し", "기생충", "Amélie", "機動戦士ガンダム"):
+            self.make_movie(title, date="2001-07-20")
+
+    def list_titles(self, **params):
+        response = self.client.get(reverse("movie_list"), {"sort": "-date", **params})
+        return [movie.title for movie in response.context["page_obj"]]
+
+    @override_settings(MOVIE_SEARCH={**TEST_SETTINGS["MOVIE_SEARCH"], "MAX_RESULTS": 2})
+    def test_list_filter_is_not_truncated_by_max_results(self):
+        self.assertEqual(len(search.search_movie_ids("星际")), 2)
+        titles = self.list_titles(q="星际")
+        self.assertEqual(titles, [f"星际旅行{year}" for year in range(2005, 2000, -1)])
+
+    def test_kana_hangul_and_accented_titles(self):
+        for backend in ("myapp.search.PythonIndexBackend", "myapp.search.DatabaseIndexBackend"):
+            with self.subTest(backend=backend), override_settings(MOVIE_SEARCH={"BACKEND": backend}):
+                search.reset_backend()
+                search.rebuild()
+                titles = {
+                    "千尋": "千と千尋の神隠し", "神隠し": "千と千尋の神隠し", "기생": "기생충",
+                    "amelie": "Amélie", "AMÉLIE": "Amélie", "ガンダ": "機動戦士ガンダム",
+                }
+                for query, title in titles.items():
+                    self.assertEqual(self.list_titles(q=query), [title], query)
+
+    def test_falls_back_to_icontains_when_index_is_empty(self):
+        search.get_backend().clear()
+        self.assertEqual(self.list_titles(q="钢琴"), ["海上钢琴师"])
+
+
+class KeysetPaginationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        # 空值与重复值穿插，跨页边界落在空值上
+        for i, score in enumerate([9.0, None, 8.0, None, 8.0, 7.0, None]):
+            self.make_movie(f"片{i}", score=score)
+
+    def walk(self, ordering, per_page=2):
+        """先一路向后翻到末页，再从末页一路向前翻回首页，返回两次得到的 id 序列"""
+        paginator = KeysetPaginator(Movie.objects.all(), ordering, per_page)
+        page = paginator.get_page()
+        self.assertFalse(page.has_previous)
+        pages = [page]
+        while page.has_next:
+            page = paginator.get_page(page.next_cursor)
+            pages.append(page)
+        forward = [m.pk for page in pages for m in page]
+        backward = [m.pk for m in page]
+        while page.has_previous:
+            page = paginator.get_page(page.previous_cursor)
+            self.assertLessEqual(len(page), per_page)
+            backward[:0] = [m.pk for m in page]
+        return forward, backward
+
+    def expected(self, descending):
+        # 空值视为最小值：降序排最后、升序排最前
+        movies = Movie.objects.all()
+        low = float("-inf")
+        if descending:
+            key = lambda m: (-(low if m.score is None else m.score), m.pk)
+        else:
+            key = lambda m: (low if m.score is None else m.score, -m.pk)
+        return [m.pk for m in sorted(movies, key=key)]
+
+    def test_descending_with_nulls(self):
+        forward, backward = self.walk(["-score", "id"])
+        self.assertEqual(forward, self.expected(descending=True))
+        self.assertEqual(backward, forward)
+
+    def test_ascending_with_nulls(self):
+        forward, backward = self.walk(["score", "-id"])
+        self.assertEqual(forward, self.expected(descending=False))
+        self.assertEqual(backward, forward)
+
+    def test_page_sizes_that_split_the_null_run(self):
+        for per_page in (1, 3, 4):
+            forward, backward = self.walk(["-score", "id"], per_page)
+            self.assertEqual(forward, self.expected(descending=True))
+            self.assertEqual(backward, forward)
+
+
+class ImportMoviesTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        fixture = settings.BASE_DIR / "spiders" / "fixtures" / "top_list.json"
+        self.records = json.loads(fixture.read_text(encoding="utf-8"))
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = f"{tmp.name}/ur.jsonl"
+        with open(self.path, "w", encoding="utf-8") as fh:
+            for record in self.records:
+                fh.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def import_file(self, *args):
+        call_command("import_movies", self.path, *args, stdout=StringIO())
+
+    def snapshot(self):
+        movies = list(
+            Movie.objects.order_by("douban_id").values_list("id", "douban_id", "title", "score", "date", "type", "actors")
+        )
+        return movies, MovieGenre.objects.count(), MovieActor.objects.count()
+
+    def test_reimport_is_idempotent(self):
+        # 早期导入的同名同日期电影没有 douban_id，应被认领而不是重复插入
+        legacy = movie_fields(self.records[1])
+        self.make_movie(legacy["title"], date=legacy["date"])
+        self.import_file()
+        first = self.snapshot()
+        self.assertEqual(Movie.objects.count(), len(self.records))
+        self.assertEqual(Movie.objects.filter(douban_id__isnull=True).count(), 0)
+        self.assertEqual([douban_id for _, douban_id, *_ in first[0]], sorted(r["id"] for r in self.records))
+
+        self.import_file()
+        self.assertEqual(self.snapshot(), first)
+        self.import_file("--incremental")
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(search.search_movie_ids(self.records[0]["title"]), [first[0][0][0]])
+
+
+class IndexAdvisorTests(BaseTestCase):
+    def test_runs_every_query_shape_on_seeded_data(self):
+        out = StringIO()
+        call_command("index_advisor", seed=50, stdout=out)
+        self.assertIn("stats.tags", out.getvalue())
+        # 模拟数据在分析结束后回滚
+        self.assertFalse(Movie.objects.exists())
+
+
+@override_settings(MOVIE_SEARCH={"BACKEND": "myapp.search.DatabaseIndexBackend", "MAX_RESULTS": 1000})
+class DatabaseSearchTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for year in range(2001, 2031):
+            self.make_movie(f"星际旅行{year}", date=f"{year}-01-01", actors="张三")
+        self.make_movie("海上钢琴师", date="1998-10-28", actors="蒂姆·罗斯", summary="星际")
+
+    def test_ranked_search(self):
+        ids = search.search_movie_ids("海上 钢琴")
+        self.assertEqual(ids, [Movie.objects.get(title="海上钢琴师").pk])
+        # 标题命中排在简介命中之前；单字按前缀匹配
+        self.assertEqual(Movie.objects.get(pk=search.search_movie_ids("星际")[-1]).title, "海上钢琴师")
+        self.assertEqual(len(search.search_movie_ids("星")), 31)
+        self.assertEqual(search.search_movie_ids("星际 不存在"), [])
+
+    def test_list_filter_joins_the_token_table(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("movie_list"), {"q": "星际", "sort": "-date"})
+        titles = [movie.title for movie in response.context["page_obj"]]
+        self.assertEqual(titles, [f"星际旅行{year}" for year in range(2030, 2018, -1)])
+        listing = next(q["sql"] for q in queries if "ORDER BY" in q["sql"] and "myapp_movie" in q["sql"])
+        self.assertIn("myapp_moviesearchtoken", listing)
+        self.assertLess(listing.count(","), 60)
+
+    def test_index_follows_movie_changes(self):
+        movie = Movie.objects.get(title="海上钢琴师")
+        movie.title = "传奇"
+        movie.save()
+        self.assertEqual(search.search_movie_ids("钢琴"), [])
+        self.assertEqual(search.search_movie_ids("传奇"), [movie.pk])
+        movie.delete()
+        self.assertEqual(search.search_movie_ids("传奇"), [])
+
+
+class AIRecommendJobTests(BaseTestCase):
+    def test_expired_job_is_not_flipped_back_to_done(self):
+        job = AIRecommendJob.objects.create(user=self.make_user("alice"))
+
+        def generate(user):
+            # 生成期间任务超时，被轮询请求判为失败
+            AIRecommendJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+            jobs.expire_stale(AIRecommendJob.objects.get(pk=job.pk))
+            return {"success": True, "recommendations": []}, 200
+
+        with mock.patch.object(ai, "generate_recommendations", generate), self.assertLogs("myapp.jobs", "WARNING"):
+            self.assertTrue(jobs.run_job(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.status_code), (AIRecommendJob.STATUS_FAILED, 504))
+
+
+class FactorTrainingTests(BaseTestCase):
+    def test_unfavorited_rows_are_not_interactions(self):
+        alice = self.make_user("alice")
+        kept = [self.make_movie(f"片{i}") for i in range(3)]
+        dropped = self.make_movie("取消收藏")
+        UserAction.objects.create(user=alice, movie=kept[0], is_favorite=True)
+        UserAction.objects.create(user=alice, movie=kept[1], rating=4)
+        UserAction.objects.create(user=alice, movie=kept[2], comment="看过")
+        UserAction.objects.create(user=alice, movie=dropped, comment="")
+        users, movies, favorites, ratings = factors.load_interactions()
+        self.assertEqual(sorted(movies.tolist()), [m.pk for m in kept])
+
+
+class CoCountTests(BaseTestCase):
+    def test_blocked_counts_match_single_pass(self):
+        movies = [self.make_movie(f"片{i}") for i in range(6)]
+        liked = {"alice": [0, 1, 2, 3], "bob": [1, 2, 5], "carol": [0, 2, 5], "dave": [4]}
+        for username, picks in liked.items():
+            user = self.make_user(username)
+            for i in picks:
+                UserAction.objects.create(user=user, movie=movies[i], is_favorite=True)
+        single = similarity.collect_co_counts(block_size=len(movies))
+        self.assertEqual(single[(movies[1].pk, movies[2].pk)], 2)
+        self.assertEqual(single[(movies[2].pk, movies[5].pk)], 2)
+        self.assertEqual(len(single), 9)
+        self.assertEqual(similarity.collect_co_counts(block_size=1), single)
+        # 每部电影只保留次数最多的组合
+        capped = similarity.collect_co_counts(block_size=2, pair_limit=1)
+        self.assertEqual(capped[(movies[2].pk, movies[5].pk)], 2)
+        self.assertEqual(sum(1 for a, b in capped if a == movies[0].pk), 1)
+
+
+class ResolveTitlesTests(BaseTestCase):
+    def test_common_prefix_does_not_crowd_out_other_titles(self):
+        for i in range(5):
+            self.make_movie(f"星际穿越{i}", score=9.0)
+        rare = self.make_movie("海上钢琴师", score=6.0)
+        # 精确匹配一条，所有前缀的候选合并为一条
+        with mock.patch.object(titles, "CANDIDATE_LIMIT", 3), self.assertNumQueries(2):
+            resolved = titles.resolve_titles(["星际穿越", "海上钢琴师传奇"])
+        self.assertEqual(resolved["海上钢琴师传奇"], rare)
+        self.assertTrue(resolved["星际穿越"].title.startswith("星际穿越"))
+
+
+class TagSyncTests(BaseTestCase):
+    def case_insensitive_names(self, model):
+        """模拟 MySQL 默认排序规则：名称比较不区分大小写，插入只差大小写的名称视为冲突"""
+        manager = model.objects
+        real_filter, real_bulk_create = manager.filter, manager.bulk_create
+
+        def filter(*args, **kwargs):
+            if "name__in" in kwargs:
+                condition = Q()
+                for name in kwargs.pop("name__in"):
+                    condition |= Q(name__iexact=name)
+                args += (condition,)
+            if "name" in kwargs:
+                kwargs["name__iexact"] = kwargs.pop("name")
+            return real_filter(*args, **kwargs)
+
+        def bulk_create(objs, **kwargs):
+            existing = {name.casefold() for name in manager.values_list("name", flat=True)}
+            return real_bulk_create([o for o in objs if o.name.casefold() not in existing], **kwargs)
+
+        return mock.patch.multiple(manager, filter=filter, bulk_create=bulk_create)
+
+    def test_tag_names_differing_only_in_case_map_to_existing_row(self):
+        genre = Genre.objects.create(name="sci-fi")
+        with self.case_insensitive_names(Genre):
+            ids = tags._tag_ids(Genre, ["Sci-Fi", "剧情"])
+        self.assertEqual(ids["Sci-Fi"], genre.pk)
+        self.assertEqual(Genre.objects.filter(name="剧情").count(), 1)
+
+
+class SpiderParserTests(SimpleTestCase):
+    """爬虫解析器对照 spiders/fixtures 中保存的响应（raw_store.py --cat 取出的样本）"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 爬虫是独立脚本，模块之间按同目录导入
+        spider_dir = str(settings.BASE_DIR / "spiders")
+        sys.path.insert(0, spider_dir)
+        cls.addClassCleanup(sys.path.remove, spider_dir)
+        cls.details = importlib.import_module("details")
+        cls.get = importlib.import_module("get")
+        cls.fixtures = settings.BASE_DIR / "spiders" / "fixtures"
+
+    def fixture(self, name):
+        return (self.fixtures / name).read_text(encoding="utf-8")
+
+    def test_parse_detail(self):
+        detail = self.details.parse_detail(self.fixture("subject_1291546.html"))
+        self.assertEqual(detail["runtime"], 171)
+        self.assertEqual(detail["directors"], ["陈凯歌"])
+        self.assertEqual(detail["cast"], ["张国荣", "张丰毅", "巩俐", "葛优"])
+        # 完整简介取自 span.all，按行去掉全角缩进
+        self.assertEqual(len(detail["summary"].splitlines()), 2)
+        self.assertTrue(detail["summary"].startswith("段小楼（张丰毅）"))
+        self.assertTrue(detail["summary"].endswith("逐渐产生了嫌隙。"))
+
+    def test_parse_detail_rejects_captcha_page(self):
+        with self.assertRaises(ValueError):
+            self.details.parse_detail(self.fixture("captcha.html"))
+
+    def test_parse_page(self):
+        records = self.get.parse_page(self.fixture("top_list.json"))
+        self.assertEqual([r["id"] for r in records], ["1303341", "5046033", "26328483"])
+        self.assertEqual(records[0]["title"], "女篮5号")
+        self.assertEqual(records[0]["types"], ["剧情", "爱情", "运动"])
+
+    def test_parse_page_rejects_non_list(self):
+        with self.assertRaises(ValueError):
+            self.get.parse_page('{"msg": "检测到有异常请求"}')
+        with self.assertRaises(ValueError):
+            self.get.parse_page(self.fixture("captcha.html"))
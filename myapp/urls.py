@@ -30,9 +30,13 @@ urlpatterns = [
     path('movies/<int:pk>/favorite/ajax/', views.toggle_favorite_api, name='toggle_favorite_api'),
     path('movies/<int:pk>/rate/ajax/', views.rate_movie_api, name='rate_movie_api'),
     path('movies/<int:pk>/comment/', views.submit_comment, name='submit_comment'),
+    path('api/movies/<int:pk>/comments/', views.movie_comments_api, name='movie_comments_api'),
+    path('api/actions/batch/', views.batch_actions_api, name='batch_actions_api'),
     path('recommend/', views.recommend_view, name='recommend'),
+    path('api/movies/', views.movie_list_api, name='movie_list_api'),
     path('api/recommend/', views.recommend_api, name='recommend_api'),
     path('api/ai-recommend/', views.ai_recommend_api, name='ai_recommend_api'),
+    path('api/ai-recommend/<uuid:job_id>/', views.ai_recommend_job, name='ai_recommend_job'),
     path('profile/', views.profile, name='profile'),
     path('profile/edit/', views.profile_edit, name='profile_edit'),
     path('profile/password/', views.profile_password, name='profile_password'),
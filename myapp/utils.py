@@ -0,0 +1,10 @@
+import re
+
+_TOKEN_SEPARATORS = re.compile(r"[，,、|/\s]+")
+
+
+def split_tokens(value):
+    """拆分类型/地区/演员等分隔字符串（爬虫入库时以空格拼接，后台录入常用逗号）"""
+    if not value:
+        return []
+    return [t.strip() for t in _TOKEN_SEPARATORS.split(value) if t.strip()]
@@ -1,66 +1,98 @@
-from collections import Counter
+from datetime import date
+from functools import wraps
 from urllib.parse import urlencode
 import json
-import requests
-import re
 
 from django.contrib import messages
 from django.contrib.auth import login, logout, update_session_auth_hash
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator
-from django.db.models import Q, Avg
-from django.http import JsonResponse
+from django.db import OperationalError
+from django.db.models import Q, Count
+from django.http import Http404, HttpResponse, JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.conf import settings
 
+from . import ai, factors, jobs
+from .actions import write_action, write_batch
+from .facets import get_facets
+from .fragments import fragment_timeout
 from .forms import (
     LoginForm,
     RegistrationForm,
     ProfileForm,
     PasswordUpdateForm,
 )
-from .models import Movie, UserAction
+from .models import AIRecommendJob, Movie, MovieActor, MovieGenre, MovieRegion, UserAction
+from .search import filter_movies
+from .pagination import InvalidCursor, KeysetPaginator, approximate_count
+from .similarity import recommend_for_user, similar_movie_ids
+from .stats import get_user_stats
 
 
 def _querystring_without_page(request):
     params = request.GET.copy()
     params.pop("page", None)
+    params.pop("cursor", None)
     qs = params.urlencode()
     return f"&{qs}" if qs else ""
 
 
-def _split_tokens(value):
-    if not value:
-        return []
-    tokens = value.replace("，", ",").replace("、", ",").replace("|", ",").replace("/", ",").split(",")
-    return [t.strip() for t in tokens if t.strip()]
+def _movie_json(m):
+    return {
+        "id": m.id,
+        "title": m.title,
+        "score": m.score,
+        "poster": m.poster,
+        "type": m.type,
+        "region": m.region,
+        "date": m.date,
+    }
+
+
+def _movies_in_order(ids):
+    """按给定 id 顺序取出电影（in_bulk 一次查询）"""
+    movies = Movie.objects.in_bulk(ids)
+    return [movies[i] for i in ids if i in movies]
 
 
 def _personalized_recommendations(user, limit=24):
-    actions = (
+    # 优先用协同过滤因子；模型未训练（manage.py train_factors）或训练后才注册的用户用相似度索引
+    ids = factors.recommend_for_user(user, limit=limit)
+    if ids is None:
+        ids = recommend_for_user(user, limit=limit)
+    if ids is not None:
+        return _movies_in_order(ids) or None
+    # 相似度索引尚未构建（manage.py build_similarity）时回退到按类型/演员匹配
+    return _token_match_recommendations(user, limit=limit)
+
+
+def _token_match_recommendations(user, limit=24):
+    seen_movie_ids = list(
         UserAction.objects.filter(user=user)
-        .select_related("movie")
-        .order_by("-updated_at")[:200]
+        .order_by("-updated_at")
+        .values_list("movie_id", flat=True)[:200]
     )
-    if not actions:
+    if not seen_movie_ids:
         return None
 
-    type_counter, actor_counter = Counter(), Counter()
-    seen_movie_ids = set()
-    for action in actions:
-        m = action.movie
-        seen_movie_ids.add(m.id)
-        type_counter.update(_split_tokens(m.type))
-        actor_counter.update(_split_tokens(m.actors))
-
-    top_types = [t for t, _ in type_counter.most_common(5)]
-    top_actors = [a for a, _ in actor_counter.most_common(5)]
+    top_genres = list(
+        MovieGenre.objects.filter(movie_id__in=seen_movie_ids)
+        .values("genre_id").annotate(n=Count("id")).order_by("-n")
+        .values_list("genre_id", flat=True)[:5]
+    )
+    top_actors = list(
+        MovieActor.objects.filter(movie_id__in=seen_movie_ids)
+        .values("person_id").annotate(n=Count("id")).order_by("-n")
+        .values_list("person_id", flat=True)[:5]
+    )
 
     filters = Q()
-    for t in top_types:
-        filters |= Q(type__icontains=t)
-    for a in top_actors:
-        filters |= Q(actors__icontains=a)
+    if top_genres:
+        filters |= Q(id__in=MovieGenre.objects.filter(genre_id__in=top_genres).values("movie_id"))
+    if top_actors:
+        filters |= Q(id__in=MovieActor.objects.filter(person_id__in=top_actors).values("movie_id"))
 
     qs = Movie.objects.exclude(id__in=seen_movie_ids)
     if filters:
@@ -74,6 +106,7 @@ def _hot_recommendations(limit=24):
 
 
 def home(request):
+    # 以下查询集均为惰性求值，模板片段缓存命中时不会执行（见 myapp/fragments.py）
     # 轮播图：选择评分最高的5部电影
     carousel_movies = Movie.objects.filter(score__isnull=False).order_by("-score")[:5]
     top_rated = Movie.objects.order_by("-score")[:8]
@@ -87,6 +120,7 @@ def home(request):
             "top_rated": top_rated,
             "latest": latest,
             "recommend": recommend,
+            "fragment_timeout": fragment_timeout(),
         },
     )
 
@@ -123,82 +157,171 @@ def logout_user(request):
     return redirect("/")
 
 
-def top_list(request):
-    region = request.GET.get("region")
-    mtype = request.GET.get("type")
-    qs = Movie.objects.all()
+def _filter_by_tags(qs, region, mtype, decade=None):
+    """按地区/类型/年代筛选：走标签关联表的 (tag, movie) 索引与 date 范围条件"""
     if region:
-        qs = qs.filter(region__icontains=region)
+        qs = qs.filter(id__in=MovieRegion.objects.filter(region__name=region).values("movie_id"))
     if mtype:
-        qs = qs.filter(type__icontains=mtype)
-    qs = qs.order_by("-score")
+        qs = qs.filter(id__in=MovieGenre.objects.filter(genre__name=mtype).values("movie_id"))
+    if decade:
+        qs = qs.filter(date__gte=date(decade, 1, 1), date__lt=date(decade + 10, 1, 1))
+    return qs
+
+
+def _parse_decade(value):
+    try:
+        decade = int(value) // 10 * 10
+    except (TypeError, ValueError):
+        return None
+    return decade if 1800 <= decade <= 2100 else None
+
+
+def _facet_context():
+    facet_counts = get_facets()
+    return {
+        "regions": facet_counts["regions"],
+        "types": facet_counts["genres"],
+        "decades": facet_counts["decades"],
+    }
 
-    paginator = Paginator(qs, 12)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+
+def _keyset_ordering(sort):
+    """
+    降序用 (-score, id)，升序用 (score, -id)：两者正好互为反向，
+    都能由同一个 (-score, id) 复合索引顺序/逆序扫描得到。
+    """
+    return [sort, "id"] if sort.startswith("-") else [sort, "-id"]
+
+
+def _paginate_movies(request, qs, sort, per_page=12):
+    """
+    列表分页：默认使用游标分页（按 sort + id 定位，不做 COUNT/OFFSET），
+    settings.MOVIE_LIST_PAGINATION = "page" 时退回页码分页。
+    """
+    if getattr(settings, "MOVIE_LIST_PAGINATION", "cursor") == "page" and "cursor" not in request.GET:
+        return Paginator(qs.order_by(*_keyset_ordering(sort)), per_page).get_page(request.GET.get("page")), False
+    paginator = KeysetPaginator(qs, _keyset_ordering(sort), per_page)
+    try:
+        return paginator.get_page(request.GET.get("cursor")), True
+    except InvalidCursor:
+        return paginator.get_page(), True
+
+
+def _count_context(request, qs):
+    """?count=approx 时附带近似总数"""
+    if request.GET.get("count") != "approx":
+        return {}
+    total, estimated = approximate_count(qs)
+    return {"total": total, "total_estimated": estimated}
+
+
+def top_list(request):
+    region = request.GET.get("region")
+    mtype = request.GET.get("type")
+    decade = _parse_decade(request.GET.get("decade"))
+    qs = _filter_by_tags(Movie.objects.all(), region, mtype, decade)
+    page_obj, cursor_mode = _paginate_movies(request, qs, "-score")
 
     return render(
         request,
         "movies/top.html",
         {
             "page_obj": page_obj,
-            "regions": Movie.objects.exclude(region__isnull=True).exclude(region="").values_list("region", flat=True).distinct()[:30],
-            "types": Movie.objects.exclude(type__isnull=True).exclude(type="").values_list("type", flat=True).distinct()[:30],
+            "cursor_mode": cursor_mode,
+            **_count_context(request, qs),
+            **_facet_context(),
             "querystring": _querystring_without_page(request),
+            "decade": decade,
         },
     )
 
 
-def movie_list(request):
+LIST_SORTS = ["-date", "-score", "date", "score", "-favorite_count"]
+
+
+def _movie_list_queryset(request):
     keyword = request.GET.get("q")
     region = request.GET.get("region")
     mtype = request.GET.get("type")
+    decade = _parse_decade(request.GET.get("decade"))
     sort = request.GET.get("sort", "-date")
 
     qs = Movie.objects.all()
     if keyword:
-        qs = qs.filter(Q(title__icontains=keyword) | Q(actors__icontains=keyword) | Q(summary__icontains=keyword))
-    if region:
-        qs = qs.filter(region__icontains=region)
-    if mtype:
-        qs = qs.filter(type__icontains=mtype)
-    if sort not in ["-date", "-score", "date", "score"]:
+        qs = filter_movies(qs, keyword)
+    qs = _filter_by_tags(qs, region, mtype, decade)
+    if sort not in LIST_SORTS:
         sort = "-date"
-    qs = qs.order_by(sort)
+    params = {
+        "keyword": keyword or "",
+        "region": region or "",
+        "mtype": mtype or "",
+        "decade": decade,
+        "sort": sort,
+    }
+    return qs, params
+
 
-    paginator = Paginator(qs, 12)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+def movie_list(request):
+    qs, params = _movie_list_queryset(request)
+    page_obj, cursor_mode = _paginate_movies(request, qs, params["sort"])
 
     return render(
         request,
         "movies/list.html",
         {
             "page_obj": page_obj,
-            "regions": Movie.objects.exclude(region__isnull=True).exclude(region="").values_list("region", flat=True).distinct()[:30],
-            "types": Movie.objects.exclude(type__isnull=True).exclude(type="").values_list("type", flat=True).distinct()[:30],
+            "cursor_mode": cursor_mode,
+            **_count_context(request, qs),
+            **_facet_context(),
             "querystring": _querystring_without_page(request),
-            "sort": sort,
-            "keyword": keyword or "",
-            "region": region or "",
-            "mtype": mtype or "",
+            **params,
         },
     )
 
 
+def movie_list_api(request):
+    """影片列表JSON接口（游标分页），参数同影片库，另支持 limit 与 count=approx|exact"""
+    qs, params = _movie_list_queryset(request)
+    try:
+        limit = max(1, min(100, int(request.GET.get("limit", 20))))
+    except ValueError:
+        limit = 20
+    try:
+        page = KeysetPaginator(qs, _keyset_ordering(params["sort"]), limit).get_page(request.GET.get("cursor"))
+    except InvalidCursor as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    data = {
+        "items": [_movie_json(m) for m in page],
+        "next_cursor": page.next_cursor,
+        "previous_cursor": page.previous_cursor,
+    }
+    count_mode = request.GET.get("count")
+    if count_mode == "exact":
+        data.update(count=qs.count(), count_estimated=False)
+    elif count_mode == "approx":
+        data["count"], data["count_estimated"] = approximate_count(qs)
+    return JsonResponse(data)
+
+
 def movie_detail(request, pk):
     movie = get_object_or_404(Movie, pk=pk)
-    related = Movie.objects.filter(type=movie.type).exclude(pk=pk).order_by("-score")[:6]
+    related_ids = similar_movie_ids(movie.pk, limit=6)
+    if related_ids:
+        related = _movies_in_order(related_ids)
+    else:
+        related = (
+            Movie.objects.filter(genres__in=movie.genres.values("id"))
+            .exclude(pk=pk)
+            .annotate(shared=Count("genres"))
+            .order_by("-shared", "-score")[:6]
+        )
     action = None
     if request.user.is_authenticated:
         action = UserAction.objects.filter(user=request.user, movie=movie).first()
-    # 获取所有评论（有评分或评论的）
-    from django.db.models import Q
-    comments = UserAction.objects.filter(
-        movie=movie
-    ).filter(
-        Q(rating__isnull=False) | Q(comment__isnull=False, comment__gt="")
-    ).select_related("user").order_by("-updated_at")
+    # 评论只渲染第一页，其余由 movie_comments_api 滚动加载
+    comments = _comment_paginator(movie.pk).get_page()
     return render(
         request,
         "movies/detail.html",
@@ -211,6 +334,42 @@ def movie_detail(request, pk):
     )
 
 
+COMMENTS_PER_PAGE = 20
+
+
+def _comment_paginator(movie_id, per_page=COMMENTS_PER_PAGE):
+    """电影的评论（有评分或评论的行为），按 (updated_at, id) 倒序游标分页"""
+    qs = UserAction.objects.filter(movie_id=movie_id).filter(
+        Q(rating__isnull=False) | Q(comment__isnull=False, comment__gt="")
+    ).select_related("user")
+    return KeysetPaginator(qs, ["-updated_at", "-id"], per_page)
+
+
+def _comment_json(action):
+    return {
+        "user": action.user.nickname or action.user.username,
+        "rating": action.rating,
+        "comment": action.comment,
+        "updated_at": action.updated_at.strftime("%Y-%m-%d %H:%M"),
+    }
+
+
+def movie_comments_api(request, pk):
+    """评论JSON接口（游标分页），参数 cursor、limit"""
+    try:
+        limit = max(1, min(100, int(request.GET.get("limit", COMMENTS_PER_PAGE))))
+    except ValueError:
+        limit = COMMENTS_PER_PAGE
+    try:
+        page = _comment_paginator(pk, limit).get_page(request.GET.get("cursor"))
+    except InvalidCursor as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+    return JsonResponse({
+        "items": [_comment_json(a) for a in page],
+        "next_cursor": page.next_cursor,
+    })
+
+
 def recommend_view(request):
     personalized = False
     recs = None
@@ -257,98 +416,12 @@ def profile(request):
 @login_required
 def user_stats(request):
     """用户统计数据页面"""
-    user = request.user
-    
-    # 收藏统计
-    favorites = UserAction.objects.filter(user=user, is_favorite=True).select_related("movie")
-    favorite_count = favorites.count()
-    
-    # 评分统计
-    rated = UserAction.objects.filter(user=user, rating__isnull=False).select_related("movie")
-    rated_count = rated.count()
-    avg_rating = rated.aggregate(avg=Avg("rating"))["avg"] or 0
-    
-    # 评分分布（0-2, 2-4, 4-6, 6-8, 8-10）
-    rating_dist = {"range_0_2": 0, "range_2_4": 0, "range_4_6": 0, "range_6_8": 0, "range_8_10": 0}
-    for action in rated:
-        r = action.rating
-        if r < 2:
-            rating_dist["range_0_2"] += 1
-        elif r < 4:
-            rating_dist["range_2_4"] += 1
-        elif r < 6:
-            rating_dist["range_4_6"] += 1
-        elif r < 8:
-            rating_dist["range_6_8"] += 1
-        else:
-            rating_dist["range_8_10"] += 1
-    
-    # 收藏影片的类型统计
-    favorite_types = Counter()
-    for action in favorites:
-        if action.movie.type:
-            types = _split_tokens(action.movie.type)
-            favorite_types.update(types)
-    top_types = dict(favorite_types.most_common(10))
-    
-    # 收藏影片的地区统计
-    favorite_regions = Counter()
-    for action in favorites:
-        if action.movie.region:
-            regions = _split_tokens(action.movie.region)
-            favorite_regions.update(regions)
-    top_regions = dict(favorite_regions.most_common(10))
-    
-    # 评分影片的类型统计
-    rated_types = Counter()
-    for action in rated:
-        if action.movie.type:
-            types = _split_tokens(action.movie.type)
-            rated_types.update(types)
-    top_rated_types = dict(rated_types.most_common(10))
-    
-    # 评分影片的地区统计
-    rated_regions = Counter()
-    for action in rated:
-        if action.movie.region:
-            regions = _split_tokens(action.movie.region)
-            rated_regions.update(regions)
-    top_rated_regions = dict(rated_regions.most_common(10))
-    
-    # 月度收藏趋势（简化：按创建时间）
-    from django.utils import timezone
-    from datetime import timedelta
-    monthly_favorites = {}
-    for action in favorites:
-        month_key = action.created_at.strftime("%Y-%m")
-        monthly_favorites[month_key] = monthly_favorites.get(month_key, 0) + 1
-    
-    # 月度评分趋势
-    monthly_ratings = {}
-    for action in rated:
-        month_key = action.created_at.strftime("%Y-%m")
-        if month_key not in monthly_ratings:
-            monthly_ratings[month_key] = []
-        monthly_ratings[month_key].append(action.rating)
-    monthly_avg_ratings = {k: sum(v) / len(v) for k, v in monthly_ratings.items()}
-    
-    return render(
-        request,
-        "account/stats.html",
-        {
-            "user_obj": user,
-            "favorite_count": favorite_count,
-            "rated_count": rated_count,
-            "avg_rating": round(avg_rating, 2),
-            "rating_dist": rating_dist,
-            "top_types": json.dumps(top_types, ensure_ascii=False),
-            "top_regions": json.dumps(top_regions, ensure_ascii=False),
-            "top_rated_types": json.dumps(top_rated_types, ensure_ascii=False),
-            "top_rated_regions": json.dumps(top_rated_regions, ensure_ascii=False),
-            "monthly_favorites": json.dumps(monthly_favorites, ensure_ascii=False),
-            "monthly_avg_ratings": json.dumps({k: round(v, 2) for k, v in monthly_avg_ratings.items()}, ensure_ascii=False),
-        },
-    )
+    stats = get_user_stats(request.user)
+    context = {"user_obj": request.user}
+    for key, value in stats.items():
+        # 图表数据以 JSON 字符串传给模板
+        context[key] = json.dumps(value, ensure_ascii=False) if key.startswith(("top_", "monthly_")) else value
+    return render(request, "account/stats.html", context)
 
 
 @login_required
@@ -374,82 +447,105 @@ def profile_password(request):
     return render(request, "account/password.html", {"form": form})
 
 
+# 行为写入因并发冲突或锁等待失败时，建议客户端等待的秒数
+WRITE_RETRY_AFTER = 1
+
+
+def _retryable_write(as_json=True):
+    """
+    行为写入遇到并发修改重试用尽、锁等待超时或死锁（OperationalError）时返回 503 与 Retry-After，
+    而不是 500；此时写入已整体回滚，重试是安全的。
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            try:
+                return view(request, *args, **kwargs)
+            except OperationalError:
+                message = "操作繁忙，请稍后重试"
+                if as_json:
+                    response = JsonResponse({"error": message, "retryable": True}, status=503)
+                else:
+                    response = HttpResponse(message, status=503, content_type="text/plain; charset=utf-8")
+                response["Retry-After"] = str(WRITE_RETRY_AFTER)
+                return response
+        return wrapper
+    return decorator
+
+
+def _write_action_or_404(request, pk, **changes):
+    """写入当前用户对电影 pk 的行为（见 myapp/actions.py），电影不存在时 404"""
+    try:
+        return write_action(request.user, pk, **changes)
+    except Movie.DoesNotExist:
+        raise Http404("电影不存在")
+
+
 @login_required
+@_retryable_write(as_json=False)
 def toggle_favorite(request, pk):
-    movie = get_object_or_404(Movie, pk=pk)
-    action, _ = UserAction.objects.get_or_create(user=request.user, movie=movie)
-    action.is_favorite = not action.is_favorite
-    action.save()
+    action = _write_action_or_404(request, pk, toggle_favorite=True)
     messages.success(request, "已收藏" if action.is_favorite else "已取消收藏")
     return redirect("movie_detail", pk=pk)
 
 
 @login_required
+@_retryable_write(as_json=False)
 def rate_movie(request, pk):
-    movie = get_object_or_404(Movie, pk=pk)
     try:
         rating = float(request.POST.get("rating"))
     except (TypeError, ValueError):
         messages.error(request, "评分格式不正确")
         return redirect("movie_detail", pk=pk)
-    action, _ = UserAction.objects.get_or_create(user=request.user, movie=movie)
-    action.rating = max(0, min(10, rating))
-    action.save()
+    action = _write_action_or_404(request, pk, rating=max(0, min(10, rating)))
     messages.success(request, f"已评分 {action.rating}")
     return redirect("movie_detail", pk=pk)
 
 
 @login_required
+@_retryable_write()
 def toggle_favorite_api(request, pk):
     if request.method != "POST":
         return JsonResponse({"error": "method not allowed"}, status=405)
-    movie = get_object_or_404(Movie, pk=pk)
-    action, _ = UserAction.objects.get_or_create(user=request.user, movie=movie)
-    action.is_favorite = not action.is_favorite
-    action.save()
+    action = _write_action_or_404(request, pk, toggle_favorite=True)
     return JsonResponse({"is_favorite": action.is_favorite})
 
 
 @login_required
+@_retryable_write()
 def rate_movie_api(request, pk):
     if request.method != "POST":
         return JsonResponse({"error": "method not allowed"}, status=405)
-    movie = get_object_or_404(Movie, pk=pk)
     try:
         rating = float(request.POST.get("rating"))
     except (TypeError, ValueError):
         return JsonResponse({"error": "invalid rating"}, status=400)
-    rating = max(0, min(10, rating))
-    action, _ = UserAction.objects.get_or_create(user=request.user, movie=movie)
-    action.rating = rating
-    action.save()
+    action = _write_action_or_404(request, pk, rating=max(0, min(10, rating)))
     return JsonResponse({"rating": action.rating})
 
 
 @login_required
+@_retryable_write()
 def submit_comment(request, pk):
     """提交评论（可同时评分和评论）"""
     if request.method != "POST":
         return JsonResponse({"error": "method not allowed"}, status=405)
-    movie = get_object_or_404(Movie, pk=pk)
-    action, _ = UserAction.objects.get_or_create(user=request.user, movie=movie)
+    changes = {}
     
     # 处理评分
     rating = request.POST.get("rating")
     if rating:
         try:
-            rating = float(rating)
-            rating = max(0, min(10, rating))
-            action.rating = rating
+            changes["rating"] = max(0, min(10, float(rating)))
         except (TypeError, ValueError):
             pass
     
     # 处理评论
     comment = request.POST.get("comment", "").strip()
     if comment:
-        action.comment = comment
+        changes["comment"] = comment
     
-    action.save()
+    action = _write_action_or_404(request, pk, **changes)
     
     return JsonResponse({
         "success": True,
@@ -460,6 +556,80 @@ def submit_comment(request, pk):
     })
 
 
+# 批量接口单次最多的条目数
+ACTION_BATCH_LIMIT = 1000
+
+
+def _clean_batch_item(item):
+    """校验批量接口的一条行为，返回 (写入内容, 错误信息)"""
+    if not isinstance(item, dict):
+        return None, "条目必须是对象"
+    movie_id = item.get("movie_id")
+    if isinstance(movie_id, bool) or not isinstance(movie_id, int):
+        return None, "movie_id 必须是整数"
+    cleaned = {"movie_id": movie_id}
+    if "rating" in item:
+        rating = item["rating"]
+        if rating is None:
+            cleaned["rating"] = None
+        elif isinstance(rating, bool) or not isinstance(rating, (int, float)):
+            return None, "rating 必须是数字或 null"
+        else:
+            cleaned["rating"] = max(0, min(10, float(rating)))
+    if "is_favorite" in item:
+        if not isinstance(item["is_favorite"], bool):
+            return None, "is_favorite 必须是布尔值"
+        cleaned["is_favorite"] = item["is_favorite"]
+    if "comment" in item:
+        comment = item["comment"]
+        if comment is not None and not isinstance(comment, str):
+            return None, "comment 必须是字符串或 null"
+        cleaned["comment"] = (comment or "").strip() or None
+    if len(cleaned) == 1:
+        return None, "至少提供 rating、is_favorite、comment 之一"
+    return cleaned, None
+
+
+@login_required
+@_retryable_write()
+def batch_actions_api(request):
+    """
+    批量写入评分/收藏/评论（导入观影记录用）。
+
+    请求体 {"items": [{"movie_id": 1, "rating": 8.5, "is_favorite": true, "comment": "..."}]}，
+    未提供的字段保持不变；返回与 items 一一对应的结果。
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "method not allowed"}, status=405)
+    try:
+        items = json.loads(request.body).get("items")
+    except (ValueError, AttributeError):
+        return JsonResponse({"error": "invalid json"}, status=400)
+    if not isinstance(items, list):
+        return JsonResponse({"error": "items must be a list"}, status=400)
+    if len(items) > ACTION_BATCH_LIMIT:
+        return JsonResponse({"error": f"at most {ACTION_BATCH_LIMIT} items"}, status=400)
+
+    results, valid, seen = [], [], set()
+    for index, item in enumerate(items):
+        cleaned, error = _clean_batch_item(item)
+        if cleaned is not None and cleaned["movie_id"] in seen:
+            cleaned, error = None, "movie_id 重复"
+        results.append({"index": index, "ok": False, "error": error})
+        if cleaned is not None:
+            seen.add(cleaned["movie_id"])
+            valid.append((index, cleaned))
+
+    missing = write_batch(request.user, [cleaned for _, cleaned in valid])
+    for index, cleaned in valid:
+        ok = cleaned["movie_id"] not in missing
+        results[index] = {"index": index, "movie_id": cleaned["movie_id"], "ok": ok}
+        if not ok:
+            results[index]["error"] = "电影不存在"
+    written = sum(1 for r in results if r["ok"])
+    return JsonResponse({"written": written, "failed": len(results) - written, "results": results})
+
+
 def recommend_api(request):
     personalized = False
     recs = None
@@ -468,309 +638,44 @@ def recommend_api(request):
         personalized = recs is not None and len(recs) > 0
     if not recs:
         recs = _hot_recommendations(limit=30)
-    data = [
-        {
-            "id": m.id,
-            "title": m.title,
-            "score": m.score,
-            "poster": m.poster,
-            "type": m.type,
-            "region": m.region,
-            "date": m.date,
-        }
-        for m in recs
-    ]
+    data = [_movie_json(m) for m in recs]
     return JsonResponse({"personalized": personalized, "items": data})
 
 
-# ==================== AI推荐相关函数 ====================
-
-def _format_movie_info(movie, user_rating=None):
-    """格式化电影信息用于AI分析"""
-    return {
-        "title": movie.title,
-        "type": movie.type or "未知",
-        "region": movie.region or "未知",
-        "actors": movie.actors or "未知",
-        "score": movie.score,
-        "rating": user_rating,  # 用户评分
-    }
-
-
-def _get_user_preference_data(user, limit=10):
-    """获取用户偏好数据用于AI分析"""
-    # 收藏的10部电影
-    favorites = (
-        UserAction.objects.filter(user=user, is_favorite=True)
-        .select_related("movie")
-        .order_by("-updated_at")[:limit]
-    )
-    
-    # 评分最高的10部电影（按用户评分排序）
-    top_rated = (
-        UserAction.objects.filter(user=user, rating__isnull=False)
-        .select_related("movie")
-        .order_by("-rating", "-updated_at")[:limit]
-    )
-    
-    return {
-        "favorites": [_format_movie_info(action.movie, action.rating) for action in favorites],
-        "top_rated": [_format_movie_info(action.movie, action.rating) for action in top_rated],
-    }
-
-
-def _build_recommendation_prompt(user_data):
-    """构建推荐请求的prompt"""
-    favorites_text = ""
-    if user_data['favorites']:
-        favorites_text = "用户收藏的电影：\n" + "\n".join([
-            f"- {m['title']}（类型：{m['type']}，地区：{m['region']}，豆瓣评分：{m['score']}）"
-            for m in user_data['favorites']
-        ])
-    
-    top_rated_text = ""
-    if user_data['top_rated']:
-        top_rated_text = "用户评分最高的电影：\n" + "\n".join([
-            f"- {m['title']}（类型：{m['type']}，地区：{m['region']}，用户评分：{m['rating']}分，豆瓣评分：{m['score']}）"
-            for m in user_data['top_rated']
-        ])
-    
-    prompt = f"""你是一位专业的电影推荐专家。基于用户的观影偏好，请推荐5-8部电影。
-
-{favorites_text}
-
-{top_rated_text}
-
-请分析用户的观影偏好（类型、地区、风格等），然后：
-1. 推荐5-8部符合用户口味的电影
-2. 为每部推荐电影提供简短的推荐理由（20-30字）
-3. 推荐理由要说明为什么这部电影适合这个用户
-
-请以JSON格式返回，格式如下：
-{{
-    "analysis": "对用户观影偏好的简短分析（50字以内）",
-    "recommendations": [
-        {{
-            "title": "电影标题（准确的电影名称）",
-            "type": "电影类型（如：剧情、喜剧、动作等）",
-            "region": "电影地区（如：美国、中国、日本等）",
-            "score": 8.5,
-            "reason": "推荐理由（20-30字）"
-        }}
-    ]
-}}
-
-注意：
-1. 只返回JSON，不要其他文字
-2. 电影标题要准确
-3. type和region字段尽量填写，如果不知道可以填"未知"
-4. score字段填写豆瓣评分（0-10之间的数字），如果不知道可以填null
-5. 推荐理由要具体说明为什么适合这个用户"""
-    
-    return prompt
-
-
-def _call_qwen_api(prompt):
-    """调用通义千问API"""
-    api_key = getattr(settings, 'QWEN_API_KEY', '')
-    api_url = getattr(settings, 'QWEN_API_URL', 'https://dashscope.aliyuncs.com/api/v1/services/aigc/text-generation/generation')
-    
-    if not api_key:
-        return None, None, "API Key未配置"
-    
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    data = {
-        "model": "qwen-turbo",  # 或 "qwen-plus", "qwen-max"
-        "input": {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "你是一位专业的电影推荐专家，擅长分析用户观影偏好并推荐合适的电影。"
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-        },
-        "parameters": {
-            "temperature": 0.7,
-            "max_tokens": 2000
-        }
-    }
-    
-    try:
-        response = requests.post(api_url, headers=headers, json=data, timeout=30)
-        response.raise_for_status()
-        result = response.json()
-        
-        # 解析通义千问的响应格式（支持多种格式）
-        content = None
-        raw_response = str(result)  # 保存原始响应用于调试
-        
-        # 格式1: output.text (新版本API)
-        if 'output' in result and 'text' in result['output']:
-            content = result['output']['text']
-        # 格式2: output.choices[0].message.content (旧版本API)
-        elif 'output' in result and 'choices' in result['output']:
-            if len(result['output']['choices']) > 0:
-                if 'message' in result['output']['choices'][0]:
-                    content = result['output']['choices'][0]['message']['content']
-                elif 'text' in result['output']['choices'][0]:
-                    content = result['output']['choices'][0]['text']
-        
-        if content:
-            return content, raw_response, None
-        else:
-            return None, raw_response, f"API响应格式错误，无法提取内容。响应: {result}"
-    except requests.exceptions.RequestException as e:
-        return None, None, f"API请求失败: {str(e)}"
-    except Exception as e:
-        return None, None, f"API调用异常: {str(e)}"
-
-
-def _extract_json_from_response(text):
-    """从AI响应中提取JSON"""
-    # 尝试直接解析
-    try:
-        return json.loads(text)
-    except:
-        pass
-    
-    # 尝试提取JSON块
-    json_match = re.search(r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}', text, re.DOTALL)
-    if json_match:
-        try:
-            return json.loads(json_match.group())
-        except:
-            pass
-    
-    # 尝试提取```json代码块
-    json_block_match = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if json_block_match:
-        try:
-            return json.loads(json_block_match.group(1))
-        except:
-            pass
-    
-    # 尝试提取```代码块
-    code_block_match = re.search(r'```\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if code_block_match:
-        try:
-            return json.loads(code_block_match.group(1))
-        except:
-            pass
-    
-    return None
-
-
 @login_required
 def ai_recommend_api(request):
-    """AI推荐API"""
+    """提交AI推荐任务，立即返回任务 id，结果通过 ai_recommend_job 轮询获取；偏好未变化时直接返回缓存"""
     if request.method != "POST":
         return JsonResponse({"error": "method not allowed"}, status=405)
-    
-    user = request.user
-    
-    # 获取用户偏好数据
-    user_data = _get_user_preference_data(user)
-    
-    # 检查是否有足够的数据
-    if not user_data['favorites'] and not user_data['top_rated']:
+
+    fingerprint = ai.preference_fingerprint(request.user)
+    if fingerprint is None:
         return JsonResponse({
             "success": False,
             "error": "数据不足",
             "message": "请先收藏或评分一些电影，以便AI分析你的观影偏好"
         }, status=400)
-    
-    # 构建prompt
-    prompt = _build_recommendation_prompt(user_data)
-    
-    # 调用AI API
-    ai_response, raw_response, error_msg = _call_qwen_api(prompt)
-    
-    if not ai_response:
-        return JsonResponse({
-            "success": False,
-            "error": "API调用失败",
-            "message": error_msg or "请稍后重试",
-            "raw_response": raw_response if raw_response else None  # 返回原始响应用于调试
-        }, status=500)
-    
-    # 解析AI返回的JSON
-    try:
-        ai_data = _extract_json_from_response(ai_response)
-        
-        if not ai_data:
-            # 如果JSON解析失败，返回原始回答和错误信息
-            return JsonResponse({
-                "success": False,
-                "error": "JSON解析失败",
-                "message": "AI返回格式不正确，但已显示原始回答",
-                "raw_ai_response": ai_response,  # 返回原始AI回答
-                "raw_api_response": raw_response  # 返回完整API响应
-            }, status=500)
-        
-        # 直接使用AI返回的电影信息，不查找数据库
-        recommendations = []
-        for rec in ai_data.get('recommendations', []):
-            title = rec.get('title', '').strip()
-            if not title:
-                continue
-            
-            # 尝试在数据库中查找（可选，用于获取海报等额外信息）
-            movie = Movie.objects.filter(title=title).first()
-            if not movie:
-                movie = Movie.objects.filter(title__icontains=title).first()
-            
-            # 使用AI返回的数据，如果数据库中有则补充海报等信息
-            recommendation = {
-                "id": movie.id if movie else None,
-                "title": title,
-                "poster": movie.poster if movie and movie.poster else "",
-                "score": rec.get('score') or (movie.score if movie else None),
-                "type": rec.get('type') or (movie.type if movie else "") or "未知",
-                "region": rec.get('region') or (movie.region if movie else "") or "未知",
-                "reason": rec.get('reason', '推荐给你')
-            }
-            recommendations.append(recommendation)
-        
-        # 构建返回数据，包含原始回答
-        response_data = {
-            "success": True,
-            "analysis": ai_data.get('analysis', '基于你的观影偏好，为你推荐以下电影'),
-            "recommendations": recommendations,
-            "raw_ai_response": ai_response,  # 添加原始AI回答
-        }
-        
-        if not recommendations:
-            # 即使没有推荐，也返回原始回答
-            response_data.update({
-                "success": False,
-                "error": "无推荐数据",
-                "message": "AI未返回推荐电影，但已显示AI的原始回答",
-            })
-            return JsonResponse(response_data, status=404)
-        
-        return JsonResponse(response_data)
-    except json.JSONDecodeError as e:
-        # JSON解析失败时，返回原始回答
-        return JsonResponse({
-            "success": False,
-            "error": "JSON解析失败",
-            "message": f"解析错误: {str(e)}，但已显示原始回答",
-            "raw_ai_response": ai_response,  # 返回原始AI回答
-            "raw_api_response": raw_response  # 返回完整API响应
-        }, status=500)
-    except Exception as e:
-        return JsonResponse({
-            "success": False,
-            "error": "处理失败",
-            "message": str(e),
-            "raw_ai_response": ai_response if 'ai_response' in locals() else None,
-            "raw_api_response": raw_response if 'raw_response' in locals() else None
-        }, status=500)
\ No newline at end of file
+
+    # 收藏和评分没有变化时直接返回上次的结果
+    cached = ai.get_cached_recommendations(request.user, fingerprint)
+    if cached is not None:
+        return JsonResponse(dict(cached, cached=True))
+
+    job = jobs.submit(request.user)
+    return JsonResponse({
+        "success": True,
+        "job_id": str(job.pk),
+        "status": job.status,
+        "poll_url": reverse("ai_recommend_job", args=[job.pk]),
+    }, status=202)
+
+
+@login_required
+def ai_recommend_job(request, job_id):
+    """查询AI推荐任务状态，完成后 result 与原同步接口的响应相同"""
+    job = get_object_or_404(AIRecommendJob, pk=job_id, user=request.user)
+    job = jobs.expire_stale(job)
+    data = {"job_id": str(job.pk), "status": job.status}
+    if job.is_finished:
+        data["result"] = job.result
+    return JsonResponse(data)
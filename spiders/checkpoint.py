@@ -0,0 +1,130 @@
+"""
+爬取进度检查点（本地 SQLite）
+
+记录每个 类型 × 好评区间 段的条目总数，以及每个分页（offset）的状态与尝试次数：
+
+- 中断后重跑：已完成的分页跳过，未完成或失败的分页重新抓取
+- 失败次数达到上限的分页不再自动重试，可用 --retry-failed 清零后重试
+- 多进程分片：各进程按分页序号取模只处理自己的分页，共用同一个检查点文件（WAL 模式）
+
+    python get.py --shard 0/4 & python get.py --shard 1/4 & ...
+    python get.py --status
+"""
+import sqlite3
+import time
+from collections import Counter
+from pathlib import Path
+
+SPIDER_DIR = Path(__file__).resolve().parent
+CHECKPOINT_PATH = SPIDER_DIR / "crawl_state.sqlite3"
+
+PENDING, DONE, FAILED = "pending", "done", "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS segments (
+    genre INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (genre, interval)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    genre INTEGER NOT NULL,
+    interval TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    records INTEGER,
+    error TEXT,
+    updated_at REAL,
+    PRIMARY KEY (genre, interval, offset)
+);
+CREATE INDEX IF NOT EXISTS pages_status_idx ON pages (status);
+"""
+
+
+def parse_shard(value):
+    """'1/4' -> (1, 4)"""
+    index, count = (int(v) for v in value.split("/"))
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"分片应为 i/n 且 0 <= i < n: {value}")
+    return index, count
+
+
+class CheckpointStore:
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # 多个分片进程同时写同一个文件：WAL 允许读写并发，写冲突时等待而不是报错
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def segment_total(self, genre, interval):
+        row = self.conn.execute(
+            "SELECT total FROM segments WHERE genre = ? AND interval = ?", (genre, interval)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_segment_total(self, genre, interval, total, page_size):
+        """记录段的条目总数并登记其全部分页（已登记的分页保持原状态）"""
+        with self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.execute(
+                "INSERT INTO segments (genre, interval, total, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (genre, interval) DO UPDATE SET total = excluded.total, updated_at = excluded.updated_at",
+                (genre, interval, total, time.time()),
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO pages (genre, interval, offset) VALUES (?, ?, ?)",
+                [(genre, interval, offset) for offset in range(0, total, page_size)],
+            )
+
+    def todo_offsets(self, genre, interval, page_size, shard=None, max_attempts=None):
+        """尚未完成的分页 offset；指定 shard=(i, n) 时只返回分页序号 % n == i 的分页"""
+        sql = "SELECT offset FROM pages WHERE genre = ? AND interval = ? AND status != ?"
+        params = [genre, interval, DONE]
+        if max_attempts:
+            sql += " AND attempts < ?"
+            params.append(max_attempts)
+        if shard:
+            index, count = shard
+            sql += " AND (offset / ?) % ? = ?"
+            params += [page_size, count, index]
+        return [row[0] for row in self.conn.execute(sql + " ORDER BY offset", params)]
+
+    def mark_done(self, genre, interval, offset, records):
+        self._mark(genre, interval, offset, DONE, records=records)
+
+    def mark_failed(self, genre, interval, offset, error):
+        self._mark(genre, interval, offset, FAILED, error=str(error)[:500])
+
+    def _mark(self, genre, interval, offset, status, records=None, error=None):
+        self.conn.execute(
+            "UPDATE pages SET status = ?, attempts = attempts + 1, records = ?, error = ?, updated_at = ? "
+            "WHERE genre = ? AND interval = ? AND offset = ?",
+            (status, records, error, time.time(), genre, interval, offset),
+        )
+
+    def retry_failed(self):
+        """失败的分页清零尝试次数，返回涉及的分页数"""
+        return self.conn.execute(
+            "UPDATE pages SET status = ?, attempts = 0 WHERE status = ?", (PENDING, FAILED)
+        ).rowcount
+
+    def summary(self):
+        """Counter(状态 -> 分页数)，另含 segments 与 records 总数"""
+        counts = Counter(dict(self.conn.execute("SELECT status, COUNT(*) FROM pages GROUP BY status")))
+        counts["segments"] = self.conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+        counts["records"] = self.conn.execute("SELECT COALESCE(SUM(records), 0) FROM pages").fetchone()[0]
+        return counts
@@ -0,0 +1,242 @@
+"""
+异步抓取引擎（榜单爬虫与详情页抓取共用）
+
+- 并发上限：同时进行的请求数不超过 concurrency
+- 按主机限速：每个主机一个令牌桶，每秒最多 rate 个请求，允许 burst 个突发
+- 失败重试：网络错误、超时、403/429/5xx、响应无法解析时按指数退避（带抖动）重试，每次换一个代理
+- 代理轮换：按顺序轮换（ProxyRotator），或按验证得分加权选择（proxy_pool.ProxyPool），
+  连续失败的代理暂停一段时间后再用
+- 响应库：指定 store（raw_store.RawStore）时保存每个解析成功的响应（在线程中写入，不阻塞事件循环）；
+  replay=True 时只从库中读取，不访问网络
+
+抓取总耗时由限速预算决定，而不是逐个请求的往返延迟。
+"""
+import asyncio
+import random
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+import aiohttp
+
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:121.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+]
+
+# 换个代理重试可能成功的状态码（豆瓣对被封的 IP 返回 403）
+RETRY_STATUS = {403, 408, 429, 500, 502, 503, 504}
+
+
+class FetchError(Exception):
+    def __init__(self, message, status=None, retry=True):
+        super().__init__(message)
+        self.status = status
+        self.retry = retry
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个令牌，最多积攒 burst 个；rate <= 0 表示不限速"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # 持锁等待，等待中的请求按先后顺序拿到令牌
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def parse_proxy(line):
+    """'ip|port|HTTP' 或 'ip:port' 或完整 URL -> 代理 URL，无法解析时返回 None"""
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if "://" in line:
+        return line
+    parts = line.split("|")
+    if len(parts) >= 2:
+        host, port = parts[0].strip(), parts[1].strip()
+        return f"http://{host}:{port}" if host and port else None
+    return f"http://{line}" if ":" in line else None
+
+
+def load_proxies(path):
+    with open(path, encoding="utf-8") as fh:
+        return [proxy for proxy in map(parse_proxy, fh) if proxy]
+
+
+class ProxyRotator:
+    """按顺序轮换代理；连续失败 max_failures 次的代理暂停 cooldown 秒"""
+
+    def __init__(self, proxies, max_failures=3, cooldown=60):
+        self.proxies = list(dict.fromkeys(proxies))
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self._next = 0
+        self._failures = Counter()
+        self._benched_until = {}
+
+    def __len__(self):
+        return len(self.proxies)
+
+    def get(self):
+        if not self.proxies:
+            return None
+        now = time.monotonic()
+        for _ in range(len(self.proxies)):
+            proxy = self.proxies[self._next]
+            self._next = (self._next + 1) % len(self.proxies)
+            if self._benched_until.get(proxy, 0) <= now:
+                return proxy
+        # 全部在暂停中时用最早恢复的一个
+        return min(self.proxies, key=lambda p: self._benched_until.get(p, 0))
+
+    def report(self, proxy, ok, latency=None):
+        if proxy is None:
+            return
+        if ok:
+            self._failures.pop(proxy, None)
+            self._benched_until.pop(proxy, None)
+            return
+        self._failures[proxy] += 1
+        if self._failures[proxy] >= self.max_failures:
+            self._benched_until[proxy] = time.monotonic() + self.cooldown
+            self._failures.pop(proxy)
+
+
+class Fetcher:
+    """
+    带并发上限、按主机限速、重试与代理轮换的异步 HTTP 客户端。
+
+        async with Fetcher(concurrency=8, rate=2, proxies=rotator) as fetcher:
+            data = await fetcher.fetch(url, parse=json.loads)
+
+    proxies 为 ProxyRotator 或 proxy_pool.ProxyPool（实现 get/report 即可），为 None 时直连。
+    store 为 raw_store.RawStore；replay=True 时必须指定 store。
+    """
+
+    def __init__(self, concurrency=8, rate=2.0, burst=1, retries=3, backoff=1.0, timeout=15,
+                 proxies=None, headers=None, store=None, replay=False):
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.proxies = proxies
+        self.headers = headers or {}
+        self.store = store
+        self.replay = replay
+        self.stats = Counter()
+        self._buckets = {}
+        self._semaphore = None
+        self.session = None
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        if self.replay:
+            return self
+        self.session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.session:
+            await self.session.close()
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return self._buckets[host]
+
+    async def _get(self, url, proxy):
+        headers = {"User-Agent": random.choice(USER_AGENTS), **self.headers}
+        async with self._semaphore:
+            await self._bucket(url).acquire()
+            self.stats["requests"] += 1
+            # 延迟从拿到令牌后算起，不含排队时间
+            started = time.monotonic()
+            async with self.session.get(url, proxy=proxy, headers=headers) as resp:
+                body = await resp.read()
+                if resp.status in RETRY_STATUS:
+                    raise FetchError(f"HTTP {resp.status}", status=resp.status)
+                if resp.status >= 400:
+                    raise FetchError(f"HTTP {resp.status}", status=resp.status, retry=False)
+                latency = time.monotonic() - started
+                return latency, body, resp.status, resp.get_encoding()
+
+    async def fetch(self, url, parse=None):
+        """
+        GET url，返回 parse(文本)（未指定 parse 时返回文本）。
+
+        parse 抛出 ValueError 视为响应无效（如代理返回的错误页），换代理重试；
+        重试用尽或遇到 404 等不可重试的状态时抛出 FetchError。
+        """
+        if self.replay:
+            return self._replay(url, parse)
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            proxy = self.proxies.get() if self.proxies else None
+            try:
+                latency, body, status, encoding = await self._get(url, proxy)
+                text = body.decode(encoding, errors="replace")
+                result = parse(text) if parse else text
+            except FetchError as exc:
+                # 404 等不可重试的状态说明代理本身是通的
+                self._report(proxy, not exc.retry)
+                if not exc.retry:
+                    self.stats["failures"] += 1
+                    raise
+                error = exc
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as exc:
+                self._report(proxy, False)
+                error = exc
+            else:
+                self._report(proxy, True, latency)
+                # 解析成功后才保存，验证码等无效页面不会覆盖库中已有的正常响应；
+                # 压缩与写盘放到线程中，且不占用并发名额
+                if self.store:
+                    await asyncio.to_thread(self.store.put, url, body, status, encoding)
+                return result
+        self.stats["failures"] += 1
+        raise FetchError(f"{url} 重试 {self.retries} 次后仍失败: {error!r}")
+
+    def _replay(self, url, parse):
+        # 库中没有或解析失败时联网重新抓取可能成功，记为可重试（details.py 不会把它记成永久失败）
+        self.stats["replayed"] += 1
+        text = self.store.get(url)
+        if text is None:
+            self.stats["failures"] += 1
+            raise FetchError(f"{url} 不在响应库中")
+        try:
+            return parse(text) if parse else text
+        except ValueError as exc:
+            self.stats["failures"] += 1
+            raise FetchError(f"{url} 解析失败: {exc!r}")
+
+    def _report(self, proxy, ok, latency=None):
+        if self.proxies:
+            self.proxies.report(proxy, ok, latency)
@@ -0,0 +1,185 @@
+"""
+电影详情页抓取（补充简介、片长、导演与完整演员表）
+
+榜单接口没有简介。这里读取爬虫输出中每部电影的 url，用 crawler.Fetcher 并发抓取详情页
+（共用并发上限、按主机限速、重试与代理），parsel 解析后每部电影一行写入 details.jsonl：
+
+    {"id": "1291546", "summary": "...", "runtime": 171, "directors": ["陈凯歌"], "cast": ["张国荣", ...]}
+
+读记录、抓取、写文件组成有界队列的流水线，内存占用与总条数无关；每 batch_size 条落盘一次。
+输出中已有的 id 会跳过，中断后重跑从未抓取的电影继续。详情页同时存入原始响应库（raw_store.py），
+--replay 从库中读取并重新解析，不访问网络。写回数据库：
+
+    python manage.py import_details spiders/details.jsonl
+"""
+import argparse
+import asyncio
+import re
+import time
+from collections import Counter
+from pathlib import Path
+
+from parsel import Selector
+
+from crawler import FetchError, Fetcher, ProxyRotator, load_proxies
+from proxy_pool import POOL_PATH, ProxyPool
+from raw_store import STORE_PATH, RawStore
+from records import DETAILS_PATH, RecordWriter, default_path, iter_records
+
+SPIDER_DIR = Path(__file__).resolve().parent
+SUBJECT_URL = "https://movie.douban.com/subject/{id}/"
+
+_RUNTIME_RE = re.compile(r"(\d+)")
+
+
+def subject_url(record, base_url=None):
+    """详情页地址；指定 base_url 时替换站点部分（测试时指向本地桩服务）"""
+    url = record.get("url") or SUBJECT_URL.format(id=record["id"])
+    if base_url:
+        url = base_url.rstrip("/") + "/" + url.split("://", 1)[-1].split("/", 1)[-1]
+    return url
+
+
+def _texts(selector, xpath):
+    return [t.strip() for t in selector.xpath(xpath).getall() if t.strip()]
+
+
+def parse_detail(html):
+    """
+    解析详情页，返回 {summary, runtime, directors, cast}。
+
+    没有片名节点说明不是正常的详情页（验证码、代理错误页等），抛出 ValueError 由 Fetcher 换代理重试。
+    """
+    sel = Selector(text=html)
+    if not sel.xpath('//span[@property="v:itemreviewed"]'):
+        raise ValueError("不是电影详情页")
+    # 简介较长时完整内容在隐藏的 span.all 中
+    summary_nodes = sel.css("span.all.hidden ::text") or sel.xpath('//span[@property="v:summary"]//text()')
+    summary = "\n".join(line.strip() for line in summary_nodes.getall() if line.strip())
+    runtime = sel.xpath('//span[@property="v:runtime"]/@content').get() or sel.xpath(
+        '//span[@property="v:runtime"]/text()'
+    ).get()
+    match = _RUNTIME_RE.search(runtime or "")
+    return {
+        "summary": summary,
+        "runtime": int(match.group(1)) if match else None,
+        "directors": _texts(sel, '//a[@rel="v:directedBy"]/text()'),
+        "cast": _texts(sel, '//a[@rel="v:starring"]/text()'),
+    }
+
+
+def fetched_ids(path):
+    """输出文件中已有的 id（断点续抓）"""
+    path = Path(path)
+    if not path.exists():
+        return set()
+    return {record.get("id") for record in iter_records(path)}
+
+
+async def enrich(records, fetcher, writer, batch_size=200, skip=frozenset(), base_url=None, stats=None):
+    """
+    流水线：读记录 -> 有界队列 -> fetcher.concurrency 个工作协程抓取解析 -> 写文件。
+
+    404 等不可重试的失败也写一行 {"id", "error"}，重跑时不再请求；重试用尽的失败不写，重跑时再试。
+    """
+    stats = Counter() if stats is None else stats
+    workers = fetcher.concurrency
+    queue = asyncio.Queue(maxsize=workers * 2)
+
+    async def produce():
+        seen = set(skip)
+        for record in records:
+            if not record.get("id") or record["id"] in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(record["id"])
+            await queue.put(record)
+        for _ in range(workers):
+            await queue.put(None)
+
+    def write(line):
+        writer.write(line)
+        stats["written"] += 1
+        if stats["written"] % batch_size == 0:
+            writer.flush()
+
+    async def work():
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            try:
+                detail = await fetcher.fetch(subject_url(record, base_url), parse=parse_detail)
+            except FetchError as exc:
+                stats["failed"] += 1
+                if not exc.retry:
+                    write({"id": record["id"], "error": str(exc)})
+                continue
+            stats["fetched"] += 1
+            write({"id": record["id"], **detail})
+
+    await asyncio.gather(produce(), *(work() for _ in range(workers)))
+    writer.flush()
+    return stats
+
+
+async def main_async(args):
+    proxies = None
+    if args.no_proxy or args.replay:
+        pass
+    elif Path(args.pool).exists():
+        proxies = ProxyPool.load(args.pool)
+    elif Path(args.proxies).exists():
+        proxies = ProxyRotator(load_proxies(args.proxies))
+    store = None if args.no_store and not args.replay else RawStore(args.store)
+    fetcher = Fetcher(
+        concurrency=args.concurrency, rate=args.rate, burst=args.burst,
+        retries=args.retries, backoff=args.backoff, timeout=args.timeout, proxies=proxies,
+        store=store, replay=args.replay,
+    )
+    skip = fetched_ids(args.output)
+    started = time.time()
+    try:
+        with RecordWriter(args.output) as writer:
+            async with fetcher:
+                stats = await enrich(
+                    iter_records(args.input), fetcher, writer,
+                    batch_size=args.batch_size, skip=skip, base_url=args.base_url,
+                )
+    finally:
+        if isinstance(proxies, ProxyPool):
+            proxies.save(args.pool)
+        if store:
+            store.close()
+    stats += fetcher.stats
+    print(
+        f"完成：抓取 {stats['fetched']} 部，失败 {stats['failed']}，跳过 {stats['skipped']}（含已抓取 {len(skip)}），"
+        f"请求 {stats['requests']} 次（重试 {stats['retries']}，回放 {stats['replayed']}），耗时 {time.time() - started:.1f}s -> {args.output}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取电影详情页，补充简介、片长、导演与演员表")
+    parser.add_argument("input", nargs="?", default=None, help="爬虫输出（默认 ur.jsonl，不存在时用 ur.txt）")
+    parser.add_argument("--output", default=str(DETAILS_PATH), help="输出文件（.jsonl 或 .jsonl.gz）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的请求数")
+    parser.add_argument("--rate", type=float, default=2.0, help="每秒最多请求数，<=0 不限速")
+    parser.add_argument("--burst", type=int, default=2, help="令牌桶容量（允许的突发请求数）")
+    parser.add_argument("--retries", type=int, default=3, help="失败重试次数")
+    parser.add_argument("--backoff", type=float, default=1.0, help="首次重试前的等待秒数，之后逐次翻倍")
+    parser.add_argument("--timeout", type=float, default=15, help="单个请求超时秒数")
+    parser.add_argument("--batch-size", type=int, default=200, help="每写入多少条落盘一次")
+    parser.add_argument("--pool", default=str(POOL_PATH), help="代理池文件（由 proxy_pool.py 生成）")
+    parser.add_argument("--proxies", default=str(SPIDER_DIR / "ipdaili.txt"), help="没有代理池时使用的代理列表文件")
+    parser.add_argument("--no-proxy", action="store_true", help="不使用代理")
+    parser.add_argument("--store", default=str(STORE_PATH), help="原始响应库目录")
+    parser.add_argument("--no-store", action="store_true", help="不保存原始响应")
+    parser.add_argument("--replay", action="store_true", help="从响应库读取详情页重新解析，不访问网络")
+    parser.add_argument("--base-url", default=None, help="替换详情页的站点地址（测试时指向本地桩服务）")
+    args = parser.parse_args()
+    args.input = args.input or default_path()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
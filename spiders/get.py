@@ -1,50 +1,253 @@
-import requests
+"""
+豆瓣分类排行榜爬虫（/j/chart/top_list）
+
+按 类型 × 好评区间 抓取全部分页：先取每段的条目总数，再把所有分页交给 crawler.Fetcher 并发抓取，
+并发数、每秒请求数、重试次数由命令行参数控制。每部电影一行写入 ur.jsonl（同一次运行内按 id 去重）。
+
+进度记录在检查点文件（checkpoint.py）中，中断后重跑只抓取未完成的分页；
+要从头重新爬取，删除检查点文件或用 --checkpoint 指定新文件。
+
+抓到的响应同时存入原始响应库（raw_store.py）；--replay 从库中读取并重新解析，不访问网络、不用检查点。
+
+    python get.py --concurrency 8 --rate 2
+    python get.py --genres 11,24 --intervals 100:90 --no-proxy
+    python get.py --shard 0/2 & python get.py --shard 1/2   # 两个进程分片抓取，各写一个输出文件
+    python get.py --base-url http://127.0.0.1:8080   # 对本地桩服务测试
+    python get.py --replay --output ur.replay.jsonl   # 解析逻辑修改后从响应库重新生成
+"""
+import argparse
+import asyncio
 import json
 import time
-import random
-import bs4
-
-iplist = []
-
-with open('ipdaili.txt', 'r') as f:
-    iplist = f.readlines()
-
-def getip():
-    proxy = iplist[random.randint(0, len(iplist)-1)]
-    proxy = proxy.replace('\n', '')
-    proxies = {'http': 'http://' + str(proxy)}
-    return proxies
-
-# UA池
-user_agents = [
-		'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36 OPR/26.0.1656.60',
-		'Opera/8.0 (Windows NT 5.1; U; en)',
-		'Mozilla/5.0 (Windows NT 5.1; U; en; rv:1.8.1) Gecko/20061208 Firefox/2.0.0 Opera 9.50',
-		'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; en) Opera 9.50',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:34.0) Gecko/20100101 Firefox/34.0',
-		'Mozilla/5.0 (X11; U; Linux x86_64; zh-CN; rv:1.9.2.10) Gecko/20100922 Ubuntu/10.10 (maverick) Firefox/3.6.10',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/534.57.2 (KHTML, like Gecko) Version/5.1.7 Safari/534.57.2 ',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/39.0.2171.71 Safari/537.36',
-		'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.11 (KHTML, like Gecko) Chrome/23.0.1271.64 Safari/537.11',
-		'Mozilla/5.0 (Windows; U; Windows NT 6.1; en-US) AppleWebKit/534.16 (KHTML, like Gecko) Chrome/10.0.648.133 Safari/534.16',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/30.0.1599.101 Safari/537.36',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64; Trident/7.0; rv:11.0) like Gecko',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/536.11 (KHTML, like Gecko) Chrome/20.0.1132.11 TaoBrowser/2.0 Safari/536.11',
-		'Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.1 (KHTML, like Gecko) Chrome/21.0.1180.71 Safari/537.1 LBBROWSER',
-		'Mozilla/4.0 (compatible; MSIE 6.0; Windows NT 5.1; SV1; QQDownload 732; .NET4.0C; .NET4.0E)',
-		'Mozilla/5.0 (Windows NT 5.1) AppleWebKit/535.11 (KHTML, like Gecko) Chrome/17.0.963.84 Safari/535.11 SE 2.X MetaSr 1.0',
-		'Mozilla/4.0 (compatible; MSIE 7.0; Windows NT 5.1; Trident/4.0; SV1; QQDownload 732; .NET4.0C; .NET4.0E; SE 2.X MetaSr 1.0) ',
-	]
-
-for i in range(12,100,1):
-    time.sleep(2)
-    r=requests.get('https://movie.douban.com/j/chart/top_list?type=11&interval_id=50:40&action=&start=' + str(
-        i*20) + '&limit=20',proxies=getip(),
-                   headers={'User-Agent':random.choice(user_agents)})
-    result = json.loads(r.text)
-    #movies = result['data']
-    #for movie in movies
-        #j+ =1
-        #info = getInfoByUrl(movie['url'])
-    with open('ur.txt', 'a' , encoding = 'utf-8') as f:
-        f.write(str(result) + '\n')
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlencode
+
+from checkpoint import CHECKPOINT_PATH, CheckpointStore, parse_shard
+from crawler import FetchError, Fetcher, ProxyRotator, load_proxies
+from proxy_pool import POOL_PATH, ProxyPool
+from raw_store import STORE_PATH, RawStore
+from records import RecordWriter
+
+SPIDER_DIR = Path(__file__).resolve().parent
+BASE_URL = "https://movie.douban.com"
+PAGE_SIZE = 20
+
+# 豆瓣分类排行榜的类型 id
+GENRES = {
+    11: "剧情", 24: "喜剧", 5: "动作", 13: "爱情", 17: "科幻", 25: "动画", 10: "悬疑", 19: "惊悚",
+    20: "恐怖", 1: "纪录片", 23: "短片", 6: "情色", 26: "同性", 14: "音乐", 7: "歌舞", 28: "家庭",
+    8: "儿童", 2: "传记", 4: "历史", 22: "战争", 3: "犯罪", 27: "西部", 16: "奇幻", 15: "冒险",
+    12: "灾难", 29: "武侠", 30: "古装", 18: "运动", 31: "黑色电影",
+}
+# 好评区间（百分位），如 '100:90' 表示好于 90% 的同类电影
+INTERVALS = [f"{high}:{high - 10}" for high in range(100, 0, -10)]
+
+
+def count_url(base_url, genre, interval):
+    return f"{base_url}/j/chart/top_list_count?" + urlencode({"type": genre, "interval_id": interval})
+
+
+def page_url(base_url, genre, interval, start, limit=PAGE_SIZE):
+    query = urlencode({"type": genre, "interval_id": interval, "action": "", "start": start, "limit": limit})
+    return f"{base_url}/j/chart/top_list?{query}"
+
+
+def parse_page(text):
+    data = json.loads(text)
+    if not isinstance(data, list):
+        raise ValueError("榜单接口返回的不是列表")
+    return data
+
+
+def parse_count(text):
+    data = json.loads(text)
+    if not isinstance(data, dict) or "total" not in data:
+        raise ValueError("条目数接口返回格式不正确")
+    return int(data["total"])
+
+
+class TopListCrawl:
+    """
+    抓取一组 类型 × 好评区间。
+
+    指定 checkpoint 时已完成的分页跳过、每页结果写入后记为完成；
+    shard=(i, n) 时只抓取分页序号 % n == i 的分页。
+    """
+
+    def __init__(self, fetcher, writer, base_url=BASE_URL, checkpoint=None, shard=None, max_attempts=None):
+        self.fetcher = fetcher
+        self.writer = writer
+        self.base_url = base_url
+        self.checkpoint = checkpoint
+        self.shard = shard
+        self.max_attempts = max_attempts
+        self.seen = set()
+        self.stats = Counter()
+
+    def _save(self, records):
+        # 事件循环单线程执行，写文件不需要加锁
+        for record in records:
+            if record.get("id") in self.seen:
+                self.stats["duplicates"] += 1
+                continue
+            self.seen.add(record.get("id"))
+            self.writer.write(record)
+            self.stats["records"] += 1
+
+    async def crawl_page(self, genre, interval, start):
+        try:
+            records = await self.fetcher.fetch(page_url(self.base_url, genre, interval, start), parse=parse_page)
+        except FetchError as exc:
+            self.stats["failed_pages"] += 1
+            print(f"分页失败 type={genre} interval={interval} start={start}: {exc}")
+            if self.checkpoint:
+                self.checkpoint.mark_failed(genre, interval, start, exc)
+            return
+        self.stats["pages"] += 1
+        self._save(records)
+        if self.checkpoint:
+            # 先落盘再记完成，中断时最多重复抓取一页，不会漏
+            self.writer.flush()
+            self.checkpoint.mark_done(genre, interval, start, len(records))
+
+    def _offsets(self, genre, interval, total):
+        if self.checkpoint:
+            return self.checkpoint.todo_offsets(
+                genre, interval, PAGE_SIZE, shard=self.shard, max_attempts=self.max_attempts
+            )
+        offsets = range(0, total, PAGE_SIZE)
+        if self.shard:
+            index, count = self.shard
+            offsets = [o for o in offsets if (o // PAGE_SIZE) % count == index]
+        return offsets
+
+    async def crawl_segment(self, genre, interval):
+        total = self.checkpoint.segment_total(genre, interval) if self.checkpoint else None
+        if total is None:
+            try:
+                total = await self.fetcher.fetch(count_url(self.base_url, genre, interval), parse=parse_count)
+            except FetchError as exc:
+                self.stats["failed_segments"] += 1
+                print(f"取条目数失败 type={genre} interval={interval}: {exc}")
+                return
+            if self.checkpoint:
+                self.checkpoint.set_segment_total(genre, interval, total, PAGE_SIZE)
+        else:
+            self.stats["resumed_segments"] += 1
+        await asyncio.gather(*(
+            self.crawl_page(genre, interval, start) for start in self._offsets(genre, interval, total)
+        ))
+
+    async def run(self, genres, intervals):
+        await asyncio.gather(*(
+            self.crawl_segment(genre, interval) for genre in genres for interval in intervals
+        ))
+
+
+def shard_output(path, shard):
+    """分片进程各写一个文件：ur.jsonl -> ur.shard1of4.jsonl"""
+    if not shard:
+        return Path(path)
+    path = Path(path)
+    name = path.name
+    stem = name.split(".jsonl")[0]
+    return path.with_name(f"{stem}.shard{shard[0]}of{shard[1]}{name[len(stem):]}")
+
+
+def _parse_list(value, cast=str):
+    return [cast(v) for v in value.split(",") if v.strip()] if value else None
+
+
+async def main_async(args):
+    if args.replay:
+        args.no_proxy = args.no_checkpoint = True
+    proxies = None
+    if args.no_proxy:
+        pass
+    elif Path(args.pool).exists():
+        # 有验证过的代理池时按得分加权选择，否则按顺序轮换代理列表
+        proxies = ProxyPool.load(args.pool)
+        print(f"已从代理池加载 {len(proxies)} 个可用代理")
+    elif Path(args.proxies).exists():
+        proxies = ProxyRotator(load_proxies(args.proxies))
+        print(f"已加载 {len(proxies)} 个代理")
+    store = None if args.no_store and not args.replay else RawStore(args.store)
+    fetcher = Fetcher(
+        concurrency=args.concurrency, rate=args.rate, burst=args.burst,
+        retries=args.retries, backoff=args.backoff, timeout=args.timeout, proxies=proxies,
+        store=store, replay=args.replay,
+    )
+    checkpoint = None if args.no_checkpoint else CheckpointStore(args.checkpoint)
+    output = shard_output(args.output, args.shard)
+    started = time.time()
+    try:
+        with RecordWriter(output) as writer:
+            async with fetcher:
+                crawl = TopListCrawl(
+                    fetcher, writer, base_url=args.base_url.rstrip("/"), checkpoint=checkpoint,
+                    shard=args.shard, max_attempts=args.max_attempts,
+                )
+                await crawl.run(args.genres or list(GENRES), args.intervals or INTERVALS)
+    finally:
+        if isinstance(proxies, ProxyPool):
+            proxies.save(args.pool)
+        if store:
+            store.close()
+    stats = crawl.stats + fetcher.stats
+    print(
+        f"完成：{stats['pages']} 页，{stats['records']} 部电影（重复 {stats['duplicates']}），"
+        f"失败 {stats['failed_pages']} 页 / {stats['failed_segments']} 段，"
+        f"续爬 {stats['resumed_segments']} 段，"
+        f"请求 {stats['requests']} 次（重试 {stats['retries']}，回放 {stats['replayed']}），耗时 {time.time() - started:.1f}s -> {output}"
+    )
+    if checkpoint:
+        print_status(checkpoint)
+        checkpoint.close()
+
+
+def print_status(checkpoint):
+    counts = checkpoint.summary()
+    print(
+        f"检查点：{counts['segments']} 段，分页 完成 {counts['done']} / 待抓取 {counts['pending']} / "
+        f"失败 {counts['failed']}，已抓取 {counts['records']} 条"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="抓取豆瓣分类排行榜")
+    parser.add_argument("--genres", type=lambda v: _parse_list(v, int), help="类型 id，逗号分隔，默认全部")
+    parser.add_argument("--intervals", type=_parse_list, help="好评区间，逗号分隔，如 100:90,90:80，默认全部")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的请求数")
+    parser.add_argument("--rate", type=float, default=2.0, help="每个主机每秒最多请求数，<=0 不限速")
+    parser.add_argument("--burst", type=int, default=2, help="令牌桶容量（允许的突发请求数）")
+    parser.add_argument("--retries", type=int, default=3, help="失败重试次数")
+    parser.add_argument("--backoff", type=float, default=1.0, help="首次重试前的等待秒数，之后逐次翻倍")
+    parser.add_argument("--timeout", type=float, default=15, help="单个请求超时秒数")
+    parser.add_argument("--pool", default=str(POOL_PATH), help="代理池文件（由 proxy_pool.py 生成）")
+    parser.add_argument("--proxies", default=str(SPIDER_DIR / "ipdaili.txt"), help="没有代理池时使用的代理列表文件")
+    parser.add_argument("--no-proxy", action="store_true", help="不使用代理")
+    parser.add_argument("--output", default=str(SPIDER_DIR / "ur.jsonl"), help="输出文件（.jsonl 或 .jsonl.gz）")
+    parser.add_argument("--base-url", default=BASE_URL, help="站点地址（测试时指向本地桩服务）")
+    parser.add_argument("--checkpoint", default=str(CHECKPOINT_PATH), help="检查点文件")
+    parser.add_argument("--no-checkpoint", action="store_true", help="不记录进度，每次全部重新抓取")
+    parser.add_argument("--shard", type=parse_shard, help="只抓取第 i 片（共 n 片），格式 i/n，从 0 开始")
+    parser.add_argument("--max-attempts", type=int, default=5, help="分页累计失败达到该次数后不再自动重试")
+    parser.add_argument("--store", default=str(STORE_PATH), help="原始响应库目录")
+    parser.add_argument("--no-store", action="store_true", help="不保存原始响应")
+    parser.add_argument("--replay", action="store_true", help="从响应库读取响应重新解析，不访问网络")
+    parser.add_argument("--retry-failed", action="store_true", help="把失败的分页清零后重试")
+    parser.add_argument("--status", action="store_true", help="只显示检查点进度")
+    args = parser.parse_args()
+    if args.status or args.retry_failed:
+        with CheckpointStore(args.checkpoint) as checkpoint:
+            if args.retry_failed:
+                print(f"已重置 {checkpoint.retry_failed()} 个失败分页")
+            if args.status:
+                print_status(checkpoint)
+                return
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+代理池：并发验证、打分与持久化
+
+验证：所有代理（多个来源文件合并、去重）放进同一个队列，固定数量的协程从队列取任务，
+每个代理只检查一次，耗时随 workers 增加近似线性下降。
+
+打分：每个代理记录检查次数、成功次数、连续失败次数与延迟（指数滑动平均），
+得分 = 平滑后的成功率 / 延迟，越快越稳的代理得分越高。
+
+持久化：结果写入 proxy_pool.json，爬虫（get.py）启动时读取，按得分加权随机选择代理，
+运行中按请求结果继续更新统计，结束时写回。
+
+    python proxy_pool.py ipdaili.txt wasted/proxy.txt --workers 100
+    python proxy_pool.py --url "https://movie.douban.com/j/chart/top_list_count?type=11&interval_id=100:90"
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from pathlib import Path
+
+import aiohttp
+
+from crawler import USER_AGENTS, parse_proxy
+
+SPIDER_DIR = Path(__file__).resolve().parent
+POOL_PATH = SPIDER_DIR / "proxy_pool.json"
+# 验证地址默认就是爬取目标：HTTPS 请求要经代理建立 CONNECT 隧道，
+# 能打开 http 百度首页的代理不一定支持 HTTPS，也可能已被豆瓣封禁
+CHECK_URL = "https://movie.douban.com/"
+
+# 延迟的滑动平均系数（新样本权重）
+LATENCY_ALPHA = 0.3
+# 没有延迟数据、或请求失败时计入的延迟（秒）
+DEFAULT_LATENCY = 5.0
+# 延迟下限，避免极小延迟让得分失真
+MIN_LATENCY = 0.05
+# 连续失败达到该次数的代理在验证后移出池
+MAX_FAILS_IN_ROW = 3
+
+
+class ProxyStats:
+    """单个代理的健康统计"""
+
+    __slots__ = ("proxy", "checks", "successes", "fails_in_row", "latency", "checked_at")
+
+    def __init__(self, proxy, checks=0, successes=0, fails_in_row=0, latency=None, checked_at=None):
+        self.proxy = proxy
+        self.checks = checks
+        self.successes = successes
+        self.fails_in_row = fails_in_row
+        self.latency = latency
+        self.checked_at = checked_at
+
+    def record(self, ok, latency=None):
+        self.checks += 1
+        self.checked_at = time.time()
+        if ok:
+            self.successes += 1
+            self.fails_in_row = 0
+            if latency is not None:
+                self.latency = latency if self.latency is None else (
+                    LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * self.latency
+                )
+        else:
+            self.fails_in_row += 1
+
+    @property
+    def success_rate(self):
+        # 拉普拉斯平滑：没检查过的代理按 50% 计
+        return (self.successes + 1) / (self.checks + 2)
+
+    @property
+    def score(self):
+        return self.success_rate / max(self.latency or DEFAULT_LATENCY, MIN_LATENCY)
+
+    @property
+    def alive(self):
+        return self.fails_in_row == 0 and self.successes > 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def load_pool(path=POOL_PATH):
+    """读取持久化的代理池，返回 {代理 URL: ProxyStats}；文件不存在时为空"""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as fh:
+        data = json.load(fh)
+    return {entry["proxy"]: ProxyStats(**entry) for entry in data.get("proxies", [])}
+
+
+def save_pool(stats, path=POOL_PATH):
+    """按得分降序写入代理池（先写临时文件再替换，写到一半中断不会损坏原文件）"""
+    path = Path(path)
+    entries = sorted(stats.values(), key=lambda s: s.score, reverse=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(
+            {"updated_at": time.time(), "proxies": [s.to_dict() for s in entries]},
+            fh, ensure_ascii=False, indent=1,
+        )
+    os.replace(tmp, path)
+
+
+class ProxyPool:
+    """
+    按得分加权随机选择代理，供 crawler.Fetcher 使用（接口同 ProxyRotator）。
+
+    连续失败 max_failures 次的代理暂停 cooldown 秒；全部暂停时退回到得分最高的一个。
+    """
+
+    def __init__(self, stats, max_failures=3, cooldown=60, rng=None):
+        self.stats = dict(stats)
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.rng = rng or random.Random()
+        self._benched_until = {}
+
+    @classmethod
+    def load(cls, path=POOL_PATH, alive_only=True, **kwargs):
+        stats = load_pool(path)
+        if alive_only:
+            stats = {proxy: s for proxy, s in stats.items() if s.alive}
+        return cls(stats, **kwargs)
+
+    def __len__(self):
+        return len(self.stats)
+
+    def get(self):
+        if not self.stats:
+            return None
+        now = time.monotonic()
+        candidates = [s for s in self.stats.values() if self._benched_until.get(s.proxy, 0) <= now]
+        if not candidates:
+            return max(self.stats.values(), key=lambda s: s.score).proxy
+        return self.rng.choices(candidates, weights=[s.score for s in candidates])[0].proxy
+
+    def report(self, proxy, ok, latency=None):
+        stats = self.stats.get(proxy)
+        if stats is None:
+            return
+        stats.record(ok, latency)
+        if ok:
+            self._benched_until.pop(proxy, None)
+        elif stats.fails_in_row >= self.max_failures:
+            self._benched_until[proxy] = time.monotonic() + self.cooldown
+
+    def save(self, path=POOL_PATH):
+        """把运行中更新的统计合并回代理池文件"""
+        stats = load_pool(path)
+        stats.update(self.stats)
+        save_pool(stats, path)
+
+
+def read_sources(paths):
+    """读取代理列表文件（ip|port|协议 每行一条），合并去重，保持首次出现的顺序"""
+    proxies = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                proxy = parse_proxy(line)
+                if proxy:
+                    proxies.setdefault(proxy, None)
+    return list(proxies)
+
+
+async def check_proxy(session, proxy, url=CHECK_URL):
+    """通过代理请求 url，返回延迟（秒），失败时返回 None"""
+    started = time.monotonic()
+    try:
+        async with session.get(url, proxy=proxy, headers={"User-Agent": random.choice(USER_AGENTS)}) as resp:
+            await resp.read()
+            if resp.status != 200:
+                return None
+    except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+        return None
+    return time.monotonic() - started
+
+
+async def validate(proxies, stats=None, workers=50, url=CHECK_URL, timeout=5, progress=None):
+    """
+    并发验证 proxies，更新并返回 stats（{代理 URL: ProxyStats}）。
+
+    workers 个协程共享一个队列，每个代理只检查一次。
+    """
+    stats = {} if stats is None else stats
+    queue = asyncio.Queue()
+    for proxy in dict.fromkeys(proxies):
+        queue.put_nowait(proxy)
+
+    async def worker(session):
+        while True:
+            try:
+                proxy = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            latency = await check_proxy(session, proxy, url)
+            entry = stats.setdefault(proxy, ProxyStats(proxy))
+            entry.record(latency is not None, latency)
+            if progress:
+                progress(entry)
+
+    connector = aiohttp.TCPConnector(limit=workers, force_close=True)
+    async with aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=timeout)
+    ) as session:
+        await asyncio.gather(*(worker(session) for _ in range(max(1, workers))))
+    return stats
+
+
+def prune(stats, max_fails_in_row=MAX_FAILS_IN_ROW):
+    """移除连续失败过多的代理，返回移除的个数"""
+    dead = [proxy for proxy, s in stats.items() if s.fails_in_row >= max_fails_in_row]
+    for proxy in dead:
+        del stats[proxy]
+    return len(dead)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="验证代理并更新代理池")
+    parser.add_argument("sources", nargs="*", help="代理列表文件（ip|port|协议），默认只重新验证池中已有代理")
+    parser.add_argument("--pool", default=str(POOL_PATH), help="代理池文件")
+    parser.add_argument("--workers", type=int, default=50, help="并发验证数")
+    parser.add_argument("--url", default=CHECK_URL, help="验证用的地址，默认爬取目标站点（HTTPS）")
+    parser.add_argument("--timeout", type=float, default=5, help="单次验证超时秒数")
+    parser.add_argument("--verbose", action="store_true", help="逐条输出验证结果")
+    args = parser.parse_args()
+
+    stats = load_pool(args.pool)
+    proxies = list(dict.fromkeys([*stats, *read_sources(args.sources)]))
+    if not proxies:
+        parser.error("没有可验证的代理")
+
+    def progress(entry):
+        if args.verbose:
+            result = f"{entry.latency:.2f}s" if entry.fails_in_row == 0 else "失败"
+            print(f"{entry.proxy}: {result}")
+
+    started = time.time()
+    asyncio.run(validate(proxies, stats, workers=args.workers, url=args.url, timeout=args.timeout,
+                         progress=progress))
+    removed = prune(stats)
+    save_pool(stats, args.pool)
+    alive = sum(1 for s in stats.values() if s.alive)
+    print(f"验证 {len(proxies)} 个代理：可用 {alive}，移除 {removed}，耗时 {time.time() - started:.1f}s -> {args.pool}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+原始响应库：抓到的每个响应按内容哈希压缩保存，另有 URL 索引
+
+    raw/objects/ab/cdef....gz   响应体（gzip），文件名为 sha256，内容相同的响应只存一份
+    raw/index.sqlite3           url -> sha256、编码、状态码、抓取时间（同一 url 只保留最近一次）
+
+get.py / details.py 抓取时默认写入响应库；加 --replay 时从库中读取、不访问网络，
+解析逻辑修改后不用重新爬取。整库重新解析见 reparse.py（多进程）。
+
+    python raw_store.py                      # 统计
+    python raw_store.py --cat URL > page.html   # 取出单个响应（可作为解析器的测试样本）
+"""
+import argparse
+import gzip
+import hashlib
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, namedtuple
+from pathlib import Path
+
+SPIDER_DIR = Path(__file__).resolve().parent
+STORE_PATH = SPIDER_DIR / "raw"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    encoding TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    stored INTEGER NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_digest_idx ON responses (digest);
+"""
+
+Entry = namedtuple("Entry", "url digest encoding status fetched_at")
+
+
+def blob_path(root, digest):
+    return Path(root) / "objects" / digest[:2] / f"{digest[2:]}.gz"
+
+
+def read_text(root, digest, encoding="utf-8"):
+    """读取并解压响应体；只依赖文件，可在子进程中直接调用"""
+    body = gzip.decompress(blob_path(root, digest).read_bytes())
+    return body.decode(encoding, errors="replace")
+
+
+class RawStore:
+    def __init__(self, root=STORE_PATH):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # 分片抓取的多个进程共用一个库：WAL + 等待锁，响应体文件先写临时文件再改名。
+        # Fetcher 在线程中调用 put，连接允许跨线程使用，访问索引时持锁
+        self.conn = sqlite3.connect(
+            self.root / "index.sqlite3", timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def put(self, url, body, status=200, encoding="utf-8"):
+        """保存响应体（bytes），返回内容哈希；可在多个线程中同时调用"""
+        digest = hashlib.sha256(body).hexdigest()
+        path = blob_path(self.root, digest)
+        if path.exists():
+            stored = path.stat().st_size
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = gzip.compress(body)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(data)
+            os.replace(tmp, path)
+            stored = len(data)
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO responses (url, digest, encoding, status, size, stored, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (url) DO UPDATE SET digest = excluded.digest, "
+                "encoding = excluded.encoding, status = excluded.status, size = excluded.size, "
+                "stored = excluded.stored, fetched_at = excluded.fetched_at",
+                (url, digest, encoding, status, len(body), stored, time.time()),
+            )
+        return digest
+
+    def lookup(self, url):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT url, digest, encoding, status, fetched_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+        return Entry(*row) if row else None
+
+    def get(self, url):
+        """url 最近一次响应的文本，库中没有时返回 None"""
+        entry = self.lookup(url)
+        return read_text(self.root, entry.digest, entry.encoding) if entry else None
+
+    def entries(self, pattern=None):
+        """按 url 顺序遍历索引；pattern 为 SQL LIKE 模式"""
+        sql = "SELECT url, digest, encoding, status, fetched_at FROM responses"
+        params = ()
+        if pattern:
+            sql += " WHERE url LIKE ?"
+            params = (pattern,)
+        for row in self.conn.execute(sql + " ORDER BY url", params):
+            yield Entry(*row)
+
+    def summary(self):
+        """Counter：responses、blobs（去重后的响应体数）、size（原始字节）、stored（压缩后字节）"""
+        counts = Counter()
+        counts["responses"], counts["size"] = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        counts["blobs"], counts["stored"] = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(stored), 0) FROM (SELECT DISTINCT digest, stored FROM responses)"
+        ).fetchone()
+        return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="查看原始响应库")
+    parser.add_argument("--store", default=str(STORE_PATH), help="响应库目录")
+    parser.add_argument("--cat", metavar="URL", help="输出该 url 的响应体")
+    args = parser.parse_args()
+    with RawStore(args.store) as store:
+        if args.cat:
+            text = store.get(args.cat)
+            if text is None:
+                sys.exit(f"响应库中没有 {args.cat}")
+            sys.stdout.write(text)
+            return
+        counts = store.summary()
+    ratio = counts["stored"] / counts["size"] if counts["size"] else 0
+    print(
+        f"{counts['responses']} 个 url，{counts['blobs']} 个响应体，"
+        f"原始 {counts['size'] / 1e6:.1f}MB，压缩后 {counts['stored'] / 1e6:.1f}MB（{ratio:.0%}）"
+    )
+
+
+if __name__ == "__main__":
+    main()
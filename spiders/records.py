@@ -0,0 +1,215 @@
+"""
+爬虫输出读写（爬虫、导入命令与各脚本共用）
+
+- JSONL（.jsonl，可 gzip 压缩为 .jsonl.gz）：每行一部电影的 JSON 对象，可追加、可按行切分，爬虫默认输出
+- 旧格式 ur.txt：每行是榜单接口一页结果的 Python repr（list[dict]），只能用 ast.literal_eval 解析，
+  读取仍然支持，可用 python spiders/records.py ur.txt ur.jsonl.gz 转换
+
+两种格式都逐行解析、逐条产出，不整体读入内存。
+"""
+import argparse
+import ast
+import gzip
+import json
+from datetime import date, datetime
+from pathlib import Path
+
+SPIDER_DIR = Path(__file__).resolve().parent
+DEFAULT_PATH = SPIDER_DIR / "ur.jsonl"
+LEGACY_PATH = SPIDER_DIR / "ur.txt"
+DETAILS_PATH = SPIDER_DIR / "details.jsonl"
+
+# Movie 上以空格拼接的字符串列（CharField 255）
+_JOINED_LIMIT = 255
+
+
+def default_path():
+    """默认的爬虫输出：有 ur.jsonl 时用它，否则用旧的 ur.txt"""
+    return DEFAULT_PATH if DEFAULT_PATH.exists() else LEGACY_PATH
+
+
+def is_jsonl(path):
+    return ".jsonl" in Path(path).suffixes
+
+
+def _open(path, mode):
+    """按扩展名透明处理 gzip，文本模式、UTF-8"""
+    if Path(path).suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def iter_records(path=None, errors=None):
+    """
+    逐条产出爬虫记录（dict），按扩展名区分 JSONL 与旧的 repr 格式。
+
+    解析失败的行跳过；传入 errors 列表时把 (行号, 异常) 追加进去。
+    """
+    path = path or default_path()
+    parse = json.loads if is_jsonl(path) else ast.literal_eval
+    with _open(path, "r") as fh:
+        for lineno, line in enumerate(fh, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = parse(line)
+            except (ValueError, SyntaxError, MemoryError, RecursionError) as exc:
+                if errors is not None:
+                    errors.append((lineno, exc))
+                continue
+            if isinstance(data, dict):
+                data = [data]
+            if not isinstance(data, list):
+                continue
+            for item in data:
+                if isinstance(item, dict):
+                    yield item
+
+
+class RecordWriter:
+    """
+    以追加方式写 JSONL，每条记录一行。
+
+    .gz 文件每次打开追加一个新的 gzip 成员，gzip 读取时会连续解压，追加后的文件仍可整体读取。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._fh = None
+        self.count = 0
+
+    def __enter__(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fh = _open(self.path, "a")
+        return self
+
+    def __exit__(self, *exc):
+        self._fh.close()
+
+    def write(self, record):
+        self._fh.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self._fh.write("\n")
+        self.count += 1
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        self._fh.flush()
+
+
+def convert(src, dst, errors=None):
+    """把任一格式的爬虫输出追加写成 JSONL，返回写入的条数"""
+    with RecordWriter(dst) as writer:
+        writer.write_many(iter_records(src, errors=errors))
+        return writer.count
+
+
+def parse_date(value):
+    """'1958' / '2012-08-18' / '2012/08/18' -> date，无法解析时返回 None"""
+    if not value:
+        return None
+    value = str(value).strip().replace("/", "-")
+    try:
+        # 只有年份时取当年 1 月 1 日
+        if len(value) == 4:
+            return date(int(value), 1, 1)
+        # 截断到前 10 位，兼容 '2022-05-20(中国大陆)' 这样的格式
+        return datetime.fromisoformat(value[:10]).date()
+    except ValueError:
+        return None
+
+
+def parse_score(item):
+    """score 缺失时取 rating[0]；空串或无法解析时为 None"""
+    value = item.get("score") or (item.get("rating") or [None])[0]
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_int(value):
+    """非负整数，缺失或无法解析时为 None"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value >= 0 else None
+
+
+def _join(values, limit=_JOINED_LIMIT):
+    """列表以空格拼接，超长时在词边界截断"""
+    text = ""
+    for value in values or ():
+        value = str(value).strip()
+        if not value:
+            continue
+        candidate = f"{text} {value}" if text else value
+        if len(candidate) > limit:
+            break
+        text = candidate
+    return text
+
+
+def movie_fields(item):
+    """
+    爬虫记录 -> Movie 字段值。
+
+    只包含记录中实际出现的字段，缺失的字段（如榜单接口没有的简介）导入时不覆盖库中已有值。
+    """
+    fields = {
+        "douban_id": str(item["id"]).strip() if item.get("id") else None,
+        "title": str(item.get("title") or "").strip()[:255],
+        "score": parse_score(item),
+        "vote_count": parse_int(item.get("vote_count")),
+        "rank": parse_int(item.get("rank")),
+        "date": parse_date(item.get("release_date")),
+        "poster": item.get("cover_url") or None,
+        "actors": _join(item.get("actors")),
+        "region": _join(item.get("regions")),
+        "type": _join(item.get("types")),
+    }
+    if item.get("summary"):
+        fields["summary"] = str(item["summary"]).strip()
+    return fields
+
+
+def detail_fields(item):
+    """
+    详情页抓取结果（spiders/details.py）-> Movie 字段值，抓取失败的记录返回 None。
+
+    只包含抓到内容的字段，空的简介或演员表不覆盖库中已有值。
+    """
+    if item.get("error") or not item.get("id"):
+        return None
+    fields = {"douban_id": str(item["id"]).strip()}
+    if item.get("summary"):
+        fields["summary"] = str(item["summary"]).strip()
+    if parse_int(item.get("runtime")):
+        fields["runtime"] = min(parse_int(item["runtime"]), 32767)
+    if item.get("directors"):
+        fields["directors"] = _join(item["directors"])
+    if item.get("cast"):
+        fields["actors"] = _join(item["cast"])
+    return fields if len(fields) > 1 else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把旧的 ur.txt（Python repr）转换为 JSONL")
+    parser.add_argument("src", nargs="?", default=str(LEGACY_PATH), help="源文件")
+    parser.add_argument("dst", nargs="?", default=str(DEFAULT_PATH), help="目标文件，以 .gz 结尾时压缩")
+    args = parser.parse_args()
+    if not is_jsonl(args.dst):
+        parser.error("目标文件扩展名须为 .jsonl 或 .jsonl.gz")
+    errors = []
+    count = convert(args.src, args.dst, errors=errors)
+    for lineno, exc in errors:
+        print(f"第 {lineno} 行解析失败: {exc}")
+    print(f"已写入 {count} 条 -> {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
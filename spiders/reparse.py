@@ -0,0 +1,126 @@
+"""
+从原始响应库重新解析全部响应（多进程，不访问网络）
+
+主进程按 URL 索引把响应分块交给进程池，子进程读取、解压、解析，结果按索引顺序回到主进程写文件。
+解析是纯 CPU 工作，耗时随进程数近似线性下降。
+
+    python reparse.py list --workers 8          # 榜单分页 -> ur.reparsed.jsonl
+    python reparse.py detail                    # 详情页 -> details.reparsed.jsonl
+    python manage.py import_movies spiders/ur.reparsed.jsonl
+"""
+import argparse
+import os
+import re
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+from details import parse_detail
+from get import parse_page
+from raw_store import STORE_PATH, RawStore, read_text
+from records import RecordWriter
+
+SPIDER_DIR = Path(__file__).resolve().parent
+
+# 类型 -> (url 的 LIKE 模式, 默认输出文件)
+KINDS = {
+    "list": ("%/j/chart/top_list?%", SPIDER_DIR / "ur.reparsed.jsonl"),
+    "detail": ("%/subject/%", SPIDER_DIR / "details.reparsed.jsonl"),
+}
+
+_SUBJECT_RE = re.compile(r"/subject/(\d+)")
+
+
+def parse_response(kind, url, text):
+    """一个响应解析出的记录列表，格式与 get.py / details.py 的输出相同"""
+    if kind == "list":
+        return parse_page(text)
+    return [{"id": _SUBJECT_RE.search(url).group(1), **parse_detail(text)}]
+
+
+def _parse_chunk(root, kind, entries):
+    # 在子进程中执行
+    records, errors = [], []
+    for entry in entries:
+        try:
+            records.extend(parse_response(kind, entry.url, read_text(root, entry.digest, entry.encoding)))
+        except (ValueError, OSError) as exc:
+            errors.append(f"{entry.url}: {exc!r}")
+    return records, errors
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def reparse(store, kind, writer, workers=None, chunk_size=200, on_error=None):
+    """
+    重新解析 kind 类型的全部响应写入 writer，返回 Counter（responses、records、duplicates、errors）。
+
+    同时在途的块数不超过 workers 的两倍，内存占用与响应总数无关。
+    """
+    pattern = KINDS[kind][0]
+    workers = workers or os.cpu_count()
+    stats = Counter()
+    seen = set()
+
+    def collect(future):
+        records, errors = future.result()
+        for record in records:
+            if record.get("id") in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(record.get("id"))
+            writer.write(record)
+            stats["records"] += 1
+        stats["errors"] += len(errors)
+        if on_error:
+            for error in errors:
+                on_error(error)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in _chunks(store.entries(pattern), chunk_size):
+            stats["responses"] += len(chunk)
+            pending.append(pool.submit(_parse_chunk, str(store.root), kind, chunk))
+            if len(pending) >= workers * 2:
+                collect(pending.popleft())
+        while pending:
+            collect(pending.popleft())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从原始响应库重新解析榜单分页或详情页")
+    parser.add_argument("kind", choices=sorted(KINDS), help="list：榜单分页；detail：详情页")
+    parser.add_argument("--store", default=str(STORE_PATH), help="原始响应库目录")
+    parser.add_argument("--output", help="输出文件（默认 ur.reparsed.jsonl / details.reparsed.jsonl）")
+    parser.add_argument("--workers", type=int, default=None, help="进程数，默认 CPU 核数")
+    parser.add_argument("--chunk-size", type=int, default=200, help="每个任务包含的响应数")
+    parser.add_argument("--verbose", action="store_true", help="逐条输出解析失败的响应")
+    args = parser.parse_args()
+    output = Path(args.output or KINDS[args.kind][1])
+    if output.exists():
+        # RecordWriter 是追加写入，重新解析应生成新文件
+        parser.error(f"输出文件已存在：{output}")
+
+    started = time.time()
+    with RawStore(args.store) as store, RecordWriter(output) as writer:
+        stats = reparse(
+            store, args.kind, writer, workers=args.workers, chunk_size=args.chunk_size,
+            on_error=print if args.verbose else None,
+        )
+    elapsed = time.time() - started
+    print(
+        f"完成：{stats['responses']} 个响应，{stats['records']} 条记录（重复 {stats['duplicates']}），"
+        f"解析失败 {stats['errors']}，{stats['responses'] / max(elapsed, 1e-9):.0f} 个/s，"
+        f"耗时 {elapsed:.1f}s -> {output}"
+    )
+
+
+if __name__ == "__main__":
+    main()